@@ -206,3 +206,159 @@ class EmailSettings(db.Model):
 
     def __repr__(self):
         return f'<EmailSettings for user {self.user_id}>'
+
+class MailFolderState(db.Model):
+    __tablename__ = 'mail_folder_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    settings_id = db.Column(db.Integer, db.ForeignKey('email_settings.id'), nullable=False)
+    folder = db.Column(db.String(255), nullable=False)
+    uidvalidity = db.Column(db.BigInteger, nullable=False, default=0)
+    uidnext = db.Column(db.BigInteger, nullable=False, default=0)
+    highestmodseq = db.Column(db.BigInteger, nullable=True)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    # Lowest UID synced so far; older messages are backfilled in batches
+    lowest_uid = db.Column(db.BigInteger, nullable=True)
+    backfill_complete = db.Column(db.Boolean, default=False)
+    synced_at = db.Column(db.DateTime, nullable=True)
+    flags_synced_at = db.Column(db.DateTime, nullable=True)
+
+    settings = db.relationship('EmailSettings', backref=db.backref('folder_states', lazy='dynamic',
+                                                                    cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        Index('idx_mail_folder_state', 'settings_id', 'folder', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<MailFolderState {self.folder} for settings {self.settings_id}>'
+
+class MailMessage(db.Model):
+    __tablename__ = 'mail_messages'
+
+    id = db.Column(db.Integer, primary_key=True)
+    settings_id = db.Column(db.Integer, db.ForeignKey('email_settings.id'), nullable=False)
+    folder = db.Column(db.String(255), nullable=False)
+    uid = db.Column(db.BigInteger, nullable=False)
+    modseq = db.Column(db.BigInteger, nullable=True)
+    subject = db.Column(db.Text, nullable=True)
+    from_name = db.Column(db.String(255), nullable=True)
+    from_email = db.Column(db.String(255), nullable=True)
+    to_addresses = db.Column(db.Text, nullable=True)
+    timestamp = db.Column(db.BigInteger, nullable=False, default=0)
+    size = db.Column(db.Integer, default=0)
+    flags = db.Column(db.String(512), default='')
+    _attachments = db.Column('attachments', db.Text, nullable=True)
+
+    # UID ordering serves the mailbox listing; timestamp ordering serves date queries
+    __table_args__ = (
+        Index('idx_mail_message_uid', 'settings_id', 'folder', 'uid', unique=True),
+        Index('idx_mail_message_timestamp', 'settings_id', 'folder', 'timestamp'),
+    )
+
+    @property
+    def attachments(self):
+        """Get the attachment metadata list"""
+        return json.loads(self._attachments) if self._attachments else []
+
+    @attachments.setter
+    def attachments(self, value):
+        """Store the attachment metadata list as JSON"""
+        self._attachments = json.dumps(value) if value else None
+
+    def __repr__(self):
+        return f'<MailMessage {self.folder}/{self.uid} for settings {self.settings_id}>'
+
+class MailFolderRole(db.Model):
+    __tablename__ = 'mail_folder_roles'
+
+    id = db.Column(db.Integer, primary_key=True)
+    settings_id = db.Column(db.Integer, db.ForeignKey('email_settings.id'), nullable=False)
+    role = db.Column(db.String(32), nullable=False)
+    # None records that the account has no folder with this role
+    folder = db.Column(db.String(255), nullable=True)
+    resolved_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    settings = db.relationship('EmailSettings', backref=db.backref('folder_roles', lazy='dynamic',
+                                                                    cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        Index('idx_mail_folder_role', 'settings_id', 'role', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<MailFolderRole {self.role}={self.folder} for settings {self.settings_id}>'
+
+class MailServerStrategy(db.Model):
+    __tablename__ = 'mail_server_strategies'
+
+    id = db.Column(db.Integer, primary_key=True)
+    settings_id = db.Column(db.Integer, db.ForeignKey('email_settings.id'), nullable=False)
+    protocol = db.Column(db.String(8), nullable=False)
+    # ssl, starttls or plain
+    mode = db.Column(db.String(16), nullable=False)
+    port = db.Column(db.Integer, nullable=False)
+    verify_cert = db.Column(db.Boolean, nullable=False, default=False)
+    succeeded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    settings = db.relationship('EmailSettings', backref=db.backref('server_strategies', lazy='dynamic',
+                                                                    cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        Index('idx_mail_server_strategy', 'settings_id', 'protocol', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<MailServerStrategy {self.protocol} {self.mode}:{self.port} for settings {self.settings_id}>'
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox_messages'
+
+    id = db.Column(db.Integer, primary_key=True)
+    settings_id = db.Column(db.Integer, db.ForeignKey('email_settings.id'), nullable=False)
+    # queued -> sending -> sent, or back to queued for a retry, or failed for good
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    subject = db.Column(db.Text, nullable=True)
+    _recipients = db.Column('recipients', db.Text, nullable=False)
+    # Message bytes live in a spool file so large attachments stay out of the database
+    spool_file = db.Column(db.String(255), nullable=False)
+    # Compose parameters of a message the worker still has to write, e.g. to fetch forwarded attachments
+    _draft = db.Column('draft', db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    saved_to_sent = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    settings = db.relationship('EmailSettings', backref=db.backref('outbox_messages', lazy='dynamic',
+                                                                    cascade='all, delete-orphan'))
+
+    __table_args__ = (
+        Index('idx_outbox_due', 'status', 'next_attempt_at'),
+        Index('idx_outbox_settings', 'settings_id', 'created_at'),
+    )
+
+    @property
+    def recipients(self):
+        """Get the envelope recipient list"""
+        return json.loads(self._recipients)
+
+    @recipients.setter
+    def recipients(self, value):
+        """Store the envelope recipient list as JSON"""
+        self._recipients = json.dumps(value)
+
+    @property
+    def draft(self):
+        """Get the compose parameters of a message not written to its spool file yet"""
+        return json.loads(self._draft) if self._draft else None
+
+    @draft.setter
+    def draft(self, value):
+        """Store the compose parameters as JSON, or None once the spool file is written"""
+        self._draft = json.dumps(value) if value is not None else None
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.status} for settings {self.settings_id}>'
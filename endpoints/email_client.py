@@ -1,15 +1,34 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, make_response
+import json
+import time
+import queue
+import threading
+import atexit
+from functools import partial
+from urllib.parse import quote
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, make_response, g, Response, stream_with_context
 from flask_login import login_required, current_user
 from functools import wraps
 from concurrent.futures import ThreadPoolExecutor
 import io
-import base64
 import logging
 
 # Import the new email client service
-from services.email_client import EmailClient
+from services.circuit_breaker import CircuitOpenError, circuit_breaker
+from services.deadline import Deadline
+from services.email_client import EmailClient, StaleMessageError, create_imap_pool, create_smtp_pool
 from services.email_connection import EmailConnection
+from services.folder_roles import AccountFolderRoles
+from services.imap_capabilities import capability_registry
+from services.mail_store import MailStore
+from services.mail_watcher import MailWatcher
+from services.message_cache import MessageCache
+from services.outbox import Outbox
+from services.search_index import SearchIndex
+from services.search_query import SearchPlanner
+from services.server_strategies import AccountServerStrategies
+from services.tls_sessions import tls_session_cache
+from services.upload_spool import UploadSpool
 
 # Initialize cache and rate limiter
 from flask_caching import Cache
@@ -23,6 +42,36 @@ limiter = Limiter(key_func=get_remote_address)
 # Email connection pool for async operations
 _executor = ThreadPoolExecutor(max_workers=4)
 _connection_manager = EmailConnection()  # Shared connection manager for testing
+_mail_store = MailStore()  # Local copy of message metadata for list views
+_imap_pool = create_imap_pool()  # Authenticated IMAP sessions shared across requests
+atexit.register(_imap_pool.close_all)
+_smtp_pool = create_smtp_pool()  # Authenticated SMTP sessions reused by back-to-back sends
+atexit.register(_smtp_pool.close_all)
+_message_cache = MessageCache(max_bytes=int(os.getenv('MESSAGE_CACHE_BYTES', 64 * 1024 * 1024)))  # Parsed messages shared by view and attachment requests
+_mail_watcher = MailWatcher()  # IDLE sessions pushing mailbox events to the browser
+atexit.register(_mail_watcher.stop_all)
+_event_streams = threading.BoundedSemaphore(int(os.getenv('MAX_EVENT_STREAMS', 16)))  # Each open stream holds a worker thread; keep below the thread count
+_search_index = SearchIndex(os.getenv('SEARCH_INDEX_DIR', os.path.join('data', 'search_index')))  # Local full-text search
+_search_planner = SearchPlanner(_mail_store, _search_index)  # Splits searches between local data and the server
+_outbox = Outbox(os.getenv('OUTBOX_DIR', os.path.join('data', 'outbox')))  # Queued mail delivered in the background
+atexit.register(_outbox.stop)
+_background_syncs = set()  # (settings id, folder) of mail store syncs running on the executor
+_background_syncs_lock = threading.Lock()
+_upload_spool = UploadSpool(os.getenv('UPLOAD_DIR', os.path.join('data', 'uploads')))  # Compose attachments awaiting send
+
+EVENT_STREAM_LIFETIME = 300  # Seconds before a browser event stream is closed and reconnects
+EVENT_HEARTBEAT_INTERVAL = 20  # Seconds between keep-alive comments on idle streams
+MAX_ATTACHMENT_SIZE = 25 * 1024 * 1024  # Largest compose attachment accepted by the upload endpoint
+INLINE_ATTACHMENT_FIELDS = ('filename', 'content_type', 'content')  # Attachment fields a client may send with the message
+REQUEST_DEADLINE = float(os.getenv('EMAIL_REQUEST_DEADLINE', 5))  # Seconds a request may spend on mail server calls
+
+# Flag changes offered by the bulk endpoint: action -> (flag, add)
+BULK_FLAG_ACTIONS = {
+    'read': ('\\Seen', True),
+    'unread': ('\\Seen', False),
+    'flag': ('\\Flagged', True),
+    'unflag': ('\\Flagged', False),
+}
 
 logger = logging.getLogger(__name__)
 
@@ -33,21 +82,215 @@ def async_action(f):
         return _executor.submit(f, *args, **kwargs)
     return wrapped
 
-def get_client_for_user(user):
-    """Get email client for a user with their saved settings"""
-    if not user.email_settings:
-        return None
-
-    settings = user.email_settings
+def create_client(settings, deadline=None):
+    """Create an email client for saved email settings, optionally bounded by a request deadline"""
     return EmailClient(
         settings.imap_server,
         settings.smtp_server,
         settings.username,
         settings.password,
         settings.imap_port,
-        settings.smtp_port
+        settings.smtp_port,
+        imap_pool=_imap_pool,
+        smtp_pool=_smtp_pool,
+        folder_roles=AccountFolderRoles(settings.id),
+        message_cache=_message_cache,
+        server_strategies=AccountServerStrategies(settings.id),
+        deadline=deadline,
+        account_id=settings.id
     )
 
+def get_client_for_user(user):
+    """Get email client for a user with their saved settings"""
+    if not user.email_settings:
+        return None
+
+    client = create_client(user.email_settings, g.get('email_deadline'))
+    # Remember the client so its pooled session is released even if the handler fails
+    g.setdefault('email_clients', []).append(client)
+    return client
+
+def outbox_client(settings_id):
+    """Create the client the outbox worker delivers an account's mail with"""
+    from database.identity.models import EmailSettings
+    settings = EmailSettings.query.get(settings_id)
+    return create_client(settings) if settings else None
+
+@email_bp.record_once
+def start_outbox(state):
+    """Start delivering queued mail once the blueprint is registered on the app"""
+    _outbox.start(state.app, outbox_client, notify=_mail_watcher.notify, write_draft=write_outbox_draft)
+
+@email_bp.before_request
+def start_request_deadline():
+    """Give the request one time budget for all of its mail server calls"""
+    g.email_deadline = Deadline(REQUEST_DEADLINE)
+
+@email_bp.teardown_request
+def release_email_clients(exc=None):
+    """Return pooled IMAP sessions of clients the request did not disconnect"""
+    for client in g.pop('email_clients', []):
+        client.disconnect()
+
+def failure_status(error):
+    """HTTP status of a failed request: 503 for servers that are down, 504 once the deadline ran out, 500 otherwise"""
+    if isinstance(error, CircuitOpenError):
+        return 503
+    deadline = g.get('email_deadline')
+    return 504 if deadline is not None and deadline.expired() else 500
+
+def email_service_stats():
+    """Collect connection pool, cache, TLS session, circuit, capability and strategy statistics for monitoring"""
+    stats = capability_registry.stats()
+    stats['pools'] = [_imap_pool.stats(), _smtp_pool.stats()]
+    stats['caches'] = [_message_cache.stats()]
+    stats['tls_sessions'] = tls_session_cache.stats()
+    stats['circuits'] = circuit_breaker.stats()
+    return stats
+
+def resolve_attachments(client, settings_id, attachments, fetch_forwarded=True):
+    """
+    Point compose attachments at their content: uploaded files on disk or streamed forwarded parts
+
+    With fetch_forwarded off, forwarded parts stay references with a 'source'
+    that fetch_forwarded_attachment() resolves later, in the outbox worker.
+    """
+    resolved = []
+    for attachment in attachments:
+        # Content sources on the server are only ever set here, never taken from the client
+        if 'path' in attachment or 'chunks' in attachment:
+            raise ValueError("Attachments must be uploaded or forwarded, not referenced by path")
+
+        if attachment.get('upload_id'):
+            upload = _upload_spool.get(settings_id, attachment['upload_id'])
+            if not upload:
+                raise Exception(f"Attachment {attachment.get('filename')} has expired, please attach it again")
+            resolved.append(upload)
+            continue
+
+        source = attachment.get('source')
+        if attachment.get('content') or not source or not attachment.get('part_id'):
+            resolved.append({field: attachment[field] for field in INLINE_ATTACHMENT_FIELDS if field in attachment})
+            continue
+
+        reference = {
+            'filename': attachment.get('filename'),
+            'content_type': attachment.get('content_type'),
+            'part_id': attachment['part_id'],
+            'source': {field: source.get(field) for field in ('email_id', 'folder', 'uidvalidity')}
+        }
+        resolved.append(fetch_forwarded_attachment(client, reference) if fetch_forwarded else reference)
+    return resolved
+
+def fetch_forwarded_attachment(client, reference):
+    """Look up a forwarded part so it is streamed from the server while the message is written"""
+    source = reference['source']
+    info = client.get_attachment_info(source['email_id'], source['folder'],
+                                      reference['part_id'], source['uidvalidity'])
+    if not info:
+        raise Exception(f"Forwarded attachment {reference['filename']} no longer exists")
+    # Fetched one chunk at a time
+    return dict(info, chunks=client.iter_attachment(info))
+
+def write_outbox_draft(client, settings_id, draft, fp):
+    """Write a message queued as a draft, fetching its forwarded attachments in the outbox worker"""
+    attachments = [fetch_forwarded_attachment(client, attachment) if 'source' in attachment else attachment
+                   for attachment in draft['attachments']]
+    recipients = client.write_message(fp, **dict(draft, attachments=attachments))
+
+    # The spooled message holds its own copy of uploaded files
+    for attachment in attachments:
+        if attachment.get('upload_id'):
+            _upload_spool.discard(settings_id, attachment['upload_id'])
+    return recipients
+
+def attachment_disposition(filename):
+    """Build a Content-Disposition header value that survives non-ASCII filenames"""
+    fallback = filename.encode('ascii', errors='replace').decode('ascii').replace('"', "'").replace('?', '_')
+    if fallback == filename:
+        return f'attachment; filename="{filename}"'
+    return f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{quote(filename)}'
+
+def schedule_indexing(settings, folder):
+    """Continue indexing a folder for local search in the background"""
+    connection = (settings.imap_server, settings.smtp_server, settings.username,
+                  settings.password, settings.imap_port, settings.smtp_port)
+    settings_id = settings.id
+
+    def update():
+        client = EmailClient(*connection, imap_pool=_imap_pool, account_id=settings_id)
+        try:
+            _search_index.update_folder(client, settings_id, folder)
+        except Exception as e:
+            logger.warning(f"Search indexing of {folder} failed: {str(e)}")
+        finally:
+            client.disconnect()
+
+    _executor.submit(update)
+
+def schedule_sync(settings, folder):
+    """Sync a folder into the local mail store in the background, without a request deadline"""
+    key = (settings.id, folder)
+    with _background_syncs_lock:
+        if key in _background_syncs:
+            return
+        _background_syncs.add(key)
+    app = current_app._get_current_object()
+    settings_id = settings.id
+
+    def sync():
+        from database import db
+        from database.identity.models import EmailSettings
+        client = None
+        try:
+            with app.app_context():
+                try:
+                    account = EmailSettings.query.get(settings_id)
+                    if account:
+                        client = create_client(account)
+                        # Every call commits one more batch, so a large folder fills up across calls
+                        _mail_store.sync_folder(client, settings_id, folder)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"Background sync of {folder} failed: {str(e)}")
+        finally:
+            if client is not None:
+                client.disconnect()
+            with _background_syncs_lock:
+                _background_syncs.discard(key)
+
+    _executor.submit(sync)
+
+def list_emails(client, settings, folder, limit, offset, search=None):
+    """List a page of emails, serving listings and searches from local storage when possible"""
+    from database import db
+    schedule_indexing(settings, folder)
+
+    try:
+        # Searches use stored metadata too, so keep the store current either way. Only
+        # incremental syncs run within the request; a first sync fetches a whole batch
+        if _mail_store.has_folder(settings.id, folder):
+            _mail_store.sync_folder(client, settings.id, folder)
+        else:
+            schedule_sync(settings, folder)
+        if search:
+            return _search_planner.search(client, settings.id, folder, search, limit, offset)
+        listing = _mail_store.list_messages(settings.id, folder, limit, offset)
+        if listing is not None:
+            return listing
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Local mail store unavailable for {folder}: {str(e)}")
+        if g.email_deadline.expired():
+            # Let the sync catch up without the deadline, and show what is stored meanwhile
+            schedule_sync(settings, folder)
+            listing = None if search else _mail_store.list_messages(settings.id, folder, limit, offset)
+            if listing is None:
+                raise
+            return listing
+
+    return client.get_emails(folder=folder, limit=limit, offset=offset, search_criteria=search or None)
+
 @email_bp.route('/')
 @login_required
 def index():
@@ -101,6 +344,8 @@ def setup():
                 existing_settings.smtp_port = smtp_port
                 existing_settings.username = username
                 existing_settings.password = password
+                # Strategies found for the previous servers may not apply to the new ones
+                AccountServerStrategies(existing_settings.id).forget()
             else:
                 settings = EmailSettings(
                     user_id=current_user.id,
@@ -163,8 +408,7 @@ def api_emails():
 
     try:
         client = get_client_for_user(current_user)
-        search_criteria = f'(OR SUBJECT "{search}" FROM "{search}")' if search else None
-        emails, total = client.get_emails(folder=folder, limit=limit, offset=offset, search_criteria=search_criteria)
+        emails, total = list_emails(client, settings, folder, limit, offset, search)
         client.disconnect()
 
         return jsonify({
@@ -175,7 +419,7 @@ def api_emails():
         })
     except Exception as e:
         current_app.logger.error(f"Error fetching emails: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
 @email_bp.route('/api/folders')
 @login_required
@@ -194,7 +438,7 @@ def api_folders():
         return jsonify({'folders': folders})
     except Exception as e:
         current_app.logger.error(f"Error fetching folders: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
 @email_bp.route('/view/<folder>/<email_id>')
 @login_required
@@ -211,13 +455,15 @@ def api_email(folder, email_id):
         if not client:
             return jsonify({'error': 'Email not configured'}), 400
 
-        email_data = client.get_email(email_id, folder)
+        email_data = client.get_email(email_id, folder, request.args.get('uidvalidity', type=int))
         client.disconnect()
 
         return jsonify(email_data)
+    except StaleMessageError as e:
+        return jsonify({'error': str(e)}), 410
     except Exception as e:
         current_app.logger.error(f"Error fetching email: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
 @email_bp.route('/compose')
 @login_required
@@ -266,21 +512,92 @@ def api_send_email():
         if not client:
             return jsonify({'error': 'Email not configured'}), 400
 
-        client.send_email(
-            to_emails=to_emails,
-            subject=subject,
-            body=body,
-            cc_emails=cc_emails,
-            bcc_emails=bcc_emails,
-            html_body=html_body,
-            attachments=attachments
-        )
+        settings_id = current_user.email_settings.id
+        attachments = resolve_attachments(client, settings_id, attachments, fetch_forwarded=False)
+        message = {
+            'to': to_emails,
+            'subject': subject,
+            'body_text': body,
+            'body_html': html_body,
+            'cc': cc_emails,
+            'bcc': bcc_emails,
+            'attachments': attachments
+        }
+
+        # Delivery and the Sent copy happen in the outbox worker, not in this request
+        if any('source' in attachment for attachment in attachments):
+            # Downloading forwarded parts could take longer than the request deadline,
+            # so the worker writes the message and discards the uploads afterwards
+            recipients = to_emails + (cc_emails or []) + (bcc_emails or [])
+            status = _outbox.enqueue_draft(settings_id, message, recipients, subject)
+            client.disconnect()
+            return jsonify({'success': True, 'message': 'Email queued for delivery', 'outbox': status}), 202
+
+        status = _outbox.enqueue(settings_id, partial(client.write_message, **message), subject)
         client.disconnect()
 
-        return jsonify({'success': True, 'message': 'Email sent successfully'})
+        # The spooled message holds its own copy of uploaded files
+        for attachment in attachments:
+            if attachment.get('upload_id'):
+                _upload_spool.discard(settings_id, attachment['upload_id'])
+
+        return jsonify({'success': True, 'message': 'Email queued for delivery', 'outbox': status}), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"Error sending email: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
+
+@email_bp.route('/api/attachments', methods=['POST'])
+@login_required
+@limiter.limit("60 per hour")
+def api_upload_attachment():
+    """API endpoint to upload a compose attachment as multipart/form-data"""
+    if not current_user.email_settings:
+        return jsonify({'error': 'Email not configured'}), 400
+
+    # Refuse oversized bodies before Werkzeug spools them; the margin covers the multipart framing
+    if request.content_length and request.content_length > MAX_ATTACHMENT_SIZE + 64 * 1024:
+        return jsonify({'error': f'Attachment exceeds {MAX_ATTACHMENT_SIZE // (1024 * 1024)}MB'}), 413
+
+    upload = request.files.get('file')
+    if not upload:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    try:
+        _upload_spool.cleanup()
+        return jsonify(_upload_spool.save(current_user.email_settings.id, upload, MAX_ATTACHMENT_SIZE)), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        current_app.logger.error(f"Error uploading attachment: {str(e)}")
+        return jsonify({'error': str(e)}), failure_status(e)
+
+@email_bp.route('/api/outbox')
+@login_required
+def api_outbox():
+    """API endpoint to fetch the delivery status of recently sent emails"""
+    if not current_user.email_settings:
+        return jsonify({'error': 'Email not configured'}), 400
+
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+        return jsonify({'messages': _outbox.list_status(current_user.email_settings.id, limit)})
+    except Exception as e:
+        current_app.logger.error(f"Error fetching outbox: {str(e)}")
+        return jsonify({'error': str(e)}), failure_status(e)
+
+@email_bp.route('/api/outbox/<int:message_id>')
+@login_required
+def api_outbox_message(message_id):
+    """API endpoint to fetch the delivery status of one sent email"""
+    if not current_user.email_settings:
+        return jsonify({'error': 'Email not configured'}), 400
+
+    status = _outbox.get_status(current_user.email_settings.id, message_id)
+    if status is None:
+        return jsonify({'error': 'Message not found'}), 404
+    return jsonify(status)
 
 @email_bp.route('/api/delete/<folder>/<email_id>', methods=['POST'])
 @login_required
@@ -291,13 +608,15 @@ def api_delete_email(folder, email_id):
         if not client:
             return jsonify({'error': 'Email not configured'}), 400
 
-        client.delete_email(email_id, folder)
+        if client.delete_email(folder, email_id):
+            _mail_store.forget_messages(current_user.email_settings.id, folder, [email_id])
+            _search_index.forget_messages(current_user.email_settings.id, folder, [email_id])
         client.disconnect()
 
         return jsonify({'success': True, 'message': 'Email deleted successfully'})
     except Exception as e:
         current_app.logger.error(f"Error deleting email: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
 @email_bp.route('/api/move', methods=['POST'])
 @login_required
@@ -316,44 +635,119 @@ def api_move_email():
         if not client:
             return jsonify({'error': 'Email not configured'}), 400
 
-        success = client.move_email(email_id, source_folder, destination_folder)
+        success = client.move_email(source_folder, destination_folder, email_id)
         client.disconnect()
 
+        if success:
+            _mail_store.forget_messages(current_user.email_settings.id, source_folder, [email_id])
+            _search_index.forget_messages(current_user.email_settings.id, source_folder, [email_id])
+
         if success:
             return jsonify({'success': True, 'message': 'Email moved successfully'})
         else:
             return jsonify({'error': 'Failed to move email'}), 500
     except Exception as e:
         current_app.logger.error(f"Error moving email: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
-@email_bp.route('/api/attachment/<folder>/<email_id>/<filename>')
+@email_bp.route('/api/bulk', methods=['POST'])
 @login_required
-def api_attachment(folder, email_id, filename):
-    """API endpoint to download an email attachment"""
+def api_bulk():
+    """API endpoint to mark, flag, move or delete many emails of a folder in one call"""
+    data = request.json or {}
+    action = data.get('action')
+    folder = data.get('folder')
+    email_ids = data.get('email_ids') or []
+    destination_folder = data.get('destination_folder')
+
+    if action not in BULK_FLAG_ACTIONS and action not in ('move', 'delete'):
+        return jsonify({'error': f'Unknown action: {action}'}), 400
+    if not folder or not email_ids or (action == 'move' and not destination_folder):
+        return jsonify({'error': 'Missing required parameters'}), 400
+    try:
+        uids = [int(email_id) for email_id in email_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid email ids'}), 400
+
     try:
         client = get_client_for_user(current_user)
         if not client:
             return jsonify({'error': 'Email not configured'}), 400
 
-        email_data = client.get_email(email_id, folder)
+        settings_id = current_user.email_settings.id
+        if action == 'move':
+            success = client.move_emails(folder, destination_folder, uids)
+        elif action == 'delete':
+            success = client.delete_emails(folder, uids)
+        else:
+            flag, add = BULK_FLAG_ACTIONS[action]
+            success = client.store_flags(folder, uids, [flag], add)
         client.disconnect()
 
-        # Find the attachment
-        for attachment in email_data['attachments']:
-            if attachment['filename'] == filename:
-                file_data = base64.b64decode(attachment['content'])
+        if not success:
+            return jsonify({'error': f'Failed to {action} emails'}), 500
 
-                # Create Flask response with appropriate headers
-                response = make_response(file_data)
-                response.headers['Content-Type'] = attachment['content_type']
-                response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-                return response
+        if action in ('move', 'delete'):
+            _mail_store.forget_messages(settings_id, folder, uids)
+            _search_index.forget_messages(settings_id, folder, uids)
+        else:
+            _mail_store.update_flags(settings_id, folder, uids, [flag], add)
 
-        return jsonify({'error': 'Attachment not found'}), 404
+        return jsonify({'success': True, 'count': len(uids)})
+    except Exception as e:
+        current_app.logger.error(f"Error running bulk {action}: {str(e)}")
+        return jsonify({'error': str(e)}), failure_status(e)
+
+@email_bp.route('/api/attachment/<folder>/<email_id>/<part_id>')
+@login_required
+def api_attachment(folder, email_id, part_id):
+    """API endpoint to stream an email attachment by its MIME part id, with HTTP Range support"""
+    try:
+        client = get_client_for_user(current_user)
+        if not client:
+            return jsonify({'error': 'Email not configured'}), 400
+
+        info = client.get_attachment_info(email_id, folder, part_id, request.args.get('uidvalidity', type=int))
+        if not info:
+            client.disconnect()
+            return jsonify({'error': 'Attachment not found'}), 404
+
+        size = info['size']
+        start, stop = 0, size
+        status = 200
+        # Ranges are only honoured when the exact decoded size is known
+        if request.range and size is not None:
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                client.disconnect()
+                response = make_response('', 416)
+                response.headers['Content-Range'] = f'bytes */{size}'
+                return response
+            start, stop = byte_range
+            status = 206
+
+        def stream():
+            # The deadline covers the time to the first byte; large downloads may take longer
+            client.set_deadline(None)
+            try:
+                yield from client.iter_attachment(info, start, stop)
+            finally:
+                client.disconnect()
+
+        # Keep the request context, and with it the pooled connection, until the download ends
+        response = Response(stream_with_context(stream()), status=status, mimetype=info['content_type'])
+        response.headers['Content-Disposition'] = attachment_disposition(info['filename'])
+        if size is not None:
+            response.headers['Accept-Ranges'] = 'bytes'
+            response.headers['Content-Length'] = str(stop - start)
+            if status == 206:
+                response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        return response
+    except StaleMessageError as e:
+        return jsonify({'error': str(e)}), 410
     except Exception as e:
         current_app.logger.error(f"Error fetching attachment: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
 @email_bp.route('/api/folders/render')
 @login_required
@@ -406,7 +800,7 @@ def api_folders_render():
         return jsonify({'html': html})
     except Exception as e:
         current_app.logger.error(f"Error fetching folders for render: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
 @email_bp.route('/api/emails/render')
 @login_required
@@ -427,11 +821,7 @@ def api_emails_render():
         if not client:
             return jsonify({'error': 'Email not configured'}), 400
 
-        search_criteria = None
-        if search:
-            search_criteria = f'(OR SUBJECT "{search}" FROM "{search}")'
-
-        emails, total = client.get_emails(folder=folder, limit=limit, offset=offset, search_criteria=search_criteria)
+        emails, total = list_emails(client, current_user.email_settings, folder, limit, offset, search)
         client.disconnect()
 
         # Render the email list template with the email data
@@ -453,7 +843,7 @@ def api_emails_render():
         })
     except Exception as e:
         current_app.logger.error(f"Error fetching emails for render: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
 @email_bp.route('/api/email/render/<folder>/<email_id>')
 @login_required
@@ -466,7 +856,7 @@ def api_email_render(folder, email_id):
         if not client:
             return jsonify({'error': 'Email not configured'}), 400
 
-        email_data = client.get_email(email_id, folder)
+        email_data = client.get_email(email_id, folder, request.args.get('uidvalidity', type=int))
         client.disconnect()
 
         # Render the email content template with the email data
@@ -479,9 +869,11 @@ def api_email_render(folder, email_id):
             'html': html,
             'email': email_data  # Include raw data for JS processing
         })
+    except StaleMessageError as e:
+        return jsonify({'error': str(e)}), 410
     except Exception as e:
         current_app.logger.error(f"Error fetching email for render: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'error': str(e)}), failure_status(e)
 
 @email_bp.route('/api/unread-count')
 @login_required
@@ -493,11 +885,58 @@ def api_unread_count():
         if not client:
             return jsonify({'unread_count': 0})
 
-        unread_count = client.get_unread_count('INBOX')
+        # Watched accounts have their count in memory already
+        unread_count = _mail_watcher.unread_count(current_user.email_settings.id)
+        if unread_count is None:
+            unread_count = client.get_unread_count('INBOX')
         client.disconnect()
 
         return jsonify({'unread_count': unread_count})
     except Exception as e:
         current_app.logger.error(f"Error checking unread emails: {str(e)}")
-        return jsonify({'unread_count': 0, 'error': str(e)}), 500
+        return jsonify({'unread_count': 0, 'error': str(e)}), failure_status(e)
+
+@email_bp.route('/api/events')
+@login_required
+def api_events():
+    """Stream unread-count and new-mail events as server-sent events"""
+    settings = current_user.email_settings
+    if not settings:
+        return jsonify({'error': 'Email settings not configured'}), 400
+
+    # Streams must never occupy every worker thread; refused browsers fall back to polling
+    if not _event_streams.acquire(blocking=False):
+        return jsonify({'error': 'Too many open event streams'}), 503
+
+    # The watcher outlives this request, so it gets its own unpooled clients
+    connection = (settings.imap_server, settings.smtp_server, settings.username,
+                  settings.password, settings.imap_port, settings.smtp_port)
+    settings_id = settings.id
+    try:
+        subscriber = _mail_watcher.subscribe(settings_id, lambda: EmailClient(*connection))
+    except Exception:
+        _event_streams.release()
+        raise
+
+    def stream():
+        try:
+            yield f"retry: {EVENT_HEARTBEAT_INTERVAL * 1000}\n\n"
+            # Bounded lifetime keeps workers from being held forever; browsers reconnect
+            deadline = time.monotonic() + EVENT_STREAM_LIFETIME
+            while time.monotonic() < deadline:
+                try:
+                    event = subscriber.get(timeout=EVENT_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            _mail_watcher.unsubscribe(settings_id, subscriber)
+
+    response = Response(stream(), mimetype='text/event-stream')
+    # Runs even if the stream never started, unlike the generator's finally block
+    response.call_on_close(_event_streams.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 #-神-#
\ No newline at end of file
@@ -151,6 +151,12 @@ def get_cpu_temperature():
 
     return None
 
+def get_email_info():
+    """Get IMAP server capabilities, chosen protocol strategies and connection pool usage"""
+    # Imported here so the monitoring blueprint does not depend on the email blueprint at import time
+    from endpoints.email_client import email_service_stats
+    return email_service_stats()
+
 def get_docker_info():
     """Get information about Docker containers if Docker is available"""
     if not docker_available:
@@ -871,6 +877,16 @@ def docker_container_action(container_id, action):
         current_app.logger.error(f"Error performing Docker container action: {str(e)}")
         return jsonify({"success": False, "error": str(e)})
 
+@monitoring_bp.route('/email', methods=['GET'])
+@login_required
+def email_metrics():
+    """API endpoint to get email protocol metrics"""
+    try:
+        return jsonify(get_email_info())
+    except Exception as e:
+        current_app.logger.error(f"Error in email_metrics endpoint: {str(e)}")
+        return jsonify({"error": str(e)}), 200  # Return 200 to prevent frontend errors
+
 @monitoring_bp.route('/charts/cpu', methods=['GET'])
 @login_required
 def cpu_chart():
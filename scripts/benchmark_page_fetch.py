@@ -0,0 +1,142 @@
+"""
+Page Fetch Benchmark
+
+Measures how long loading one mailbox page takes as the page grows including:
+- A local IMAP server with a synthetic mailbox that delays every reply by a fixed round trip time
+- The former one FETCH per message against the single batched FETCH of EmailClient.get_emails()
+- Timings per page size, so latency staying flat for the batched fetch is visible
+
+Usage:
+    python scripts/benchmark_page_fetch.py --latency 0.05 --sizes 10 25 50 100
+"""
+
+import argparse
+import imaplib
+import os
+import socketserver
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.email_client import EmailClient, LIST_FETCH_ITEMS  # noqa: E402
+
+
+def summary(seq: int) -> bytes:
+    """Build the FETCH response of one synthetic message, as the list view requests it"""
+    uid = seq + 1000
+    return (
+        f'* {seq} FETCH (UID {uid} FLAGS (\\Seen) RFC822.SIZE {2000 + seq} '
+        f'INTERNALDATE "01-Jan-2025 10:00:00 +0000" '
+        f'ENVELOPE ("Wed, 01 Jan 2025 10:00:00 +0000" "Synthetic message {seq}" '
+        f'(("Alice" NIL "alice" "example.com")) (("Alice" NIL "alice" "example.com")) '
+        f'(("Alice" NIL "alice" "example.com")) (("Bob" NIL "bob" "example.com")) '
+        f'NIL NIL NIL "<{uid}@example.com>") '
+        f'BODYSTRUCTURE (("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "7BIT" 120 4 NIL NIL NIL NIL) '
+        f'("APPLICATION" "PDF" ("NAME" "report-{seq}.pdf") NIL NIL "BASE64" 54000 NIL '
+        f'("ATTACHMENT" ("FILENAME" "report-{seq}.pdf")) NIL NIL) "MIXED" ("BOUNDARY" "b{seq}") NIL NIL NIL))\r\n'
+    ).encode('ascii')
+
+
+def sequence_numbers(sequence_set: str, exists: int):
+    """Expand an IMAP sequence set such as '1:5,9' into message numbers"""
+    for part in sequence_set.split(','):
+        low, _, high = part.partition(':')
+        low = exists if low == '*' else int(low)
+        high = low if not high else (exists if high == '*' else int(high))
+        yield from range(min(low, high), max(low, high) + 1)
+
+
+class FakeIMAPHandler(socketserver.StreamRequestHandler):
+    """Answers the few commands a page load needs, each after the configured round trip time"""
+
+    def handle(self):
+        self.wfile.write(b'* OK [CAPABILITY IMAP4rev1] Benchmark server ready\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, command, *args = line.decode('ascii').strip().split(' ', 2)
+            command = command.upper()
+            args = args[0] if args else ''
+            time.sleep(self.server.latency)
+
+            # One write per reply, so Nagle's algorithm doesn't add delayed ACK waits to the round trip
+            if command == 'FETCH':
+                sequence_set = args.split(' ', 1)[0]
+                reply = b''.join(summary(seq) for seq in sequence_numbers(sequence_set, self.server.exists))
+            elif command == 'SELECT':
+                reply = f'* {self.server.exists} EXISTS\r\n* OK [UIDVALIDITY 1] UIDs valid\r\n'.encode('ascii')
+            elif command == 'LOGOUT':
+                reply = b'* BYE\r\n'
+            else:
+                reply = b''
+            self.wfile.write(reply + f'{tag} OK {command} completed\r\n'.encode('ascii'))
+            if command == 'LOGOUT':
+                return
+
+
+def per_message_page(imap: imaplib.IMAP4, client: EmailClient, low: int, high: int) -> int:
+    """Load a page the way get_emails() did before, with one FETCH per message"""
+    emails = 0
+    for seq in range(high, low - 1, -1):
+        records = client._fetch_records(imap, [str(seq).encode('ascii')], LIST_FETCH_ITEMS, by_uid=False)
+        for record in records.values():
+            client._parse_summary(record, str(record['UID']))
+            emails += 1
+    return emails
+
+
+def batched_page(imap: imaplib.IMAP4, client: EmailClient, low: int, high: int) -> int:
+    """Load a page the way get_emails() does, with a single FETCH for the sequence range"""
+    records = client._fetch_records(imap, [f'{low}:{high}'.encode('ascii')], LIST_FETCH_ITEMS, by_uid=False)
+    for record in sorted(records.values(), key=lambda record: record['SEQ'], reverse=True):
+        client._parse_summary(record, str(record['UID']))
+    return len(records)
+
+
+def measure(load_page, imap, client, exists: int, size: int, repeat: int) -> float:
+    """Median milliseconds to load the newest page of the given size"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        loaded = load_page(imap, client, exists - size + 1, exists)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert loaded == size, f"Loaded {loaded} of {size} messages"
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds of simulated round trip time per command')
+    parser.add_argument('--messages', type=int, default=1000, help='Messages in the synthetic mailbox')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 25, 50, 100], help='Page sizes to measure')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per page size; the median is reported')
+    args = parser.parse_args()
+
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeIMAPHandler)
+    server.daemon_threads = True
+    server.latency = args.latency
+    server.exists = args.messages
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    imap = imaplib.IMAP4('127.0.0.1', server.server_address[1])
+    imap.login('bench', 'bench')
+    imap.select('INBOX')
+    client = EmailClient('127.0.0.1', '127.0.0.1', 'bench', 'bench')
+
+    print(f"Round trip {args.latency * 1000:g} ms, {args.messages} messages, median of {args.repeat} runs")
+    print(f"{'page size':>10} {'per message (ms)':>18} {'batched (ms)':>14}")
+    for size in args.sizes:
+        per_message = measure(per_message_page, imap, client, args.messages, size, args.repeat)
+        batched = measure(batched_page, imap, client, args.messages, size, args.repeat)
+        print(f"{size:>10} {per_message:>18.1f} {batched:>14.1f}")
+
+    imap.logout()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Search Benchmark
+
+Measures structured searches on a large synthetic mailbox including:
+- The planner answering metadata and text predicates from the local mail store and search index
+- The same queries run as a server SEARCH, as for folders that are not synced locally
+- Server round trips per query, each delayed by a simulated round trip time
+
+The simulated server evaluates searches in-process by scanning every
+message, and only the round trips are delayed, so server timings are a
+lower bound for a real server.
+
+Usage:
+    python scripts/benchmark_search.py --messages 20000 --latency 0.05
+"""
+
+import argparse
+import calendar
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from database import db  # noqa: E402
+from database.identity.models import MailFolderState, MailMessage  # noqa: E402
+from services.mail_store import MailStore  # noqa: E402
+from services.search_index import SearchIndex  # noqa: E402
+from services.search_query import SearchPlanner, parse_query  # noqa: E402
+
+FOLDER = 'INBOX'
+SYNCED_ACCOUNT = 1  # Mail store and search index hold the folder
+UNSYNCED_ACCOUNT = 2  # Nothing local, so every search goes to the server
+
+QUERIES = [
+    'from:alice before:2025-01-01 has:attachment larger:5M',
+    'subject:invoice is:unread',
+    'quarterly report',
+    'from:bob budget newer_than:365d',
+    'cc:carol since:2024-06-01',
+]
+
+PEOPLE = ['alice', 'bob', 'carol', 'dave', 'erin', 'frank', 'grace', 'heidi', 'ivan', 'judy']
+SUBJECTS = ['Invoice', 'Quarterly report', 'Meeting notes', 'Budget review', 'Lunch', 'Release plan',
+            'Travel booking', 'Contract draft', 'Weekly update', 'Support ticket']
+WORDS = ['project', 'deadline', 'budget', 'report', 'customer', 'schedule', 'review', 'team', 'update',
+         'invoice', 'quarterly', 'numbers', 'forecast', 'meeting', 'agenda', 'feedback', 'launch', 'risk']
+
+
+def synthetic_mailbox(count: int, seed: int = 1):
+    """Generate reproducible messages spread over the three years before now"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    messages = []
+    for uid in range(1, count + 1):
+        sender, recipient, copied = rng.sample(PEOPLE, 3)
+        attachments = []
+        if rng.random() < 0.2:
+            attachments = [{'filename': f'file-{uid}.pdf', 'content_type': 'application/pdf',
+                            'size': int(rng.lognormvariate(13, 1.5))}]
+        date = now - timedelta(days=3 * 365 * (count - uid) / count, seconds=rng.randrange(3600))
+        flags = [flag for flag, chance in (('\\Seen', 0.7), ('\\Flagged', 0.05), ('\\Answered', 0.2))
+                 if rng.random() < chance]
+        messages.append({
+            'uid': uid,
+            'subject': f"{rng.choice(SUBJECTS)} #{uid}",
+            'from_name': sender.title(),
+            'from_email': f'{sender}@example.com',
+            'to': f'{recipient}@example.com',
+            'cc': f'{copied}@example.com' if rng.random() < 0.3 else '',
+            'timestamp': calendar.timegm(date.timetuple()),
+            'size': 2000 + sum(attachment['size'] for attachment in attachments),
+            'flags': flags,
+            'attachments': attachments,
+            'body': ' '.join(rng.choice(WORDS) for _ in range(12)),
+        })
+    return messages
+
+
+def _contains(haystack: str, needle: str) -> bool:
+    return needle.lower() in haystack.lower()
+
+
+def server_matches(message, term) -> bool:
+    """Evaluate one term the way an IMAP server would"""
+    field, value = term.field, term.value
+    if field == 'text':
+        # The planner's index matches words; the server matches each word as a substring
+        text = ' '.join((message['subject'], message['from_name'], message['from_email'],
+                         message['to'], message['body']))
+        result = all(_contains(text, word) for word in value.split())
+    elif field == 'from':
+        result = _contains(message['from_name'] + ' ' + message['from_email'], value)
+    elif field in ('to', 'cc', 'subject', 'body'):
+        result = _contains(message[field], value)
+    elif field in ('before', 'since', 'on'):
+        day = calendar.timegm(value.timetuple())
+        result = {'before': message['timestamp'] < day,
+                  'since': message['timestamp'] >= day,
+                  'on': day <= message['timestamp'] < day + 86400}[field]
+    elif field == 'larger':
+        result = message['size'] > value
+    elif field == 'smaller':
+        result = message['size'] < value
+    elif field == 'attachment':
+        result = bool(message['attachments'])
+    elif field == 'state':
+        flag = {'SEEN': '\\Seen', 'UNSEEN': '\\Seen', 'FLAGGED': '\\Flagged', 'UNFLAGGED': '\\Flagged',
+                'ANSWERED': '\\Answered', 'DRAFT': '\\Draft'}[value]
+        result = (flag in message['flags']) != (value in ('UNSEEN', 'UNFLAGGED'))
+    elif field == 'keyword':
+        result = value in message['flags']
+    else:
+        result = False
+    return result != term.negated
+
+
+class SimulatedServerClient:
+    """
+    Stands in for EmailClient, answering from the synthetic mailbox
+
+    Handles:
+    - Searches and fetches, each costing one simulated round trip
+    - The status, UID list and text fetches the search index needs to build itself
+    """
+
+    def __init__(self, messages, latency: float):
+        self.messages = messages
+        self.by_uid = {message['uid']: message for message in messages}
+        self.latency = latency
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.latency)
+
+    def _search(self, terms, uids=None):
+        pool = self.messages if uids is None else [self.by_uid[uid] for uid in uids]
+        return [message['uid'] for message in pool if all(server_matches(message, term) for term in terms)]
+
+    def get_emails(self, folder, limit, offset, search_criteria):
+        """SEARCH newest first, then FETCH the page: two round trips"""
+        self._round_trip()
+        matches = sorted(self._search(parse_query(search_criteria)), reverse=True)
+        self._round_trip()
+        return [self.by_uid[uid] for uid in matches[offset:offset + limit]], len(matches)
+
+    def search_uids(self, folder, criteria, uids):
+        """UID SEARCH restricted to the planner's candidates: one round trip"""
+        self._round_trip()
+        return set(self._search(self.residual, uids))
+
+    def get_email_summaries(self, folder, uids):
+        self._round_trip()
+        return [self.by_uid[uid] for uid in uids]
+
+    def folder_status(self, folder):
+        return {'uidvalidity': 1, 'uidnext': len(self.messages) + 1, 'exists': len(self.messages)}
+
+    def get_folder_uids(self, folder, uid_range=None):
+        low, _, high = (uid_range or '1:*').partition(':')
+        high = len(self.messages) if high in ('', '*') else int(high)
+        return [uid for uid in range(int(low), high + 1) if uid in self.by_uid]
+
+    def fetch_search_documents(self, folder, uids, body_limit):
+        return [{'uid': uid, 'timestamp': self.by_uid[uid]['timestamp'], 'subject': self.by_uid[uid]['subject'],
+                 'from': f"{self.by_uid[uid]['from_name']} {self.by_uid[uid]['from_email']}",
+                 'to': self.by_uid[uid]['to'], 'body': self.by_uid[uid]['body'][:body_limit]} for uid in uids]
+
+
+def build_local_store(messages, client: SimulatedServerClient, index: SearchIndex):
+    """Fill the mail store and the search index of the synced account"""
+    db.session.add(MailFolderState(settings_id=SYNCED_ACCOUNT, folder=FOLDER, uidvalidity=1,
+                                   uidnext=len(messages) + 1, message_count=len(messages),
+                                   lowest_uid=1, backfill_complete=True))
+    db.session.execute(MailMessage.__table__.insert(), [{
+        'settings_id': SYNCED_ACCOUNT,
+        'folder': FOLDER,
+        'uid': message['uid'],
+        'subject': message['subject'],
+        'from_name': message['from_name'],
+        'from_email': message['from_email'],
+        'to_addresses': message['to'],
+        'timestamp': message['timestamp'],
+        'size': message['size'],
+        'flags': ' '.join(message['flags']),
+        'attachments': MailMessage(attachments=message['attachments'])._attachments,
+    } for message in messages])
+    db.session.commit()
+
+    while not index.update_folder(client, SYNCED_ACCOUNT, FOLDER):
+        pass
+
+
+def measure(planner: SearchPlanner, client: SimulatedServerClient, account_id: int, query: str,
+            repeat: int):
+    """Median milliseconds, round trips and total matches of one search"""
+    terms = parse_query(query)
+    # The simulated server only needs the terms the planner leaves over
+    client.residual = [term for term in terms if term.field in ('cc', 'bcc') or
+                       (term.field in ('text', 'body') and term.negated)]
+    timings = []
+    for _ in range(repeat):
+        client.round_trips = 0
+        started = time.perf_counter()
+        _, total = planner.search(client, account_id, FOLDER, query, limit=50)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), client.round_trips, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--messages', type=int, default=20000, help='Messages in the synthetic mailbox')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds of simulated round trip time per command')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per query; the median is reported')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='search-benchmark-')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'mail.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    messages = synthetic_mailbox(args.messages)
+    client = SimulatedServerClient(messages, args.latency)
+    index = SearchIndex(os.path.join(directory, 'index'), batch_size=1000, backfill_batches=10, refresh_interval=0)
+    planner = SearchPlanner(MailStore(), index)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        build_local_store(messages, client, index)
+        print(f"{args.messages} messages stored and indexed in {time.perf_counter() - started:.1f}s; "
+              f"round trip {args.latency * 1000:g} ms, median of {args.repeat} runs")
+        print(f"{'query':<56} {'matches':>8} {'local (ms)':>11} {'trips':>6} {'server (ms)':>12} {'trips':>6}")
+
+        for query in QUERIES:
+            local_ms, local_trips, local_total = measure(planner, client, SYNCED_ACCOUNT, query, args.repeat)
+            server_ms, server_trips, server_total = measure(planner, client, UNSYNCED_ACCOUNT, query, args.repeat)
+            matches = str(local_total) if local_total == server_total else f'{local_total}/{server_total}'
+            print(f"{query:<56} {matches:>8} {local_ms:>11.1f} {local_trips:>6} {server_ms:>12.1f} {server_trips:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Circuit Breaker Module
+
+Provides fast failure for unreachable mail servers including:
+- Per-host circuits that open after consecutive connection failures
+- Rejecting connects to open circuits right away with the last error
+- A single probe connect once the reset timeout passed (half-open state)
+- Circuit states and counters for monitoring
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of connecting to a mail server whose circuit is open"""
+    pass
+
+
+class _HostCircuit:
+    """State of one host's circuit; guarded by the breaker's lock"""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.opened = 0  # Times the circuit opened
+        self.rejected = 0  # Connects answered without contacting the host
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker keyed by mail host
+
+    Handles:
+    - Counting consecutive failures to reach a host and opening its circuit
+    - Failing fast while the circuit is open, so workers aren't tied up in timeouts
+    - Letting exactly one probe through after the reset timeout and closing on success
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        """
+        Initialize a breaker with every circuit closed
+
+        Args:
+            failure_threshold: Consecutive failures that open a host's circuit
+            reset_timeout: Seconds an open circuit rejects connects before a probe is let through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _HostCircuit] = {}
+
+    def before_connect(self, host: str):
+        """
+        Ask whether a host may be contacted, claiming the probe of a half-open circuit
+
+        Every call that returns must be followed by succeeded(), failed() or abandoned().
+
+        Args:
+            host: Mail server host
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe already running
+        """
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.state == CLOSED:
+                return
+
+            if circuit.state == OPEN and now - circuit.opened_at >= self.reset_timeout:
+                circuit.state = HALF_OPEN
+                circuit.probe_started = None
+
+            if circuit.state == HALF_OPEN:
+                # A probe that never reported back must not block the host forever
+                if circuit.probe_started is None or now - circuit.probe_started >= self.reset_timeout:
+                    circuit.probe_started = now
+                    return
+                retry_in = 0
+            else:
+                retry_in = self.reset_timeout - (now - circuit.opened_at)
+
+            circuit.rejected += 1
+            last_error = circuit.last_error
+
+        raise CircuitOpenError(f"{host} is unavailable, retrying in {max(retry_in, 0):.0f}s: {last_error}")
+
+    def succeeded(self, host: str):
+        """
+        Record that a host was reached, closing its circuit
+
+        Args:
+            host: Mail server host
+        """
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                return
+            if circuit.state != CLOSED:
+                logger.info(f"Circuit of {host} closed")
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.probe_started = None
+
+    def failed(self, host: str, error: Exception):
+        """
+        Record that a host could not be reached, opening its circuit at the threshold
+
+        A failed probe reopens the circuit right away.
+
+        Args:
+            host: Mail server host
+            error: Error of the failed connect, returned to callers while the circuit is open
+        """
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _HostCircuit())
+            circuit.failures += 1
+            circuit.last_error = str(error)
+            if circuit.state == HALF_OPEN or (circuit.state == CLOSED and circuit.failures >= self.failure_threshold):
+                circuit.state = OPEN
+                circuit.opened_at = time.monotonic()
+                circuit.probe_started = None
+                circuit.opened += 1
+                logger.warning(f"Circuit of {host} opened after {circuit.failures} failures: {str(error)}")
+
+    def abandoned(self, host: str):
+        """
+        Record a connect that ended without telling whether the host is up
+
+        E.g. the caller's request deadline cut it short. Counters stay as they
+        are; a half-open circuit lets the next connect probe instead.
+
+        Args:
+            host: Mail server host
+        """
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None and circuit.state == HALF_OPEN:
+                circuit.probe_started = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get circuit states for monitoring
+
+        Returns:
+            Dictionary with the breaker settings and 'hosts' listing every circuit
+            that has seen a failure
+        """
+        now = time.monotonic()
+        with self._lock:
+            hosts = [{
+                'host': host,
+                'state': circuit.state,
+                'failures': circuit.failures,
+                'opened': circuit.opened,
+                'rejected': circuit.rejected,
+                'last_error': circuit.last_error,
+                'retry_in': round(max(0.0, self.reset_timeout - (now - circuit.opened_at)), 1)
+                            if circuit.state == OPEN else None
+            } for host, circuit in self._circuits.items()]
+
+        return {
+            'failure_threshold': self.failure_threshold,
+            'reset_timeout': self.reset_timeout,
+            'hosts': hosts
+        }
+
+
+# Shared by every EmailConnection in the process
+circuit_breaker = CircuitBreaker()
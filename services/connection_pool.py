@@ -0,0 +1,213 @@
+"""
+Connection Pool Module
+
+Provides process-wide pooling of authenticated mail server sessions including:
+- Reuse of logged-in sessions across requests, keyed by account
+- Idle timeouts and health checks before handing out a session
+- Per-account limits on concurrent sessions
+- Clean shutdown of all pooled sessions
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple, Optional, Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable connections
+
+    Handles:
+    - Creating connections on demand through a caller-supplied factory
+    - Validating idle connections before reuse
+    - Closing connections that idled too long or failed their health check
+    """
+
+    def __init__(self, name: str,
+                 check: Callable[[Any], Any],
+                 close: Callable[[Any], Any],
+                 max_per_key: int = 3,
+                 idle_timeout: float = 300,
+                 check_interval: float = 15,
+                 acquire_timeout: float = 30):
+        """
+        Initialize a new connection pool
+
+        Args:
+            name: Pool name used in logs and statistics
+            check: Health check run on idle connections; must raise if the connection is unusable
+            close: Closes a connection gracefully
+            max_per_key: Maximum number of connections per key, idle or in use
+            idle_timeout: Seconds after which idle connections are closed
+            check_interval: Idle seconds after which a connection is health checked before reuse
+            acquire_timeout: Seconds to wait for a free connection when the key is at its limit
+        """
+        self.name = name
+        self._check = check
+        self._close = close
+        self.max_per_key = max_per_key
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._lock = threading.Condition()
+        self._idle: Dict[Hashable, List[Tuple[Any, float]]] = {}
+        self._in_use: Dict[Hashable, int] = {}
+        self._stats = {'created': 0, 'reused': 0, 'closed': 0, 'failed_checks': 0}
+
+    def acquire(self, key: Hashable, factory: Callable[[], Any],
+                timeout: Optional[float] = None,
+                prepare: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Get a connection for a key, reusing an idle one when possible
+
+        Args:
+            key: Account key, e.g. (server, port, username)
+            factory: Creates and authenticates a new connection
+            timeout: Seconds to wait for a free connection; defaults to acquire_timeout
+            prepare: Optional callback run on a reused connection before its health check,
+                e.g. to bound it by the caller's deadline
+
+        Returns:
+            A connection reserved for the caller until release()
+
+        Raises:
+            ConnectionError: If no connection becomes available in time
+        """
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+
+        while True:
+            with self._lock:
+                self._reap_expired()
+                idle = self._idle.get(key)
+                if idle:
+                    conn, last_used = idle.pop()
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                elif self._in_use.get(key, 0) < self.max_per_key:
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                    conn, last_used = None, None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ConnectionError(f"No {self.name} connection available for {key[0] if isinstance(key, tuple) else key}")
+                    self._lock.wait(remaining)
+                    continue
+
+            if conn is None:
+                try:
+                    conn = factory()
+                except Exception:
+                    self._release_slot(key)
+                    raise
+                with self._lock:
+                    self._stats['created'] += 1
+                return conn
+
+            if prepare is not None:
+                prepare(conn)
+
+            # Only check connections that sat idle for a while
+            if time.monotonic() - last_used > self.check_interval:
+                try:
+                    self._check(conn)
+                except Exception as e:
+                    logger.info(f"Discarding stale {self.name} connection: {str(e)}")
+                    with self._lock:
+                        self._stats['failed_checks'] += 1
+                    self._close_quietly(conn)
+                    self._release_slot(key)
+                    continue
+
+            with self._lock:
+                self._stats['reused'] += 1
+            return conn
+
+    def release(self, key: Hashable, conn: Any, reusable: bool = True):
+        """
+        Return a connection to the pool
+
+        Args:
+            key: Key the connection was acquired with
+            conn: Connection to return
+            reusable: False to close the connection instead of keeping it
+        """
+        if not reusable:
+            self._close_quietly(conn)
+            self._release_slot(key)
+            return
+
+        with self._lock:
+            self._in_use[key] = max(0, self._in_use.get(key, 0) - 1)
+            self._idle.setdefault(key, []).append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def evict(self, key: Hashable):
+        """
+        Close the idle connections of a key, e.g. once its credentials were refused
+
+        Args:
+            key: Key the connections were released under
+        """
+        with self._lock:
+            idle = [conn for conn, _ in self._idle.pop(key, [])]
+
+        for conn in idle:
+            self._close_quietly(conn)
+
+        if idle:
+            logger.info(f"Evicted {len(idle)} pooled {self.name} connections")
+
+    def close_all(self):
+        """Close every idle connection, e.g. on worker shutdown"""
+        with self._lock:
+            idle = [conn for connections in self._idle.values() for conn, _ in connections]
+            self._idle.clear()
+
+        for conn in idle:
+            self._close_quietly(conn)
+
+        if idle:
+            logger.info(f"Closed {len(idle)} pooled {self.name} connections")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool counters for monitoring"""
+        with self._lock:
+            return dict(self._stats,
+                        name=self.name,
+                        idle=sum(len(connections) for connections in self._idle.values()),
+                        in_use=sum(self._in_use.values()),
+                        accounts=len(set(self._idle) | {key for key, count in self._in_use.items() if count}))
+
+    def _release_slot(self, key: Hashable):
+        """Give back a reserved slot without returning a connection"""
+        with self._lock:
+            self._in_use[key] = max(0, self._in_use.get(key, 0) - 1)
+            self._lock.notify()
+
+    def _reap_expired(self):
+        """Close connections that idled past the timeout; caller holds the lock"""
+        now = time.monotonic()
+        for key in list(self._idle):
+            fresh = []
+            for conn, last_used in self._idle[key]:
+                if now - last_used > self.idle_timeout:
+                    # Closing may block on the network, so hand it to a short-lived thread
+                    threading.Thread(target=self._close_quietly, args=(conn,), daemon=True).start()
+                else:
+                    fresh.append((conn, last_used))
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+
+    def _close_quietly(self, conn: Any):
+        """Close a connection, ignoring errors"""
+        try:
+            self._close(conn)
+        except Exception:
+            pass
+        with self._lock:
+            self._stats['closed'] += 1
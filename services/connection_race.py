@@ -0,0 +1,240 @@
+"""
+Connection Race Module
+
+Provides concurrent connection attempts under a shared deadline including:
+- Racing candidates with staggered starts, where the first success wins
+- Cancelling the attempts that lost by shutting down their sockets
+- Happy Eyeballs (RFC 8305) TCP connects that race IPv6 and IPv4 addresses
+"""
+
+import logging
+import queue
+import socket
+import threading
+import time
+from typing import List, Tuple, Optional, Any, Callable, Sequence
+
+logger = logging.getLogger(__name__)
+
+HAPPY_EYEBALLS_DELAY = 0.25  # Seconds before the next address is tried while one is still connecting
+
+
+class RaceAttempt:
+    """
+    One running candidate of a race
+
+    Handles:
+    - Tracking the sockets the candidate opened, so it can be cancelled
+    - Deciding atomically whether the candidate finished before it was cancelled
+    """
+
+    def __init__(self, parent: Optional['RaceAttempt'] = None):
+        """
+        Initialize an attempt
+
+        Args:
+            parent: Attempt of an enclosing race whose cancellation also cancels this one
+        """
+        self.parent = parent
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._sockets: List[socket.socket] = []
+
+    def register(self, sock: socket.socket):
+        """
+        Track a socket opened by this attempt
+
+        Args:
+            sock: Socket to shut down on cancellation
+
+        Raises:
+            ConnectionAbortedError: If the attempt was already cancelled
+        """
+        with self._lock:
+            if self.cancelled:
+                sock.close()
+                raise ConnectionAbortedError("Connection attempt was cancelled")
+            self._sockets.append(sock)
+        if self.parent is not None:
+            self.parent.register(sock)
+
+    def cancel(self):
+        """Stop the attempt, making its blocked socket calls fail right away"""
+        with self._lock:
+            self.cancelled = True
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def finish(self, report: Callable[[], None]) -> bool:
+        """
+        Report a result unless the attempt was cancelled in the meantime
+
+        Args:
+            report: Called under the attempt's lock when not cancelled
+
+        Returns:
+            False if the attempt was cancelled and the caller must discard its result
+        """
+        with self._lock:
+            if self.cancelled:
+                return False
+            report()
+            return True
+
+
+def remaining(deadline: float) -> float:
+    """Seconds left until a time.monotonic() deadline, never negative"""
+    return max(0.0, deadline - time.monotonic())
+
+
+def race(candidates: Sequence[Any], attempt: Callable[[Any, RaceAttempt], Any],
+         deadline: float, delays: Sequence[float], discard: Callable[[Any], None],
+         errors: Optional[List[Tuple[Any, Exception]]] = None,
+         parent: Optional[RaceAttempt] = None) -> Optional[Tuple[Any, Any]]:
+    """
+    Run candidates concurrently with staggered starts and keep the first success
+
+    A candidate starts once the previous one failed or its delay passed.
+    When one succeeds, or the deadline passes, every other attempt is
+    cancelled and results that arrive later are discarded.
+
+    Args:
+        candidates: Candidates in order of preference
+        attempt: Runs one candidate and returns its result, or raises
+        deadline: time.monotonic() value bounding the whole race
+        delays: Seconds to wait after starting candidate i before starting the next;
+            the last value is reused for the remaining candidates
+        discard: Releases a result that lost the race, e.g. closes a connection
+        errors: Optional list receiving (candidate, error) for failed candidates
+        parent: Optional attempt of an enclosing race
+
+    Returns:
+        Tuple of (candidate, result) of the winner, or None if every candidate failed or time ran out
+    """
+    if errors is None:
+        errors = []
+    outcomes = queue.Queue()
+    attempts: List[RaceAttempt] = []
+
+    def run(candidate: Any, current: RaceAttempt):
+        try:
+            result = attempt(candidate, current)
+        except Exception as e:
+            error = e
+            current.finish(lambda: outcomes.put((candidate, current, None, error)))
+            return
+        if not current.finish(lambda: outcomes.put((candidate, current, result, None))):
+            discard(result)
+
+    winner = None
+    started = 0
+    running = 0
+    try:
+        while True:
+            if started < len(candidates) and (parent is None or not parent.cancelled):
+                current = RaceAttempt(parent)
+                attempts.append(current)
+                threading.Thread(target=run, args=(candidates[started], current),
+                                 name='connection-race', daemon=True).start()
+                started += 1
+                running += 1
+
+            left = remaining(deadline)
+            if running == 0 or left <= 0:
+                break
+
+            wait = left
+            if started < len(candidates):
+                wait = min(left, delays[min(started - 1, len(delays) - 1)])
+            try:
+                candidate, current, result, error = outcomes.get(timeout=wait)
+            except queue.Empty:
+                # Still running, but the next candidate is due
+                continue
+
+            running -= 1
+            if error is None:
+                winner = (candidate, current, result)
+                break
+            errors.append((candidate, error))
+    finally:
+        for current in attempts:
+            if winner is None or current is not winner[1]:
+                current.cancel()
+        # Results reported before the cancellation are still queued
+        while not outcomes.empty():
+            candidate, current, result, error = outcomes.get_nowait()
+            if error is None and (winner is None or current is not winner[1]):
+                discard(result)
+
+    if winner is None:
+        if started < len(candidates) or running:
+            errors.append((None, TimeoutError("Connection deadline exceeded")))
+        return None
+    return winner[0], winner[2]
+
+
+def _interleave_families(infos: List[Tuple]) -> List[Tuple]:
+    """Alternate address families, keeping the resolver's preference for the first one"""
+    if not infos:
+        return infos
+    first_family = infos[0][0]
+    preferred = [info for info in infos if info[0] == first_family]
+    others = [info for info in infos if info[0] != first_family]
+    interleaved = []
+    for index in range(max(len(preferred), len(others))):
+        interleaved.extend(group[index] for group in (preferred, others) if index < len(group))
+    return interleaved
+
+
+def connect_socket(host: str, port: int, deadline: float, timeout: Optional[float] = None,
+                   attempt: Optional[RaceAttempt] = None) -> socket.socket:
+    """
+    Open a TCP connection, racing the host's addresses Happy Eyeballs style
+
+    Args:
+        host: Host name or address
+        port: TCP port
+        deadline: time.monotonic() value by which the connection must be established
+        timeout: Socket timeout to set once connected; defaults to the time left
+        attempt: Optional attempt whose cancellation aborts the connect
+
+    Returns:
+        Connected socket
+
+    Raises:
+        OSError: If no address accepted the connection before the deadline
+    """
+    infos = _interleave_families(socket.getaddrinfo(host, port, type=socket.SOCK_STREAM))
+    if not infos:
+        raise OSError(f"No addresses found for {host}")
+
+    def open_address(info: Tuple, current: RaceAttempt) -> socket.socket:
+        family, type_, proto, _, address = info
+        sock = socket.socket(family, type_, proto)
+        current.register(sock)
+        try:
+            left = remaining(deadline)
+            if left <= 0:
+                raise TimeoutError("Connection deadline exceeded")
+            sock.settimeout(left)
+            sock.connect(address)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    errors: List[Tuple[Any, Exception]] = []
+    winner = race(infos, open_address, deadline, [HAPPY_EYEBALLS_DELAY],
+                  discard=lambda sock: sock.close(), errors=errors, parent=attempt)
+    if winner is None:
+        raise errors[-1][1] if errors else TimeoutError(f"Connecting to {host}:{port} timed out")
+
+    sock = winner[1]
+    # A zero timeout would make the socket non-blocking, so keep a minimal one
+    sock.settimeout(timeout if timeout is not None else max(remaining(deadline), 0.001))
+    return sock
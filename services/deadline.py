@@ -0,0 +1,95 @@
+"""
+Deadline Module
+
+Provides end-to-end time budgets for mail server work including:
+- A deadline created per request and handed to every connection it uses
+- Socket timeouts bounded by the time left instead of fixed per-call timeouts
+- Failing fast once the budget is spent
+"""
+
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when mail server work runs past the deadline of its request"""
+    pass
+
+
+class Deadline:
+    """
+    Point in time by which a request's mail server work must be done
+
+    Handles:
+    - Reporting the time left
+    - Turning the time left into socket timeouts, capped by a regular timeout
+    - Raising DeadlineExceeded once it passed
+    """
+
+    def __init__(self, budget: float):
+        """
+        Start a deadline
+
+        Args:
+            budget: Seconds from now until the deadline
+        """
+        self.budget = budget
+        self.expires = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        """Whether the deadline passed"""
+        return time.monotonic() >= self.expires
+
+    def check(self, operation: str = 'Request'):
+        """
+        Fail if the deadline passed
+
+        Args:
+            operation: Name of the work about to start, used in the error message
+
+        Raises:
+            DeadlineExceeded: If no time is left
+        """
+        if self.expired():
+            raise DeadlineExceeded(f"{operation} exceeded the {self.budget:g}s request deadline")
+
+    def timeout(self, limit: Optional[float] = None, operation: str = 'Request') -> float:
+        """
+        Get the timeout for the next blocking call
+
+        Args:
+            limit: Regular timeout of the call; the result never exceeds it
+            operation: Name of the call, used in the error message
+
+        Returns:
+            Seconds the call may block
+
+        Raises:
+            DeadlineExceeded: If no time is left
+        """
+        self.check(operation)
+        left = self.remaining()
+        return min(left, limit) if limit is not None else left
+
+
+def bounded_timeout(deadline: Optional[Deadline], limit: Optional[float],
+                    operation: str = 'Request') -> Optional[float]:
+    """
+    Get a timeout bounded by an optional deadline
+
+    Args:
+        deadline: Deadline of the current request, or None for background work
+        limit: Regular timeout
+        operation: Name of the call, used in the error message
+
+    Returns:
+        The regular timeout, shortened to the time left when there is a deadline
+
+    Raises:
+        DeadlineExceeded: If the deadline passed
+    """
+    return deadline.timeout(limit, operation) if deadline is not None else limit
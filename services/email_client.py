@@ -11,30 +11,90 @@ import imaplib
 import smtplib
 import email
 import base64
+import hashlib
 import logging
+import os
+import quopri
 import re
+import tempfile
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
+from email.mime.base import MIMEBase
 from email.header import decode_header
+from html import unescape
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional, Any, Union
-
-from services.email_connection import EmailConnection
+from typing import Dict, List, Tuple, Optional, Any, Union, NamedTuple, Iterator, Iterable, BinaryIO
+
+from services.connection_pool import ConnectionPool
+from services.deadline import Deadline, bounded_timeout
+from services.email_connection import EmailConnection, LoginRefusedError
+from services.folder_roles import AccountFolderRoles, folder_type, resolve_roles
+from services.imap_capabilities import ServerCapabilities, capability_registry
+from services.imap_parser import (parse_fetch_response, parse_envelope, parse_bodystructure, attachment_parts,
+                                  parse_sequence_set, format_sequence_set, parse_status_response,
+                                  parse_list_response, parse_esearch_response)
+from services.imap_pipeline import ImapPipeline
+from services.message_cache import MessageCache
+from services.mime_stream import create_decoder, detect_base64_layout, message_bytes, write_multipart
+from services.search_query import parse_query, compile_imap
+from services.server_strategies import AccountServerStrategies
+from services.smtp_pipeline import send_pipelined
 
 logger = logging.getLogger(__name__)
 
+# Items fetched for list views - enough to render a mailbox row without the message body
+LIST_FETCH_ITEMS = '(UID FLAGS RFC822.SIZE INTERNALDATE ENVELOPE BODYSTRUCTURE)'
+
+# Items fetched for the message view - headers and structure, text parts are fetched separately
+VIEW_FETCH_ITEMS = '(UID FLAGS BODYSTRUCTURE BODY.PEEK[HEADER])'
+
+# IMAP section numbers such as '2' or '1.3'
+PART_ID_PATTERN = re.compile(r'^[1-9]\d*(\.[1-9]\d*)*$')
+
+# Encoded bytes fetched per round trip when streaming an attachment
+ATTACHMENT_CHUNK_SIZE = 512 * 1024
+
+# Encoded bytes probed at both ends of a base64 attachment to work out its exact size
+ATTACHMENT_PROBE_SIZE = 4096
+
+# Attachments up to this encoded size are fetched whole and kept in the message cache
+CACHED_ATTACHMENT_SIZE = 256 * 1024
+
+# Headers fetched for the local search index, including what's needed to decode the body
+SEARCH_HEADER_FIELDS = 'SUBJECT FROM TO CC DATE MIME-VERSION CONTENT-TYPE CONTENT-TRANSFER-ENCODING'
+
+# Counters shown next to folders
+FOLDER_STATUS_ITEMS = '(MESSAGES UNSEEN UIDNEXT)'
+
+
+class MessageKey(NamedTuple):
+    """Stable identity of a message that survives expunges in its folder"""
+    folder: str
+    uidvalidity: int
+    uid: int
+
+
+class StaleMessageError(Exception):
+    """Raised when a message key refers to a previous UIDVALIDITY of its folder"""
+
+
+def _leaf_parts(msg: email.message.Message, prefix: str = ''):
+    """Yield (part_id, part) for the leaf parts of a message, numbered like IMAP sections"""
+    if msg.get_content_maintype() == 'multipart' and msg.is_multipart():
+        for index, child in enumerate(msg.get_payload(), start=1):
+            yield from _leaf_parts(child, f'{prefix}.{index}' if prefix else str(index))
+    else:
+        yield prefix or '1', msg
+
 
 def _extract_attachments(msg: email.message.Message) -> List[Dict[str, Any]]:
-    """Extract attachments with their content"""
+    """Extract attachment metadata; the content is fetched on demand by part id"""
     attachments = []
 
     if not msg.is_multipart():
         return attachments
 
-    for part in msg.walk():
-        if part.get_content_maintype() == 'multipart':
-            continue
+    for part_id, part in _leaf_parts(msg):
         if part.get('Content-Disposition') is None:
             continue
 
@@ -42,13 +102,12 @@ def _extract_attachments(msg: email.message.Message) -> List[Dict[str, Any]]:
         if filename:
             try:
                 payload = part.get_payload(decode=True)
-                if payload:
-                    attachments.append({
-                        'filename': filename,
-                        'content_type': part.get_content_type(),
-                        'size': len(payload),
-                        'content': base64.b64encode(payload).decode('utf-8')
-                    })
+                attachments.append({
+                    'part_id': part_id,
+                    'filename': filename,
+                    'content_type': part.get_content_type(),
+                    'size': len(payload) if payload else 0
+                })
             except Exception as e:
                 logger.warning(f"Failed to process attachment {filename}: {e}")
 
@@ -96,6 +155,158 @@ def _extract_email_body(msg: email.message.Message) -> Tuple[str, str]:
     return plain_body, html_body
 
 
+def _parse_internaldate(value: Optional[str]) -> Optional[datetime]:
+    """Parse an IMAP INTERNALDATE value such as ' 1-Jan-2024 10:00:00 +0000'"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), '%d-%b-%Y %H:%M:%S %z')
+    except ValueError:
+        return None
+
+
+def _estimate_decoded_size(part: Dict[str, Any]) -> int:
+    """Estimate the decoded size of a body part from its encoded size"""
+    if part['encoding'] == 'base64':
+        # 76 characters per 78 byte line, 3 bytes per 4 characters
+        return part['size'] * 76 // 78 * 3 // 4
+    return part['size']
+
+
+def _decode_transfer_encoding(data: bytes, encoding: str) -> bytes:
+    """Undo the Content-Transfer-Encoding of a fetched body section"""
+    if isinstance(data, str):
+        # Short sections may come back as quoted strings rather than literals
+        data = data.encode('utf-8')
+    try:
+        if encoding == 'base64':
+            return base64.b64decode(data)
+        if encoding == 'quoted-printable':
+            return quopri.decodestring(data)
+    except Exception as e:
+        logger.warning(f"Failed to decode {encoding} body part: {e}")
+    return data
+
+
+def _decode_text_part(data: Optional[bytes], part: Dict[str, Any]) -> str:
+    """Decode a fetched text section using its transfer encoding and charset"""
+    if not data:
+        return ''
+    payload = _decode_transfer_encoding(data, part['encoding'])
+    charset = part['params'].get('charset') or 'utf-8'
+    try:
+        return payload.decode(charset, errors='replace')
+    except LookupError:
+        return payload.decode('utf-8', errors='replace')
+
+
+def _body_text_parts(parts: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Pick the first inline text/plain and text/html parts of a BODYSTRUCTURE"""
+    text_parts = {}
+    for part in parts:
+        if part['disposition'] == 'attachment':
+            continue
+        kind = {'text/plain': 'plain', 'text/html': 'html'}.get(part['content_type'])
+        if kind and kind not in text_parts:
+            text_parts[kind] = part
+    return text_parts
+
+
+def _as_bytes(value: Any) -> bytes:
+    """Convert a fetched literal or quoted string into bytes"""
+    if value is None:
+        return b''
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return value
+
+
+def _attachment_chunks(attachment: Dict[str, Any]) -> Optional[Iterable[bytes]]:
+    """Content source of an outgoing attachment, read lazily so large files stay on disk"""
+    if attachment.get('path'):
+        def read_file():
+            with open(attachment['path'], 'rb') as f:
+                while True:
+                    chunk = f.read(ATTACHMENT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+        return read_file()
+    if attachment.get('chunks') is not None:
+        return attachment['chunks']
+    if attachment.get('content'):
+        return [base64.b64decode(attachment['content'])]
+    return None
+
+
+def _html_to_text(html: str) -> str:
+    """Reduce an HTML body to its visible text for indexing"""
+    html = re.sub(r'(?is)<(script|style)\b.*?</\1\s*>', ' ', html)
+    text = re.sub(r'(?s)<[^>]+>', ' ', html)
+    return re.sub(r'\s+', ' ', unescape(text)).strip()
+
+
+def _expand_ordered_set(value: str) -> List[int]:
+    """Expand a short sequence set such as '9:7,12' keeping the written order"""
+    numbers = []
+    for member in value.split(','):
+        member = member.strip()
+        if ':' in member:
+            start, end = (int(number) for number in member.split(':', 1))
+            step = 1 if end >= start else -1
+            numbers.extend(range(start, end + step, step))
+        elif member:
+            numbers.append(int(member))
+    return numbers
+
+
+def _check_imap(conn: imaplib.IMAP4):
+    """Health check for pooled IMAP sessions"""
+    status, _ = conn.noop()
+    if status != 'OK':
+        raise imaplib.IMAP4.abort(f"NOOP returned {status}")
+
+
+def create_imap_pool(max_per_account: int = 3, idle_timeout: float = 300) -> ConnectionPool:
+    """
+    Create a pool of authenticated IMAP sessions keyed by account
+
+    Args:
+        max_per_account: Maximum concurrent sessions per account
+        idle_timeout: Seconds after which idle sessions are logged out
+
+    Returns:
+        ConnectionPool for use with EmailClient
+    """
+    return ConnectionPool('IMAP', check=_check_imap, close=lambda conn: conn.logout(),
+                          max_per_key=max_per_account, idle_timeout=idle_timeout)
+
+
+def _check_smtp(conn: smtplib.SMTP):
+    """Health check for pooled SMTP sessions, also clearing any leftover transaction"""
+    code, reply = conn.rset()
+    if code != 250:
+        raise smtplib.SMTPServerDisconnected(f"RSET returned {code}")
+
+
+def create_smtp_pool(max_per_account: int = 2, idle_timeout: float = 60) -> ConnectionPool:
+    """
+    Create a pool of authenticated SMTP sessions keyed by account
+
+    SMTP servers drop idle clients after a few minutes, so sessions idle
+    for much shorter than IMAP ones.
+
+    Args:
+        max_per_account: Maximum concurrent sessions per account
+        idle_timeout: Seconds after which idle sessions are closed with QUIT
+
+    Returns:
+        ConnectionPool for use with EmailClient
+    """
+    return ConnectionPool('SMTP', check=_check_smtp, close=lambda conn: conn.quit(),
+                          max_per_key=max_per_account, idle_timeout=idle_timeout)
+
+
 def _decode_email_header(header: Optional[str]) -> str:
     """Decode email headers that may contain non-ASCII characters or encoded words"""
     if not header:
@@ -116,6 +327,16 @@ def _decode_email_header(header: Optional[str]) -> str:
     return ' '.join(decoded_parts)
 
 
+def _attachment_metadata(parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Describe the attachments of a BODYSTRUCTURE without their content"""
+    return [{
+        'part_id': part['part_id'],
+        'filename': _decode_email_header(part['filename']),
+        'content_type': part['content_type'],
+        'size': _estimate_decoded_size(part)
+    } for part in attachment_parts(parts)]
+
+
 class EmailClient:
     """
     Full-featured email client with IMAP and SMTP functionality
@@ -130,7 +351,14 @@ class EmailClient:
     def __init__(self, imap_server: str, smtp_server: str,
                  username: str, password: str,
                  imap_port: int = 993, smtp_port: int = 587,
-                 enable_verbose_logs: bool = False):
+                 enable_verbose_logs: bool = False,
+                 imap_pool: Optional[ConnectionPool] = None,
+                 smtp_pool: Optional[ConnectionPool] = None,
+                 folder_roles: Optional[AccountFolderRoles] = None,
+                 message_cache: Optional[MessageCache] = None,
+                 server_strategies: Optional[AccountServerStrategies] = None,
+                 deadline: Optional[Deadline] = None,
+                 account_id: Optional[int] = None):
         """
         Initialize a new email client instance
 
@@ -142,6 +370,17 @@ class EmailClient:
             imap_port: IMAP port, usually 993 for SSL
             smtp_port: SMTP port, usually 587 for STARTTLS
             enable_verbose_logs: Set to True to enable detailed connection logs
+            imap_pool: Optional shared pool to borrow authenticated IMAP sessions from
+            smtp_pool: Optional shared pool to borrow authenticated SMTP sessions from
+            folder_roles: Optional cache of the account's folder roles, so they are resolved only once
+            message_cache: Optional shared cache of parsed messages, so viewing a message and
+                downloading its attachments don't fetch the same data repeatedly
+            server_strategies: Optional store of the account's working connection strategies,
+                so they are tried first after a restart
+            deadline: Optional deadline of the request using the client, bounding every
+                IMAP and SMTP call it makes; background work runs without one
+            account_id: Optional EmailSettings id, so pooled sessions and cached messages
+                are never shared between accounts with the same login
         """
         # Store connection details
         self.imap_server = imap_server
@@ -150,20 +389,39 @@ class EmailClient:
         self.password = password
         self.imap_port = imap_port
         self.smtp_port = smtp_port
+        self.account_id = account_id
+
+        # Pooled sessions are keyed by the password too, so a changed password never reuses them
+        self._credentials = hashlib.sha256(password.encode('utf-8')).hexdigest() if password else None
 
         # Initialize connection objects
         self.imap = None
         self.smtp = None
+        self._imap_pool = imap_pool
+        self._smtp_pool = smtp_pool
+
+        # Last seen UIDVALIDITY per folder, used to build stable message keys
+        self.uidvalidity = {}
+
+        # Folder per special role, loaded from the cache or resolved on first use
+        self._folder_roles = folder_roles
+        self._roles = None
+
+        # Parsed messages shared across requests
+        self._message_cache = message_cache
+
+        # Connection strategies that worked before
+        self._server_strategies = server_strategies
+
+        # Time budget of the request, shared by all its mail server calls
+        self.deadline = deadline
 
         # Create a connection manager instance for this client
         self._connection_manager = EmailConnection()
 
-        # Configure extended timeout for larger mailboxes
+        # Configure extended timeout for larger mailboxes; a request deadline shortens it
         self._connection_manager.set_timeout(60)
 
-        # More aggressive retry policy
-        self._connection_manager.set_retry_policy(max_retries=2, retry_delay=1)
-
         # Reduce log verbosity by default
         self._connection_manager.set_verbosity(enable_verbose_logs)
 
@@ -179,6 +437,9 @@ class EmailClient:
         """
         # Reuse existing connection if available and valid
         if self.imap and self.imap.state != 'LOGOUT':
+            if self._imap_pool:
+                # Pooled sessions are health checked when they are handed out
+                return self.imap
             try:
                 # Test if connection is still alive with a simple command
                 self.imap.noop()
@@ -188,18 +449,106 @@ class EmailClient:
                 # Connection is stale, create a new one
                 self.imap = None
 
-        # Create new connection with all security options as fallbacks
-        self.imap = self._connection_manager.create_imap_connection(
-            self.imap_server,
-            self.username,
-            self.password,
-            self.imap_port,
-            use_ssl=True,
-            verify_cert=False,  # Disable verification for problem emails
-            allow_insecure=True  # Allow insecure as last resort
-        )
+        if self._imap_pool:
+            self.imap = self._imap_pool.acquire(
+                self._imap_pool_key(), self._open_imap,
+                timeout=bounded_timeout(self.deadline, self._imap_pool.acquire_timeout, 'Waiting for an IMAP session'),
+                prepare=self._apply_deadline)
+        else:
+            self.imap = self._open_imap()
         return self.imap
 
+    def _imap_pool_key(self) -> Tuple[str, int, str, Optional[int], Optional[str]]:
+        """Key identifying this account's sessions in the IMAP pool, and its messages in the cache"""
+        return (self.imap_server, self.imap_port, self.username, self.account_id, self._credentials)
+
+    def _open_imap(self) -> imaplib.IMAP4:
+        """Open and authenticate a new IMAP session"""
+        # Create new connection with all security options as fallbacks
+        try:
+            imap = self._connection_manager.create_imap_connection(
+                self.imap_server,
+                self.username,
+                self.password,
+                self.imap_port,
+                use_ssl=True,
+                verify_cert=False,  # Disable verification for problem emails
+                allow_insecure=True,  # Allow insecure as last resort
+                saved_strategies=self._server_strategies,
+                deadline=self.deadline
+            )
+        except LoginRefusedError:
+            # Sessions and messages obtained with these credentials must not outlive them
+            if self._imap_pool:
+                self._imap_pool.evict(self._imap_pool_key())
+            if self._message_cache is not None:
+                self._message_cache.discard_account(self._imap_pool_key())
+            raise
+        self._enable_extensions(imap)
+        return imap
+
+    def _apply_deadline(self, conn: Union[imaplib.IMAP4, smtplib.SMTP]):
+        """Bound a session's socket calls by this client's deadline"""
+        conn.set_deadline(self.deadline)
+
+    def set_deadline(self, deadline: Optional[Deadline]):
+        """
+        Change the deadline bounding this client's IMAP and SMTP calls
+
+        Args:
+            deadline: New deadline, or None to fall back to the regular socket timeouts,
+                e.g. while streaming a download that may outlast the request budget
+        """
+        self.deadline = deadline
+        for conn in (self.imap, self.smtp):
+            if conn is not None:
+                conn.set_deadline(deadline)
+
+    def _server_name(self) -> str:
+        """Identifier of the IMAP server in capability caches and logs"""
+        return f"{self.imap_server}:{self.imap_port}"
+
+    def _capabilities(self, imap: imaplib.IMAP4) -> ServerCapabilities:
+        """Capabilities of a connection, parsed once and preferring the post-login list"""
+        # Servers commonly send an updated list in the LOGIN response code
+        post_login = imap.untagged_responses.pop('CAPABILITY', None)
+        if post_login and post_login[-1]:
+            imap.capabilities = tuple(post_login[-1].decode('ascii', errors='replace').upper().split())
+            imap.server_capabilities = None
+
+        if getattr(imap, 'server_capabilities', None) is None:
+            imap.server_capabilities = capability_registry.parse(self._server_name(), imap.capabilities)
+        return imap.server_capabilities
+
+    def _strategy(self, imap: imaplib.IMAP4, operation: str) -> str:
+        """Pick the cheapest strategy the server supports for an operation, recording the choice"""
+        return capability_registry.choose(self._server_name(), self._capabilities(imap), operation)
+
+    def strategy(self, operation: str) -> str:
+        """
+        Get the strategy an operation uses on this account's server
+
+        Args:
+            operation: Operation name from imap_capabilities.STRATEGIES, e.g. 'watch'
+
+        Returns:
+            Strategy name
+        """
+        return self._strategy(self.connect_imap(), operation)
+
+    def _enable_extensions(self, imap: imaplib.IMAP4):
+        """Enable QRESYNC or CONDSTORE so selects report HIGHESTMODSEQ"""
+        capabilities = self._capabilities(imap)
+        for extension in ('QRESYNC', 'CONDSTORE'):
+            if capabilities.has('ENABLE', extension):
+                try:
+                    imap.enable(extension)
+                    imap.enabled_extensions = extension
+                    return
+                except Exception as e:
+                    logger.warning(f"Failed to enable {extension}: {str(e)}")
+        imap.enabled_extensions = None
+
     def connect_smtp(self) -> smtplib.SMTP:
         """
         Connect to the SMTP server, reusing existing connection if available
@@ -210,8 +559,11 @@ class EmailClient:
         Raises:
             ConnectionError: If connection fails
         """
-        # SMTP connections typically shouldn't be reused for long periods
-        # Create a fresh connection each time
+        if self.smtp and self._smtp_pool and self.smtp.sock:
+            # Pooled sessions are health checked when they are handed out
+            return self.smtp
+
+        # Without a pool, sessions are not kept open between sends
         if self.smtp:
             try:
                 self.smtp.quit()
@@ -219,33 +571,143 @@ class EmailClient:
                 pass
             self.smtp = None
 
-        self.smtp = self._connection_manager.create_smtp_connection(
-            self.smtp_server,
-            self.username,
-            self.password,
-            self.smtp_port,
-            use_ssl=True,
-            verify_cert=False,  # Disable verification for problem emails
-            allow_insecure=True  # Allow insecure as last resort
-        )
+        if self._smtp_pool:
+            self.smtp = self._smtp_pool.acquire(
+                self._smtp_pool_key(), self._open_smtp,
+                timeout=bounded_timeout(self.deadline, self._smtp_pool.acquire_timeout, 'Waiting for an SMTP session'),
+                prepare=self._apply_deadline)
+        else:
+            self.smtp = self._open_smtp()
         return self.smtp
 
+    def _smtp_pool_key(self) -> Tuple[str, int, str, Optional[int], Optional[str]]:
+        """Key identifying this account's sessions in the SMTP pool"""
+        return (self.smtp_server, self.smtp_port, self.username, self.account_id, self._credentials)
+
+    def _open_smtp(self) -> smtplib.SMTP:
+        """Open and authenticate a new SMTP session"""
+        try:
+            return self._connection_manager.create_smtp_connection(
+                self.smtp_server,
+                self.username,
+                self.password,
+                self.smtp_port,
+                use_ssl=True,
+                verify_cert=False,  # Disable verification for problem emails
+                allow_insecure=True,  # Allow insecure as last resort
+                saved_strategies=self._server_strategies,
+                deadline=self.deadline
+            )
+        except LoginRefusedError:
+            # Sessions logged in with these credentials must not outlive them
+            if self._smtp_pool:
+                self._smtp_pool.evict(self._smtp_pool_key())
+            raise
+
     def disconnect(self):
-        """Close all connections gracefully"""
-        if self.imap:
+        """Close all connections gracefully, returning pooled sessions to their pool"""
+        if self.imap and self._imap_pool:
+            # Pending tagged commands mean a command was interrupted mid-response
+            reusable = self.imap.state in ('AUTH', 'SELECTED') and not self.imap.tagged_commands
+            self.imap.untagged_responses.clear()
+            if reusable:
+                # Broken sessions keep the deadline, so logging them out fails fast
+                self.imap.set_deadline(None)
+            self._imap_pool.release(self._imap_pool_key(), self.imap, reusable)
+            self.imap = None
+        elif self.imap:
             try:
                 self.imap.logout()
             except:
                 pass
             self.imap = None
 
-        if self.smtp:
+        if self.smtp and self._smtp_pool:
+            # smtplib drops the socket when the session broke
+            if self.smtp.sock is not None:
+                self.smtp.set_deadline(None)
+            self._smtp_pool.release(self._smtp_pool_key(), self.smtp, self.smtp.sock is not None)
+            self.smtp = None
+        elif self.smtp:
             try:
                 self.smtp.quit()
             except:
                 pass
             self.smtp = None
 
+    def _select(self, imap: imaplib.IMAP4, folder: str, readonly: bool = True) -> Dict[str, int]:
+        """
+        Select a folder and collect its UID state
+
+        Args:
+            imap: IMAP connection
+            folder: Folder name to select
+            readonly: Use EXAMINE semantics so fetches don't set \\Seen
+
+        Returns:
+            Dictionary with 'exists', 'uidvalidity', 'uidnext' and 'highestmodseq' counters
+
+        Raises:
+            Exception: If the folder cannot be selected
+        """
+        status, data = imap.select(f'"{folder}"', readonly=readonly)
+        if status != 'OK':
+            raise Exception(f"Failed to select folder: {folder}")
+
+        _, uidvalidity = imap.response('UIDVALIDITY')
+        _, uidnext = imap.response('UIDNEXT')
+        _, highestmodseq = imap.response('HIGHESTMODSEQ')
+
+        state = {
+            'exists': int(data[0] or 0),
+            'uidvalidity': int(uidvalidity[-1]) if uidvalidity and uidvalidity[-1] else 0,
+            'uidnext': int(uidnext[-1]) if uidnext and uidnext[-1] else 0,
+            'highestmodseq': int(highestmodseq[-1]) if highestmodseq and highestmodseq[-1] else 0
+        }
+        self.uidvalidity[folder] = state['uidvalidity']
+        return state
+
+    def _check_uidvalidity(self, folder: str, uidvalidity: Optional[int]):
+        """Reject message keys that were issued for an earlier UIDVALIDITY"""
+        if uidvalidity is not None and self.uidvalidity.get(folder) != int(uidvalidity):
+            raise StaleMessageError(
+                f"UIDVALIDITY of {folder} changed from {uidvalidity} to {self.uidvalidity.get(folder)}")
+
+    def message_key(self, folder: str, uid: Union[int, str]) -> MessageKey:
+        """
+        Build the stable key of a message in a folder selected earlier by this client
+
+        Args:
+            folder: Folder name
+            uid: Message UID
+
+        Returns:
+            MessageKey of (folder, UIDVALIDITY, UID)
+        """
+        return MessageKey(folder, self.uidvalidity.get(folder, 0), int(uid))
+
+    def _cache_key(self, folder: str, uid: Union[int, str]) -> Optional[Tuple[Any, ...]]:
+        """Key of a message in the shared message cache, or None when there is nothing to key it by"""
+        if self._message_cache is None or not self.uidvalidity.get(folder):
+            return None
+        return (self._imap_pool_key(),) + tuple(self.message_key(folder, uid))
+
+    def _cached(self, folder: str, uid: Union[int, str]) -> Optional[Dict[str, Any]]:
+        """Get the cached entry of a message in a selected folder"""
+        key = self._cache_key(folder, uid)
+        return self._message_cache.get(key) if key else None
+
+    def _cache(self, folder: str, uid: Union[int, str], **fields: Any):
+        """Add fields to the cached entry of a message in a selected folder"""
+        key = self._cache_key(folder, uid)
+        if key:
+            self._message_cache.update(key, **fields)
+
+    def _uncache(self, folder: str, uids: List[Union[int, str]]):
+        """Drop cached entries of messages that left a folder"""
+        if self._message_cache is not None and self.uidvalidity.get(folder):
+            self._message_cache.discard([self._cache_key(folder, uid) for uid in uids])
+
     def get_folders(self) -> List[Dict[str, Any]]:
         """
         Get all available mailbox folders with proper hierarchy structure
@@ -257,87 +719,169 @@ class EmailClient:
             Exception: If folder retrieval fails
         """
         imap = self.connect_imap()
-        status, folders_raw = imap.list()
+        mailboxes, counters = self._list_folders(imap)
+
+        # Create structured folder hierarchy
+        return self._parse_folder_structure(mailboxes, counters)
+
+    def _list_folders(self, imap: imaplib.IMAP4) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, int]]]:
+        """
+        List all folders together with their STATUS counters
+
+        Uses LIST-STATUS (RFC 5819) to get everything in one round trip when the
+        server supports it, and pipelined STATUS commands otherwise.
+
+        Args:
+            imap: IMAP connection
 
+        Returns:
+            Tuple of (mailboxes, counters by folder name)
+
+        Raises:
+            Exception: If the folder list cannot be retrieved
+        """
+        if self._strategy(imap, 'list_folders') == 'list-status':
+            try:
+                imap.untagged_responses.pop('STATUS', None)
+                status, data = imap.list('""', f'"*" RETURN (STATUS {FOLDER_STATUS_ITEMS})')
+                if status == 'OK':
+                    _, status_data = imap.response('STATUS')
+                    return parse_list_response(data), parse_status_response(status_data)
+            except imap.abort:
+                raise
+            except imap.error as e:
+                logger.warning(f"LIST-STATUS failed, falling back to STATUS: {str(e)}")
+
+        status, data = imap.list()
         if status != 'OK':
             raise Exception("Failed to get folders")
 
-        # Create structured folder hierarchy
-        return self._parse_folder_structure(folders_raw)
+        mailboxes = parse_list_response(data)
+        selectable = [mailbox['name'] for mailbox in mailboxes if self._is_selectable(mailbox)]
+        return mailboxes, self._status_many(imap, selectable)
 
-    def _parse_folder_structure(self, folders_raw: List[bytes]) -> List[Dict[str, Any]]:
+    def _is_selectable(self, mailbox: Dict[str, Any]) -> bool:
+        """Check whether a LIST entry names a folder that can hold messages"""
+        attributes = [attribute.lower() for attribute in mailbox['attributes']]
+        return '\\noselect' not in attributes and '\\nonexistent' not in attributes
+
+    def _status_many(self, imap: imaplib.IMAP4, folders: List[str],
+                     items: str = FOLDER_STATUS_ITEMS) -> Dict[str, Dict[str, int]]:
         """
-        Parse raw IMAP folder data into a structured hierarchy
+        Run STATUS for many folders, pipelining the commands
 
         Args:
-            folders_raw: Raw folder data from IMAP
+            imap: IMAP connection
+            folders: Folder names
+            items: Parenthesized STATUS data items
+
+        Returns:
+            Dictionary mapping folder name to its upper-cased counters
+        """
+        pipeline = ImapPipeline(imap, collect=('STATUS',))
+        for folder in folders:
+            pipeline.send('STATUS', f'"{folder}"', items, key=folder)
+
+        for result in pipeline.finish():
+            if result.status != 'OK':
+                logger.warning(f"Failed to get status of folder {result.key}: {result.message}")
+
+        return parse_status_response(pipeline.responses('STATUS'))
+
+    def _parse_folder_structure(self, mailboxes: List[Dict[str, Any]],
+                                counters: Dict[str, Dict[str, int]]) -> List[Dict[str, Any]]:
+        """
+        Turn parsed LIST entries into folder dictionaries
+
+        Args:
+            mailboxes: Parsed LIST entries
+            counters: STATUS counters by folder name
 
         Returns:
             Structured folder hierarchy
         """
-        # First pass: collect all folder names and identify delimiter
         all_folders = []
-        delimiter = '.'  # Default delimiter
+        for mailbox in mailboxes:
+            name = mailbox['name']
+            folder_counters = counters.get(name, {})
+
+            all_folders.append({
+                'name': name,
+                'attributes': ' '.join(mailbox['attributes']),
+                'path': name,
+                'delimiter': mailbox['delimiter'],
+                'type': folder_type(mailbox),
+                'unread': folder_counters.get('UNSEEN', 0),
+                'total': folder_counters.get('MESSAGES', 0)
+            })
+
+        return all_folders
+
+    def folder_role(self, role: str) -> Optional[str]:
+        """
+        Get the folder holding a special role such as 'sent' or 'trash'
+
+        Roles come from the account's cache when one was given, so only the
+        first lookup per account lists folders on the server.
 
-        for folder_raw in folders_raw:
+        Args:
+            role: Role name from folder_roles.ROLE_ATTRIBUTES
+
+        Returns:
+            Folder name, or None if the account has no such folder
+        """
+        if self._roles is None and self._folder_roles is not None:
+            self._roles = self._folder_roles.load()
+        if self._roles is None:
+            self._roles = self._discover_folder_roles(self.connect_imap())
+            if self._folder_roles is not None:
+                self._folder_roles.save(self._roles)
+        return self._roles.get(role)
+
+    def invalidate_folder_roles(self):
+        """Forget resolved folder roles after the folder hierarchy changed"""
+        self._roles = None
+        if self._folder_roles is not None:
             try:
-                # Parse folder data
-                decoded = folder_raw.decode('utf-8', errors='replace')
-
-                # Identify delimiter - common ones are ".", "/", or sometimes "%"
-                if '"."' in decoded:
-                    delimiter = '.'
-                elif '"/"' in decoded:
-                    delimiter = '/'
-                elif '"%"' in decoded:
-                    delimiter = '%'
-
-                # Extract folder name using regex to be more reliable
-                folder_match = re.search(r'"([^"]+)"$', decoded)
-                if folder_match:
-                    folder_name = folder_match.group(1)
-                    all_folders.append({
-                        'name': folder_name,
-                        'attributes': decoded.split('"')[1].strip(),
-                        'path': folder_name
-                    })
+                self._folder_roles.invalidate()
             except Exception as e:
-                logger.warning(f"Failed to parse folder data: {str(e)}")
-
-        # Add additional properties and structure to folders
-        for folder in all_folders:
-            # Check if this is an INBOX or special folder
-            if folder['name'].upper() == 'INBOX':
-                folder['type'] = 'inbox'
-            elif '\\Sent' in folder['attributes'] or 'Sent' in folder['name']:
-                folder['type'] = 'sent'
-            elif '\\Drafts' in folder['attributes'] or 'Draft' in folder['name']:
-                folder['type'] = 'drafts'
-            elif '\\Trash' in folder['attributes'] or 'Trash' in folder['name']:
-                folder['type'] = 'trash'
-            elif '\\Junk' in folder['attributes'] or 'Spam' in folder['name'] or 'Junk' in folder['name']:
-                folder['type'] = 'spam'
-            else:
-                folder['type'] = 'folder'
+                logger.warning(f"Failed to invalidate folder roles: {str(e)}")
+
+    def _discover_folder_roles(self, imap: imaplib.IMAP4) -> Dict[str, Optional[str]]:
+        """
+        Resolve folder roles from the server
+
+        Servers with SPECIAL-USE (RFC 6154) list just their special folders.
+        The full folder list is only needed for name heuristics when that
+        leaves the sent or trash folder unknown.
 
-            # Get unread count for each folder
+        Args:
+            imap: IMAP connection
+
+        Returns:
+            Dictionary mapping role to folder name or None
+        """
+        if self._strategy(imap, 'folder_roles') == 'list-special-use':
             try:
-                imap = self.connect_imap()
-                status, data = imap.select(f'"{folder["name"]}"', readonly=True)
+                status, data = imap.list('(SPECIAL-USE) ""', '"*"')
                 if status == 'OK':
-                    status, data = imap.search(None, 'UNSEEN')
-                    if status == 'OK':
-                        folder['unread'] = len(data[0].split())
-                    else:
-                        folder['unread'] = 0
-            except Exception as e:
-                logger.warning(f"Failed to get unread count for {folder['name']}: {str(e)}")
-                folder['unread'] = 0
-
-        return all_folders
+                    roles = resolve_roles(parse_list_response(data))
+                    if roles['sent'] and roles['trash']:
+                        return roles
+            except imap.abort:
+                raise
+            except imap.error as e:
+                logger.warning(f"LIST (SPECIAL-USE) failed, falling back to folder names: {str(e)}")
+            capability_registry.record(self._server_name(), 'folder_roles', 'list-names')
+
+        status, data = imap.list()
+        if status != 'OK':
+            raise Exception("Failed to get folders")
+        return resolve_roles(parse_list_response(data))
 
     def get_emails(self, folder: str, limit: int = 50, offset: int = 0,
-                   search_criteria: str = None) -> Tuple[List[Dict[str, Any]], int]:
+                   search_criteria: str = None,
+                   headers_only: bool = True) -> Tuple[List[Dict[str, Any]], int]:
         """
         Get emails from a specified folder
 
@@ -346,6 +890,7 @@ class EmailClient:
             limit: Maximum number of emails to fetch
             offset: Starting offset for pagination
             search_criteria: Optional IMAP search criteria
+            headers_only: Fetch only envelope data for list views instead of full messages
 
         Returns:
             Tuple of (email_list, total_count)
@@ -354,57 +899,473 @@ class EmailClient:
             Exception: If email retrieval fails
         """
         imap = self.connect_imap()
-        status, _ = imap.select(f'"{folder}"', readonly=True)
+        state = self._select(imap, folder)
+        items = LIST_FETCH_ITEMS if headers_only else '(UID RFC822 FLAGS)'
+
+        if search_criteria:
+            # Convert human-readable search to IMAP format
+            search_command = self._convert_search_to_imap(search_criteria)
+            email_ids_to_fetch, total_count = self._search_page(imap, search_command, offset, limit)
+            if not email_ids_to_fetch:
+                return [], total_count
+
+            # One UID FETCH for the whole page, demultiplexed by UID
+            records = self._fetch_records(imap, email_ids_to_fetch, items)
+            page = [records.get(int(email_id)) for email_id in email_ids_to_fetch]
+        else:
+            # Newest messages have the highest sequence numbers, so the page
+            # follows from the EXISTS count without searching at all
+            total_count = state['exists']
+            high = total_count - offset
+            low = max(1, high - limit + 1)
+            if high < 1:
+                return [], total_count
+
+            records = self._fetch_records(imap, [f'{low}:{high}'.encode('ascii')], items, by_uid=False)
+            page = sorted(records.values(), key=lambda record: record['SEQ'], reverse=True)
+
+        emails = []
+        for record in page:
+            if record is None:
+                logger.warning(f"Failed to fetch email in {folder}")
+                continue
+
+            email_id = str(record['UID'])
+            try:
+                if headers_only:
+                    email_data = self._parse_summary(record, email_id)
+                else:
+                    msg = email.message_from_bytes(record.get('RFC822') or b'')
+                    email_data = self._parse_email(msg, email_id, record.get('FLAGS') or [])
+                email_data['folder'] = folder
+                email_data['uidvalidity'] = self.uidvalidity[folder]
+                emails.append(email_data)
+            except Exception as e:
+                logger.warning(f"Failed to process email UID {email_id}: {str(e)}")
+                continue
+
+        return emails, total_count
+
+    def _search_page(self, imap: imaplib.IMAP4, criteria: str, offset: int,
+                     limit: int) -> Tuple[List[bytes], int]:
+        """
+        Find one page of matching UIDs, newest first, and the total match count
+
+        Prefers server-side windowing so only the requested page crosses the wire:
+        SORT with RETURN (PARTIAL) (RFC 5267), then SEARCH with RETURN (PARTIAL)
+        (RFC 9394), then SORT, ESEARCH and plain SEARCH.
+
+        Args:
+            imap: Connection with the folder already selected
+            criteria: IMAP search criteria
+            offset: Page offset
+            limit: Page size
+
+        Returns:
+            Tuple of (UIDs of the page, total number of matches)
 
+        Raises:
+            Exception: If the search fails
+        """
+        strategy = self._strategy(imap, 'search_page')
+
+        if strategy == 'sort-partial':
+            result = self._esearch(imap, 'SORT', f'RETURN (PARTIAL {offset + 1}:{offset + limit} COUNT)', '(REVERSE DATE)', 'UTF-8', criteria)
+            # The PARTIAL set lists UIDs in sort order, so ranges must keep their direction
+            uids = [str(uid).encode('ascii') for uid in _expand_ordered_set(result.get('PARTIAL', ('', ''))[1])]
+            return uids, result.get('COUNT', 0)
+
+        if strategy == 'search-partial':
+            # Negative ranges count from the newest match
+            result = self._esearch(imap, 'SEARCH', f'RETURN (PARTIAL -{offset + 1}:-{offset + limit} COUNT)', criteria)
+            uids = sorted((uid for start, end in parse_sequence_set(result.get('PARTIAL', ('', ''))[1])
+                           for uid in range(start, end + 1)), reverse=True)
+            return [str(uid).encode('ascii') for uid in uids], result.get('COUNT', 0)
+
+        if strategy == 'sort':
+            status, data = imap.uid('SORT', '(REVERSE DATE)', 'UTF-8', criteria)
+            if status != 'OK':
+                raise Exception(f"Sort failed: {criteria}")
+            uids = data[0].split() if data and data[0] else []
+            return uids[offset:offset + limit], len(uids)
+
+        if strategy == 'esearch':
+            # Ranges keep the result compact even for large match sets
+            result = self._esearch(imap, 'SEARCH', 'RETURN (ALL COUNT)', criteria)
+            ranges = parse_sequence_set(result.get('ALL', ''))
+            uids = self._newest_uids(ranges, offset, limit)
+            return [str(uid).encode('ascii') for uid in uids], result.get('COUNT', 0)
+
+        status, data = imap.uid('SEARCH', None, criteria)
         if status != 'OK':
-            raise Exception(f"Failed to select folder: {folder}")
+            raise Exception(f"Search failed: {criteria}")
+        uids = sorted((int(uid) for uid in data[0].split()), reverse=True) if data and data[0] else []
+        return [str(uid).encode('ascii') for uid in uids[offset:offset + limit]], len(uids)
+
+    def _esearch(self, imap: imaplib.IMAP4, command: str, *args: str) -> Dict[str, Any]:
+        """Run UID SEARCH or UID SORT with RETURN options and parse the ESEARCH reply"""
+        imap.untagged_responses.pop('ESEARCH', None)
+        status, _ = imap.uid(command, *args)
+        if status != 'OK':
+            raise Exception(f"{command} failed: {args[-1]}")
+        _, data = imap.response('ESEARCH')
+        return parse_esearch_response(data)
+
+    def _newest_uids(self, ranges: List[Tuple[int, int]], offset: int, limit: int) -> List[int]:
+        """Pick a newest-first page from UID ranges without expanding all of them"""
+        uids = []
+        skip = offset
+        for start, end in sorted(ranges, reverse=True):
+            size = end - start + 1
+            if skip >= size:
+                skip -= size
+                continue
+            top = end - skip
+            skip = 0
+            for uid in range(top, start - 1, -1):
+                uids.append(uid)
+                if len(uids) == limit:
+                    return uids
+        return uids
+
+    def _fetch_records(self, imap: imaplib.IMAP4, uids: List[bytes], items: str,
+                       by_uid: bool = True) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch several messages with a single FETCH command
 
-        # Default to getting all emails if no search criteria provided
-        if not search_criteria:
-            search_command = 'ALL'
+        Args:
+            imap: Connection with the folder already selected
+            uids: Message UIDs to fetch, or sequence numbers/ranges when by_uid is False
+            items: Parenthesized FETCH item list, which must include UID
+            by_uid: Use UID FETCH rather than a sequence number FETCH
+
+        Returns:
+            Dictionary mapping UID to parsed fetch record
+        """
+        uid_set = b','.join(uids).decode('ascii')
+        if by_uid:
+            status, msg_data = imap.uid('FETCH', uid_set, items)
         else:
-            # Convert human-readable search to IMAP format
-            search_command = self._convert_search_to_imap(search_criteria)
+            status, msg_data = imap.fetch(uid_set, items)
+        if status != 'OK':
+            raise Exception(f"Failed to fetch messages {uid_set}")
+
+        records = {}
+        for record in parse_fetch_response(msg_data):
+            # Unsolicited FLAGS updates for other messages carry no UID
+            if 'UID' in record:
+                records.setdefault(record['UID'], {}).update(record)
+        return records
+
+    def folder_status(self, folder: str) -> Dict[str, int]:
+        """
+        Get folder counters with STATUS, without selecting the folder
+
+        Args:
+            folder: Folder name
+
+        Returns:
+            Dictionary with 'exists', 'unseen', 'uidvalidity', 'uidnext' and 'highestmodseq'
+
+        Raises:
+            Exception: If the STATUS command fails
+        """
+        imap = self.connect_imap()
+        items = 'MESSAGES UNSEEN UIDNEXT UIDVALIDITY'
+        if self._strategy(imap, 'status') == 'status-modseq':
+            items += ' HIGHESTMODSEQ'
+
+        status, data = imap.status(f'"{folder}"', f'({items})')
+        if status != 'OK':
+            raise Exception(f"Failed to get status of folder: {folder}")
+
+        counters = next(iter(parse_status_response(data).values()), {})
+        return {
+            'exists': counters.get('MESSAGES', 0),
+            'unseen': counters.get('UNSEEN', 0),
+            'uidvalidity': counters.get('UIDVALIDITY', 0),
+            'uidnext': counters.get('UIDNEXT', 0),
+            'highestmodseq': counters.get('HIGHESTMODSEQ', 0)
+        }
 
-        status, data = imap.search(None, search_command)
+    def fetch_folder_changes(self, folder: str, known: Optional[Dict[str, int]] = None,
+                             batch_size: int = 500, refresh_flags: bool = False) -> Dict[str, Any]:
+        """
+        Collect what changed in a folder since a previously synced state
+
+        Uses CHANGEDSINCE (CONDSTORE) for flag changes and VANISHED (QRESYNC) for
+        expunges when the server supports them, so only deltas cross the wire.
+
+        Args:
+            folder: Folder name
+            known: Previously synced state with 'uidvalidity', 'uidnext',
+                   'highestmodseq' and 'lowest_uid', or None for a first sync
+            batch_size: Maximum number of message summaries fetched on a first sync and per backfill;
+                messages that arrived since the last sync are always fetched in full
+            refresh_flags: Re-read flags of the newest batch when CONDSTORE is unavailable
+
+        Returns:
+            Dictionary with the new folder 'state', 'reset' (local data must be discarded),
+            'added' summaries, 'backfill' summaries of older messages, 'backfill_complete'
+            (the server confirmed nothing older is left), 'flags' changes per UID, and
+            'vanished' UID ranges (None when expunges cannot be detected)
+
+        Raises:
+            Exception: If the folder or its older messages cannot be read
+        """
+        imap = self.connect_imap()
+        state = self._select(imap, folder)
+        extension = getattr(imap, 'enabled_extensions', None)
+        # ENABLE may have failed, so the session decides rather than the capabilities
+        capability_registry.record(self._server_name(), 'sync', extension.lower() if extension else 'uid-scan')
+        items = LIST_FETCH_ITEMS if not extension else LIST_FETCH_ITEMS.replace('(UID ', '(UID MODSEQ ')
+
+        changes = {
+            'state': state,
+            'reset': not known or known.get('uidvalidity') != state['uidvalidity'],
+            'added': [],
+            'backfill': [],
+            'backfill_complete': False,
+            'flags': {},
+            'vanished': None
+        }
+
+        if not state['exists']:
+            changes['vanished'] = [(1, max(state['uidnext'] - 1, 1))]
+            return changes
+
+        if changes['reset']:
+            # Start with the newest batch; older messages are backfilled later
+            start = max(1, state['exists'] - batch_size + 1)
+            status, data = imap.fetch(f'{start}:*', items)
+            if status != 'OK':
+                raise Exception(f"Failed to fetch summaries from {folder}")
+            changes['added'] = self._summaries(folder, data)
+            return changes
+
+        # New messages since the last sync
+        if state['uidnext'] > known['uidnext']:
+            status, data = imap.uid('FETCH', f"{known['uidnext']}:*", items)
+            if status == 'OK':
+                # "n:*" also matches the highest existing UID when nothing is newer. All new
+                # messages are kept: the stored UIDNEXT moves past them, so none may be dropped
+                changes['added'] = [summary for summary in self._summaries(folder, data)
+                                    if summary['uid'] >= known['uidnext']]
+
+        # Flag changes and expunges among already synced messages
+        known_range = f"1:{max(known['uidnext'] - 1, 1)}"
+        if extension and known.get('highestmodseq') and state['highestmodseq'] != known['highestmodseq']:
+            modifier = f"(CHANGEDSINCE {known['highestmodseq']}"
+            modifier += ' VANISHED)' if extension == 'QRESYNC' else ')'
+            status, data = imap.uid('FETCH', known_range, '(UID FLAGS MODSEQ)', modifier)
+            if status == 'OK':
+                changes['flags'] = self._flag_changes(data)
+            if extension == 'QRESYNC':
+                changes['vanished'] = []
+                _, vanished = imap.response('VANISHED')
+                for entry in vanished or []:
+                    if entry:
+                        text = entry.decode('ascii', errors='replace').replace('(EARLIER)', '').strip()
+                        changes['vanished'].extend(parse_sequence_set(text))
+        elif extension == 'QRESYNC' and state['highestmodseq'] == known.get('highestmodseq'):
+            # Nothing changed at all since the last sync
+            changes['vanished'] = []
+        elif not extension and refresh_flags:
+            start = max(1, state['exists'] - batch_size + 1)
+            status, data = imap.fetch(f'{start}:*', '(UID FLAGS)')
+            if status == 'OK':
+                changes['flags'] = self._flag_changes(data)
+
+        # Older messages that have not been synced yet
+        lowest_uid = known.get('lowest_uid')
+        if lowest_uid == 1:
+            changes['backfill_complete'] = True
+        elif lowest_uid:
+            # Searched by UID range, so it still works once the lowest synced message was expunged
+            status, data = imap.uid('SEARCH', None, f'UID 1:{lowest_uid - 1}')
+            if status != 'OK':
+                raise Exception(f"Failed to search older messages in {folder}")
+            older = sorted(uid for uid in (int(uid) for uid in (data[0] or b'').split()) if uid < lowest_uid)
+            if older:
+                batch = older[-batch_size:]
+                status, data = imap.uid('FETCH', f'{batch[0]}:{batch[-1]}', items)
+                if status != 'OK':
+                    raise Exception(f"Failed to fetch older summaries from {folder}")
+                changes['backfill'] = self._summaries(folder, data)
+            changes['backfill_complete'] = len(older) <= batch_size
+
+        return changes
+
+    def get_folder_uids(self, folder: str, uid_range: Optional[str] = None) -> List[int]:
+        """
+        Get the UIDs in a folder, used to reconcile expunges without QRESYNC
+
+        Args:
+            folder: Folder name
+            uid_range: Optional UID range such as '100:*' to limit the result
+
+        Returns:
+            List of UIDs in ascending order
+        """
+        imap = self.connect_imap()
+        self._select(imap, folder)
+        status, data = imap.uid('SEARCH', None, f'UID {uid_range}' if uid_range else 'ALL')
         if status != 'OK':
-            raise Exception(f"Search failed: {search_command}")
+            raise Exception(f"Failed to list UIDs of folder: {folder}")
+        return sorted(int(uid) for uid in data[0].split()) if data and data[0] else []
+
+    def search_uids(self, folder: str, criteria: str, uids: List[int]) -> set:
+        """
+        Check which of the given messages match search criteria
+
+        Args:
+            folder: Folder name
+            criteria: IMAP search criteria
+            uids: Candidate UIDs the search is limited to
+
+        Returns:
+            Set of matching UIDs
+        """
+        imap = self.connect_imap()
+        self._select(imap, folder)
+
+        matched = set()
+        for uid_set in format_sequence_set(uids):
+            status, data = imap.uid('SEARCH', None, f'UID {uid_set}', criteria)
+            if status != 'OK':
+                raise Exception(f"Search failed: {criteria}")
+            if data and data[0]:
+                matched.update(int(uid) for uid in data[0].split())
+        return matched
+
+    def get_email_summaries(self, folder: str, uids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Get list-view summaries for specific messages
 
-        email_ids = data[0].split()
-        total_count = len(email_ids)  # Total count for pagination
+        Args:
+            folder: Folder name
+            uids: UIDs of the messages
 
-        # Calculate slice for pagination
-        start = offset
-        end = min(offset + limit, len(email_ids))
+        Returns:
+            Summaries in the order of the given UIDs, skipping messages that no longer exist
+        """
+        if not uids:
+            return []
 
-        # Reverse to get newest emails first
-        email_ids_to_fetch = email_ids[start:end][::-1]
+        imap = self.connect_imap()
+        self._select(imap, folder)
+        records = self._fetch_records(imap, [str(uid).encode('ascii') for uid in uids], LIST_FETCH_ITEMS)
 
         emails = []
-        for email_id in email_ids_to_fetch:
+        for uid in uids:
+            record = records.get(int(uid))
+            if record is None:
+                continue
             try:
-                status, msg_data = imap.fetch(email_id, '(RFC822 FLAGS)')
-                if status != 'OK':
-                    logger.warning(f"Failed to fetch email ID {email_id}")
-                    continue
+                email_data = self._parse_summary(record, str(uid))
+            except Exception as e:
+                logger.warning(f"Failed to process email UID {uid}: {str(e)}")
+                continue
+            email_data['folder'] = folder
+            email_data['uidvalidity'] = self.uidvalidity[folder]
+            emails.append(email_data)
+        return emails
 
-                raw_email = msg_data[0][1]
-                flags = imaplib.ParseFlags(msg_data[1])
+    def fetch_search_documents(self, folder: str, uids: List[int],
+                               body_limit: int = 65536) -> List[Dict[str, Any]]:
+        """
+        Fetch the searchable text of messages for the local search index
 
-                msg = email.message_from_bytes(raw_email)
+        Only the main headers and the first body_limit bytes of the body are
+        transferred; attachments beyond that are never downloaded.
 
-                # Process email data
-                email_data = self._parse_email(msg, email_id.decode('utf-8'), flags)
-                emails.append(email_data)
+        Args:
+            folder: Folder name
+            uids: UIDs of the messages
+            body_limit: Maximum number of body bytes fetched per message
 
+        Returns:
+            List of dictionaries with 'uid', 'timestamp', 'subject', 'from', 'to' and 'body'
+        """
+        if not uids:
+            return []
+
+        imap = self.connect_imap()
+        self._select(imap, folder)
+        items = (f'(UID INTERNALDATE BODY.PEEK[HEADER.FIELDS ({SEARCH_HEADER_FIELDS})] '
+                 f'BODY.PEEK[TEXT]<0.{body_limit}>)')
+        records = self._fetch_records(imap, [str(uid).encode('ascii') for uid in uids], items)
+
+        documents = []
+        for uid, record in records.items():
+            header = next((value for key, value in record.items() if key.startswith('BODY[HEADER')), None)
+            text = next((value for key, value in record.items() if key.startswith('BODY[TEXT]')), None)
+            try:
+                msg = email.message_from_bytes(_as_bytes(header) + b'\r\n' + _as_bytes(text))
+                plain_body, html_body = _extract_email_body(msg)
+                if not plain_body and html_body:
+                    plain_body = _html_to_text(html_body)
+                received = _parse_internaldate(record.get('INTERNALDATE'))
+                documents.append({
+                    'uid': uid,
+                    'timestamp': int(received.timestamp()) if received else None,
+                    'subject': _decode_email_header(msg['Subject']),
+                    'from': _decode_email_header(msg['From']),
+                    'to': ' '.join(_decode_email_header(msg[field]) for field in ('To', 'Cc') if msg[field]),
+                    'body': plain_body
+                })
+            except Exception as e:
+                logger.warning(f"Failed to extract searchable text of UID {uid}: {str(e)}")
+        return documents
+
+    def _summaries(self, folder: str, data: List[Any]) -> List[Dict[str, Any]]:
+        """Convert raw list-view FETCH data into summaries ordered by UID"""
+        summaries = []
+        for record in parse_fetch_response(data):
+            if 'UID' not in record or 'ENVELOPE' not in record:
+                continue
+            try:
+                summary = self._parse_summary(record, str(record['UID']))
             except Exception as e:
-                logger.warning(f"Failed to process email ID {email_id}: {str(e)}")
+                logger.warning(f"Failed to process email UID {record['UID']}: {str(e)}")
                 continue
+            summary['uid'] = record['UID']
+            summary['folder'] = folder
+            summary['uidvalidity'] = self.uidvalidity.get(folder, 0)
+            summary['flags'] = record.get('FLAGS') or []
+            modseq = record.get('MODSEQ')
+            summary['modseq'] = modseq[0] if isinstance(modseq, list) and modseq else None
+            summaries.append(summary)
+        return sorted(summaries, key=lambda summary: summary['uid'])
+
+    def _flag_changes(self, data: List[Any]) -> Dict[int, Dict[str, Any]]:
+        """Convert a FLAGS FETCH response into per-UID flag updates"""
+        changes = {}
+        for record in parse_fetch_response(data):
+            if 'UID' in record and 'FLAGS' in record:
+                modseq = record.get('MODSEQ')
+                changes[record['UID']] = {
+                    'flags': record['FLAGS'],
+                    'modseq': modseq[0] if isinstance(modseq, list) and modseq else None
+                }
+        return changes
+
+    def _parse_email(self, msg: email.message.Message, email_id: str, flags: List[str],
+                     bodies: Optional[Tuple[str, str]] = None,
+                     attachments: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Parse email message into structured dictionary
 
-        return emails, total_count
+        Args:
+            msg: Full message, or just its headers when bodies and attachments are given
+            email_id: UID of the message
+            flags: IMAP flags of the message
+            bodies: Optional (plain, html) bodies fetched separately
+            attachments: Optional attachment metadata taken from BODYSTRUCTURE
 
-    def _parse_email(self, msg: email.message.Message, email_id: str, flags: List[bytes]) -> Dict[str, Any]:
-        """Parse email message into structured dictionary"""
+        Returns:
+            Email data dictionary
+        """
         # Extract basic headers
         from_header = _decode_email_header(msg['From'])
         subject = _decode_email_header(msg['Subject'])
@@ -416,14 +1377,15 @@ class EmailClient:
             parsed_date = datetime.now()
 
         # Extract email bodies
-        plain_body, html_body = _extract_email_body(msg)
+        plain_body, html_body = bodies if bodies is not None else _extract_email_body(msg)
 
         # Extract attachments
-        attachments = _extract_attachments(msg)
+        if attachments is None:
+            attachments = _extract_attachments(msg)
 
         # Parse flags
-        is_read = rb'\\Seen' in flags
-        is_flagged = rb'\\Flagged' in flags
+        is_read = '\\Seen' in flags
+        is_flagged = '\\Flagged' in flags
 
         # Extract email addresses
         from_email = None
@@ -458,6 +1420,46 @@ class EmailClient:
 
         return email_data
 
+    def _parse_summary(self, item: Dict[str, Any], email_id: str) -> Dict[str, Any]:
+        """Build a list-view email dictionary from ENVELOPE/BODYSTRUCTURE fetch data"""
+        envelope = parse_envelope(item.get('ENVELOPE') or [])
+        parts = parse_bodystructure(item.get('BODYSTRUCTURE'))
+        flags = item.get('FLAGS') or []
+
+        parsed_date = None
+        if envelope['date']:
+            try:
+                parsed_date = email.utils.parsedate_to_datetime(envelope['date'])
+            except Exception:
+                parsed_date = None
+        if parsed_date is None:
+            parsed_date = _parse_internaldate(item.get('INTERNALDATE')) or datetime.now()
+
+        from_name, from_email = envelope['from'][0] if envelope['from'] else ('', '')
+
+        attachments = _attachment_metadata(parts)
+
+        return {
+            'id': email_id,
+            'subject': _decode_email_header(envelope['subject']) or '(No Subject)',
+            'from': {
+                'name': _decode_email_header(from_name),
+                'email': from_email
+            },
+            'to': ', '.join(address for _, address in envelope['to']),
+            'date': parsed_date.isoformat(),
+            'timestamp': int(parsed_date.timestamp()),
+            'size': item.get('RFC822.SIZE') or 0,
+            'read': '\\Seen' in flags,
+            'flagged': '\\Flagged' in flags,
+            'has_attachments': len(attachments) > 0,
+            'attachments': attachments,
+            'body': {
+                'plain': '',
+                'html': ''
+            }
+        }
+
     def mark_as_read(self, folder: str, email_id: str) -> bool:
         """Mark an email as read"""
         return self._set_flag(folder, email_id, '\\Seen')
@@ -476,24 +1478,42 @@ class EmailClient:
 
     def _set_flag(self, folder: str, email_id: str, flag: str) -> bool:
         """Set a flag on an email"""
-        try:
-            imap = self.connect_imap()
-            imap.select(f'"{folder}"')
-            imap.store(email_id, '+FLAGS', flag)
-            return True
-        except Exception as e:
-            logger.warning(f"Failed to set flag {flag} on email {email_id}: {str(e)}")
-            return False
+        return self.store_flags(folder, [email_id], [flag], add=True)
 
     def _remove_flag(self, folder: str, email_id: str, flag: str) -> bool:
         """Remove a flag from an email"""
+        return self.store_flags(folder, [email_id], [flag], add=False)
+
+    def store_flags(self, folder: str, uids: List[Union[int, str]], flags: List[str],
+                    add: bool = True) -> bool:
+        """
+        Add or remove flags on many messages, pipelining the STORE commands
+
+        Args:
+            folder: Folder name
+            uids: UIDs of the messages
+            flags: Flags such as '\\Seen' or keywords
+            add: Add the flags when True, remove them when False
+
+        Returns:
+            Success status
+        """
         try:
             imap = self.connect_imap()
-            imap.select(f'"{folder}"')
-            imap.store(email_id, '-FLAGS', flag)
-            return True
+            self._select(imap, folder, readonly=False)
+
+            # SILENT skips the FETCH response the server would send per message
+            operation = '+FLAGS.SILENT' if add else '-FLAGS.SILENT'
+            pipeline = ImapPipeline(imap)
+            for uid_set in format_sequence_set(uids):
+                pipeline.send('UID', 'STORE', uid_set, operation, f"({' '.join(flags)})", key=uid_set)
+
+            failed = [result for result in pipeline.finish() if result.status != 'OK']
+            for result in failed:
+                logger.warning(f"Failed to update flags {flags} on {result.key}: {result.message}")
+            return not failed
         except Exception as e:
-            logger.warning(f"Failed to remove flag {flag} from email {email_id}: {str(e)}")
+            logger.warning(f"Failed to update flags {flags} in {folder}: {str(e)}")
             return False
 
     def delete_email(self, folder: str, email_id: str) -> bool:
@@ -502,53 +1522,75 @@ class EmailClient:
 
         Args:
             folder: Current folder name
-            email_id: Email ID to delete
+            email_id: UID of the email to delete
 
         Returns:
             Success status
         """
-        try:
-            imap = self.connect_imap()
+        return self.delete_emails(folder, [email_id])
 
-            # First try to find Trash folder
-            status, folders_raw = imap.list()
-            trash_folder = None
-
-            for folder_raw in folders_raw:
-                decoded = folder_raw.decode('utf-8', errors='replace')
-                if '\\Trash' in decoded or 'Trash' in decoded:
-                    # Extract folder name
-                    match = re.search(r'"([^"]+)"$', decoded)
-                    if match:
-                        trash_folder = match.group(1)
-                        break
+    def delete_emails(self, folder: str, uids: List[Union[int, str]]) -> bool:
+        """
+        Delete many emails, moving them to the trash unless they are already there
 
-            # Select source folder
-            imap.select(f'"{folder}"')
+        Args:
+            folder: Current folder name
+            uids: UIDs of the emails to delete
+
+        Returns:
+            Success status
+        """
+        try:
+            trash_folder = self.folder_role('trash')
 
             if trash_folder and folder != trash_folder:
-                # Move to trash if trash folder exists and we're not already in trash
-                imap.copy(email_id, f'"{trash_folder}"')
-                # Mark as deleted in current folder
-                imap.store(email_id, '+FLAGS', '\\Deleted')
-                imap.expunge()
-            else:
-                # Just mark as deleted if no trash folder or already in trash
-                imap.store(email_id, '+FLAGS', '\\Deleted')
-                imap.expunge()
+                if self.move_emails(folder, trash_folder, uids):
+                    return True
+                # Another client may have renamed or removed the cached trash folder
+                self.invalidate_folder_roles()
+                return False
 
-            return True
+            # Already in trash, or no trash folder: delete for good
+            imap = self.connect_imap()
+            self._select(imap, folder, readonly=False)
+            self._uncache(folder, uids)
+            return self._expunge_uids(imap, format_sequence_set(uids))
         except Exception as e:
-            logger.warning(f"Failed to delete email {email_id}: {str(e)}")
+            logger.warning(f"Failed to delete emails {uids}: {str(e)}")
             return False
 
+    def _run_uid_commands(self, imap: imaplib.IMAP4, commands: List[Tuple[str, ...]], action: str) -> bool:
+        """Pipeline UID commands on the selected folder, returning True if all of them succeeded"""
+        pipeline = ImapPipeline(imap)
+        for command in commands:
+            pipeline.send('UID', *command, key=command[1] if len(command) > 1 else command[0])
+
+        failed = [result for result in pipeline.finish() if result.status != 'OK']
+        for result in failed:
+            logger.warning(f"Failed to {action} for {result.key}: {result.message}")
+        return not failed
+
+    def _expunge_uids(self, imap: imaplib.IMAP4, uid_sets: List[str]) -> bool:
+        """Mark messages deleted and expunge them, the STOREs of all sets in one round trip"""
+        commands = [('STORE', uid_set, '+FLAGS.SILENT', '(\\Deleted)') for uid_set in uid_sets]
+        # Expunging depends on the STOREs, so it must not be pipelined with them (RFC 3501 5.5)
+        if not self._run_uid_commands(imap, commands, 'delete messages'):
+            return False
+
+        if self._strategy(imap, 'expunge') == 'uid-expunge':
+            # UID EXPUNGE leaves other messages marked \\Deleted alone
+            return self._run_uid_commands(imap, [('EXPUNGE', uid_set) for uid_set in uid_sets], 'delete messages')
+
+        status, _ = imap.expunge()
+        return status == 'OK'
+
     def send_email(self, to: Union[str, List[str]], subject: str,
                   body_text: str, body_html: str = None,
                   cc: Union[str, List[str]] = None,
                   bcc: Union[str, List[str]] = None,
                   attachments: List[Dict[str, Any]] = None) -> bool:
         """
-        Send an email
+        Send an email right away and save a copy to the Sent folder
 
         Args:
             to: Recipient email address(es)
@@ -557,119 +1599,188 @@ class EmailClient:
             body_html: Optional HTML body
             cc: Optional CC recipients
             bcc: Optional BCC recipients
-            attachments: Optional list of attachments
+            attachments: Optional list of attachments, see write_message()
 
         Returns:
             Success status
         """
         try:
-            # Create message container
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.username
+            with tempfile.TemporaryFile() as message:
+                recipients = self.write_message(message, to, subject, body_text, body_html, cc, bcc, attachments)
+                message.seek(0)
+                self.deliver_message(message, recipients)
+                message.seek(0)
+                self.save_to_sent(message)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send email: {str(e)}")
+            return False
 
-            # Handle recipients
-            if isinstance(to, list):
-                msg['To'] = ', '.join(to)
-            else:
-                msg['To'] = to
+    def write_message(self, fp: BinaryIO, to: Union[str, List[str]], subject: str,
+                      body_text: str, body_html: str = None,
+                      cc: Union[str, List[str]] = None,
+                      bcc: Union[str, List[str]] = None,
+                      attachments: List[Dict[str, Any]] = None) -> List[str]:
+        """
+        Write an outgoing message to a file
 
-            if cc:
-                if isinstance(cc, list):
-                    msg['Cc'] = ', '.join(cc)
-                else:
-                    msg['Cc'] = cc
-
-            # BCC doesn't show in headers
-            if isinstance(bcc, str):
-                bcc = [bcc] if bcc else []
-
-            # Subject and date
-            msg['Subject'] = subject
-            msg['Date'] = email.utils.formatdate(localtime=True)
-
-            # Plain text body
-            part1 = MIMEText(body_text, 'plain')
-            msg.attach(part1)
-
-            # HTML body if provided
-            if body_html:
-                part2 = MIMEText(body_html, 'html')
-                msg.attach(part2)
-
-            # Attachments
-            if attachments:
-                for attachment in attachments:
-                    filename = attachment.get('filename')
-                    content_type = attachment.get('content_type', 'application/octet-stream')
-                    content = attachment.get('content')
-
-                    if not all([filename, content]):
-                        continue
-
-                    # Decode base64 content if it's encoded
-                    if isinstance(content, str):
-                        try:
-                            content = base64.b64decode(content)
-                        except:
-                            # If not valid base64, treat as raw bytes
-                            content = content.encode('utf-8')
-
-                    part = MIMEApplication(content)
-                    part.add_header('Content-Disposition', 'attachment', filename=filename)
-                    part.add_header('Content-Type', content_type, name=filename)
-                    msg.attach(part)
-
-            # Connect to SMTP server and send
-            smtp = self.connect_smtp()
-
-            # Combine all recipients
-            all_recipients = []
-            if isinstance(to, list):
-                all_recipients.extend(to)
-            else:
-                all_recipients.append(to)
+        Attachments are base64-encoded while they are copied from their source,
+        so only one chunk of each is in memory at a time. The message carries
+        its own Message-ID, so delivery retries and the Sent copy all refer to
+        the same message.
 
-            if cc:
-                if isinstance(cc, list):
-                    all_recipients.extend(cc)
-                else:
-                    all_recipients.append(cc)
+        Args:
+            fp: Binary file receiving the message with CRLF line endings
+            to: Recipient email address(es)
+            subject: Email subject
+            body_text: Plain text body
+            body_html: Optional HTML body
+            cc: Optional CC recipients
+            bcc: Optional BCC recipients
+            attachments: Optional list of attachments with 'filename', 'content_type' and the
+                content as a file 'path', an iterable of byte 'chunks' or base64 'content'
+
+        Returns:
+            Envelope recipients
+        """
+        to = [to] if isinstance(to, str) else list(to or [])
+        cc = [cc] if isinstance(cc, str) else list(cc or [])
+        # BCC doesn't show in headers
+        bcc = [bcc] if isinstance(bcc, str) else list(bcc or [])
+
+        # Text and HTML are alternatives; attachments go next to them in a mixed container
+        body = MIMEMultipart('alternative')
+        body.attach(MIMEText(body_text, 'plain'))
+        if body_html:
+            body.attach(MIMEText(body_html, 'html'))
+
+        headers = email.message.Message()
+        headers['From'] = self.username
+        headers['To'] = ', '.join(to)
+        if cc:
+            headers['Cc'] = ', '.join(cc)
+        headers['Subject'] = subject
+        headers['Date'] = email.utils.formatdate(localtime=True)
+        headers['Message-ID'] = email.utils.make_msgid(domain=self.username.rpartition('@')[2] or None)
+
+        parts = []
+        for attachment in attachments or []:
+            filename = attachment.get('filename')
+            chunks = _attachment_chunks(attachment)
+            if not filename or chunks is None:
+                continue
 
-            if bcc:
-                all_recipients.extend(bcc)
+            maintype, _, subtype = (attachment.get('content_type') or '').partition('/')
+            part = MIMEBase(maintype, subtype) if maintype and subtype else MIMEBase('application', 'octet-stream')
+            part.add_header('Content-Disposition', 'attachment', filename=filename)
+            part.set_param('name', filename)
+            parts.append((part, chunks))
 
-            # Send the message
-            smtp.send_message(msg, from_addr=self.username, to_addrs=all_recipients)
+        recipients = [address for address in to + cc + bcc if address]
+        if not parts:
+            for name, value in headers.items():
+                body[name] = value
+            fp.write(message_bytes(body))
+            return recipients
 
-            # Try to save to Sent folder
-            try:
-                # First try to find Sent folder
-                imap = self.connect_imap()
-                status, folders_raw = imap.list()
-                sent_folder = None
-
-                for folder_raw in folders_raw:
-                    decoded = folder_raw.decode('utf-8', errors='replace')
-                    if '\\Sent' in decoded or 'Sent' in decoded:
-                        # Extract folder name
-                        match = re.search(r'"([^"]+)"$', decoded)
-                        if match:
-                            sent_folder = match.group(1)
-                            break
-
-                if sent_folder:
-                    # Convert to IMAP format
-                    imap_format = msg.as_string().encode('utf-8')
-                    imap.append(f'"{sent_folder}"', '\\Seen', None, imap_format)
-            except Exception as e:
-                logger.warning(f"Failed to save email to sent folder: {str(e)}")
-                # This is not a critical error, so we still consider the send successful
+        write_multipart(fp, headers, [body] + parts)
+        return recipients
+
+    def deliver_message(self, message: BinaryIO, recipients: List[str]) -> Dict[str, Tuple[int, bytes]]:
+        """
+        Hand a written message to the SMTP server
+
+        Args:
+            message: Binary file positioned at the start of a message from write_message()
+            recipients: Envelope recipients
 
+        Returns:
+            Recipients the server refused, mapped to (code, reply); empty if all were accepted
+
+        Raises:
+            smtplib.SMTPException: If the server refused the message or all recipients
+        """
+        smtp = self.connect_smtp()
+        try:
+            refused = send_pipelined(smtp, self.username, recipients, message)
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # The server answered and the transaction was reset, so the session stays usable
+            raise
+        except OSError:
+            # A session that broke mid-transaction must not go back to the pool
+            smtp.close()
+            raise
+        if refused:
+            logger.warning(f"SMTP server refused recipients: {', '.join(refused)}")
+        return refused
+
+    def save_to_sent(self, message: BinaryIO) -> bool:
+        """
+        Save a copy of a sent message to the Sent folder
+
+        Failures are logged but not raised, since the message was already sent.
+
+        Args:
+            message: Binary file positioned at the start of a message from write_message()
+
+        Returns:
+            True if the copy was saved
+        """
+        sent_folder = None
+        try:
+            sent_folder = self.folder_role('sent')
+            if not sent_folder:
+                return False
+            status, _ = self._append(self.connect_imap(), sent_folder, '(\\Seen)', message)
+            if status != 'OK':
+                raise Exception(f"APPEND to {sent_folder} returned {status}")
             return True
         except Exception as e:
-            logger.error(f"Failed to send email: {str(e)}")
+            logger.warning(f"Failed to save email to sent folder: {str(e)}")
+            if sent_folder:
+                # Another client may have renamed or removed the cached sent folder
+                self.invalidate_folder_roles()
             return False
 
+    def _append(self, imap: imaplib.IMAP4, folder: str, flags: str, message: BinaryIO) -> Tuple[str, List[Any]]:
+        """
+        APPEND a message from a file, streaming the literal instead of building the command in memory
+
+        With LITERAL+ (RFC 7888) the literal follows the command right away,
+        otherwise it is sent after the server's continuation request.
+
+        Args:
+            imap: IMAP connection
+            folder: Target folder name
+            flags: Parenthesized flag list
+            message: Binary file positioned at the start of the message
+
+        Returns:
+            Tuple of (status, response data) as imaplib returns them
+        """
+        position = message.tell()
+        size = message.seek(0, os.SEEK_END) - position
+        message.seek(position)
+
+        non_sync = self._strategy(imap, 'append') == 'literal-plus'
+        tag = imap._new_tag()
+        literal = f'{{{size}+}}' if non_sync else f'{{{size}}}'
+        imap.send(tag + f' APPEND "{folder}" {flags} {literal}\r\n'.encode(imap._encoding))
+
+        if not non_sync:
+            while imap._get_response():
+                if imap.tagged_commands[tag]:
+                    # Refused before the server asked for the message
+                    return imap._command_complete('APPEND', tag)
+
+        while True:
+            chunk = message.read(ATTACHMENT_CHUNK_SIZE)
+            if not chunk:
+                break
+            imap.send(chunk)
+        imap.send(b'\r\n')
+        return imap._command_complete('APPEND', tag)
+
     def get_folder_stats(self, folder: str) -> Dict[str, Any]:
         """
         Get folder statistics
@@ -721,12 +1832,8 @@ class EmailClient:
             }
 
     def _convert_search_to_imap(self, search: str) -> str:
-        """Convert a human-readable search to IMAP search criteria"""
-        if not search:
-            return 'ALL'
-
-        # Simple keyword search - search in subject, from, to, and body
-        return f'OR OR OR SUBJECT "{search}" FROM "{search}" TO "{search}" BODY "{search}"'
+        """Convert a search query such as 'from:alice has:attachment' to IMAP search criteria"""
+        return compile_imap(parse_query(search))
 
     def get_unread_count(self, folder_name=None) -> Union[int, Dict[str, int]]:
         """
@@ -745,51 +1852,17 @@ class EmailClient:
             # If a specific folder is requested
             if folder_name:
                 try:
-                    status, _ = imap.select(f'"{folder_name}"', readonly=True)
+                    status, data = imap.status(f'"{folder_name}"', '(UNSEEN)')
                     if status != 'OK':
                         return 0
-
-                    status, data = imap.search(None, 'UNSEEN')
-                    if status == 'OK':
-                        return len(data[0].split())
-                    return 0
+                    return next(iter(parse_status_response(data).values()), {}).get('UNSEEN', 0)
                 except Exception as e:
                     logger.warning(f"Failed to get unread count for folder {folder_name}: {str(e)}")
                     return 0
 
             # Otherwise get counts for all folders
-            status, folders_raw = imap.list()
-
-            if status != 'OK':
-                raise Exception("Failed to get folders")
-
-            unread_counts = {}
-
-            for folder_raw in folders_raw:
-                try:
-                    # Extract folder name
-                    decoded = folder_raw.decode('utf-8', errors='replace')
-                    folder_match = re.search(r'"([^"]+)"$', decoded)
-
-                    if not folder_match:
-                        continue
-
-                    folder_name = folder_match.group(1)
-
-                    # Select folder
-                    status, _ = imap.select(f'"{folder_name}"', readonly=True)
-                    if status != 'OK':
-                        continue
-
-                    # Get unread count
-                    status, data = imap.search(None, 'UNSEEN')
-                    if status == 'OK':
-                        unread_counts[folder_name] = len(data[0].split())
-                except Exception as e:
-                    logger.warning(f"Failed to get unread count for folder: {str(e)}")
-                    continue
-
-            return unread_counts
+            _, counters = self._list_folders(imap)
+            return {name: folder_counters.get('UNSEEN', 0) for name, folder_counters in counters.items()}
         except Exception as e:
             logger.error(f"Failed to get unread counts: {str(e)}")
             return 0 if folder_name else {}
@@ -806,7 +1879,10 @@ class EmailClient:
         """
         try:
             imap = self.connect_imap()
-            imap.create(f'"{folder_name}"')
+            status, _ = imap.create(f'"{folder_name}"')
+            if status != 'OK':
+                raise Exception(f"CREATE returned {status}")
+            self.invalidate_folder_roles()
             return True
         except Exception as e:
             logger.error(f"Failed to create folder {folder_name}: {str(e)}")
@@ -824,7 +1900,10 @@ class EmailClient:
         """
         try:
             imap = self.connect_imap()
-            imap.delete(f'"{folder_name}"')
+            status, _ = imap.delete(f'"{folder_name}"')
+            if status != 'OK':
+                raise Exception(f"DELETE returned {status}")
+            self.invalidate_folder_roles()
             return True
         except Exception as e:
             logger.error(f"Failed to delete folder {folder_name}: {str(e)}")
@@ -837,29 +1916,46 @@ class EmailClient:
         Args:
             source_folder: Source folder name
             target_folder: Target folder name
-            email_id: Email ID to move
+            email_id: UID of the email to move
 
         Returns:
             Success status
         """
-        try:
-            imap = self.connect_imap()
+        return self.move_emails(source_folder, target_folder, [email_id])
 
-            # Select source folder
-            imap.select(f'"{source_folder}"')
+    def move_emails(self, source_folder: str, target_folder: str, uids: List[Union[int, str]]) -> bool:
+        """
+        Move many emails from one folder to another
 
-            # Copy to target folder
-            status, _ = imap.copy(email_id, f'"{target_folder}"')
-            if status != 'OK':
-                raise Exception(f"Failed to copy email to {target_folder}")
+        Uses UID MOVE (RFC 6851) when the server supports it. Otherwise the
+        messages are copied first and only then flagged and expunged, so a
+        failed copy never loses mail.
 
-            # Delete from source folder
-            imap.store(email_id, '+FLAGS', '\\Deleted')
-            imap.expunge()
+        Args:
+            source_folder: Source folder name
+            target_folder: Target folder name
+            uids: UIDs of the emails to move
 
-            return True
+        Returns:
+            Success status
+        """
+        try:
+            imap = self.connect_imap()
+            self._select(imap, source_folder, readonly=False)
+            self._uncache(source_folder, uids)
+
+            uid_sets = format_sequence_set(uids)
+            target = f'"{target_folder}"'
+            if self._strategy(imap, 'move') == 'uid-move':
+                return self._run_uid_commands(imap, [('MOVE', uid_set, target) for uid_set in uid_sets],
+                                              f"move emails to {target_folder}")
+
+            if not self._run_uid_commands(imap, [('COPY', uid_set, target) for uid_set in uid_sets],
+                                          f"copy emails to {target_folder}"):
+                return False
+            return self._expunge_uids(imap, uid_sets)
         except Exception as e:
-            logger.error(f"Failed to move email: {str(e)}")
+            logger.error(f"Failed to move emails: {str(e)}")
             return False
 
     def rename_folder(self, old_name: str, new_name: str) -> bool:
@@ -875,7 +1971,10 @@ class EmailClient:
         """
         try:
             imap = self.connect_imap()
-            imap.rename(f'"{old_name}"', f'"{new_name}"')
+            status, _ = imap.rename(f'"{old_name}"', f'"{new_name}"')
+            if status != 'OK':
+                raise Exception(f"RENAME returned {status}")
+            self.invalidate_folder_roles()
             return True
         except Exception as e:
             logger.error(f"Failed to rename folder: {str(e)}")
@@ -897,39 +1996,33 @@ class EmailClient:
             self.smtp_port
         )
 
-    def get_email(self, email_id: str, folder: str = 'INBOX') -> Dict[str, Any]:
+    def get_email(self, email_id: str, folder: str = 'INBOX',
+                  uidvalidity: Optional[int] = None) -> Dict[str, Any]:
         """
-        Get a single email by ID from a specific folder
+        Get a single email by UID from a specific folder
 
         Args:
-            email_id: Email ID to fetch
+            email_id: UID of the email to fetch
             folder: Folder name where the email is located
+            uidvalidity: Optional UIDVALIDITY the UID was issued under
 
         Returns:
             Email data dictionary
 
         Raises:
+            StaleMessageError: If the folder's UIDVALIDITY no longer matches
             Exception: If email retrieval fails
         """
         try:
             imap = self.connect_imap()
-            status, _ = imap.select(f'"{folder}"', readonly=True)
-
-            if status != 'OK':
-                raise Exception(f"Failed to select folder: {folder}")
-
-            # Fetch the specific email
-            status, msg_data = imap.fetch(email_id, '(RFC822 FLAGS)')
-            if status != 'OK':
-                raise Exception(f"Failed to fetch email ID {email_id}")
-
-            raw_email = msg_data[0][1]
-            flags = imaplib.ParseFlags(msg_data[1])
+            self._select(imap, folder)
+            self._check_uidvalidity(folder, uidvalidity)
 
-            msg = email.message_from_bytes(raw_email)
-
-            # Process email data
-            email_data = self._parse_email(msg, email_id, flags)
+            email_data = self._cached_view(imap, folder, int(email_id))
+            if email_data is None:
+                email_data = self._fetch_views(imap, folder, [int(email_id)]).get(int(email_id))
+            if not email_data:
+                raise Exception(f"Failed to fetch email UID {email_id}")
 
             # Mark as read if not already
             if not email_data['read']:
@@ -942,3 +2035,304 @@ class EmailClient:
             logger.error(f"Failed to get email {email_id}: {str(e)}")
             raise
 
+    def prefetch_emails(self, folder: str, uids: List[Union[int, str]]) -> Dict[int, Dict[str, Any]]:
+        """
+        Load several emails for viewing, e.g. the neighbours of an open message
+
+        Messages are not marked as read. Messages in the message cache are not
+        fetched again, so their flags may be out of date.
+
+        Args:
+            folder: Folder name
+            uids: UIDs of the messages
+
+        Returns:
+            Dictionary mapping UID to email data, skipping messages that no longer exist
+        """
+        if not uids:
+            return {}
+
+        imap = self.connect_imap()
+        self._select(imap, folder)
+
+        views = {}
+        for uid in (int(uid) for uid in uids):
+            entry = self._cached(folder, uid)
+            if entry and 'view' in entry:
+                views[uid] = dict(entry['view'])
+
+        missing = [int(uid) for uid in uids if int(uid) not in views]
+        if missing:
+            views.update(self._fetch_views(imap, folder, missing))
+        return views
+
+    def _cached_view(self, imap: imaplib.IMAP4, folder: str, uid: int) -> Optional[Dict[str, Any]]:
+        """View data of a cached message with fresh flags, or None if the message must be fetched"""
+        entry = self._cached(folder, uid)
+        if not entry or 'view' not in entry:
+            return None
+
+        # Everything but the flags of a message is immutable
+        record = self._fetch_records(imap, [str(uid).encode('ascii')], '(UID FLAGS)').get(uid)
+        if not record:
+            self._uncache(folder, [uid])
+            return None
+        flags = record.get('FLAGS') or []
+        return dict(entry['view'], read='\\Seen' in flags, flagged='\\Flagged' in flags)
+
+    def _fetch_views(self, imap: imaplib.IMAP4, folder: str, uids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch view data for messages in two round trips, however many there are
+
+        Headers and structure come first, so attachments are never downloaded here.
+        Which text sections to fetch differs per message, so those FETCH commands
+        are pipelined.
+        """
+        records = self._fetch_records(imap, [str(uid).encode('ascii') for uid in uids], VIEW_FETCH_ITEMS)
+
+        pipeline = ImapPipeline(imap, collect=('FETCH',))
+        plans = {}
+        for uid, record in records.items():
+            if record.get('BODY[HEADER]') is None:
+                continue
+            parts = parse_bodystructure(record.get('BODYSTRUCTURE'))
+            text_parts = _body_text_parts(parts)
+            plans[uid] = (record, parts, text_parts)
+            if text_parts:
+                items = ' '.join(f"BODY.PEEK[{part['part_id']}]" for part in text_parts.values())
+                pipeline.send('UID', 'FETCH', str(uid), f'(UID {items})', key=uid)
+
+        for result in pipeline.finish():
+            if result.status != 'OK':
+                logger.warning(f"Failed to fetch text of email UID {result.key}: {result.message}")
+
+        sections = {}
+        for record in parse_fetch_response(pipeline.responses('FETCH')):
+            if 'UID' in record:
+                sections.setdefault(record['UID'], {}).update(record)
+
+        views = {}
+        for uid, (record, parts, text_parts) in plans.items():
+            try:
+                bodies = {'plain': '', 'html': ''}
+                for kind, part in text_parts.items():
+                    bodies[kind] = _decode_text_part(sections.get(uid, {}).get(f"BODY[{part['part_id']}]"), part)
+
+                msg = email.message_from_bytes(record['BODY[HEADER]'])
+                email_data = self._parse_email(msg, str(uid), record.get('FLAGS') or [],
+                                               bodies=(bodies['plain'], bodies['html']),
+                                               attachments=_attachment_metadata(parts))
+            except Exception as e:
+                logger.warning(f"Failed to process email UID {uid}: {str(e)}")
+                continue
+            email_data['folder'] = folder
+            email_data['uidvalidity'] = self.uidvalidity[folder]
+            views[uid] = email_data
+            self._cache(folder, uid, view=dict(email_data), parts=parts)
+        return views
+
+    def get_attachment(self, email_id: str, folder: str, part_id: str,
+                       uidvalidity: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a single attachment by its IMAP section number
+
+        Args:
+            email_id: UID of the email
+            folder: Folder name where the email is located
+            part_id: IMAP section number of the attachment, e.g. '2' or '1.3'
+            uidvalidity: Optional UIDVALIDITY the UID was issued under
+
+        Returns:
+            Attachment dictionary with decoded 'content' bytes, or None if the part does not exist
+
+        Raises:
+            StaleMessageError: If the folder's UIDVALIDITY no longer matches
+            Exception: If the fetch fails
+        """
+        if not PART_ID_PATTERN.match(part_id):
+            return None
+
+        imap = self.connect_imap()
+        self._select(imap, folder)
+        self._check_uidvalidity(folder, uidvalidity)
+
+        record = self._fetch_records(imap, [str(email_id).encode('ascii')],
+                                     f'(UID BODYSTRUCTURE BODY.PEEK[{part_id}])').get(int(email_id))
+        if not record:
+            return None
+
+        part = next((part for part in parse_bodystructure(record.get('BODYSTRUCTURE'))
+                     if part['part_id'] == part_id), None)
+        data = record.get(f'BODY[{part_id}]')
+        if part is None or data is None:
+            return None
+
+        content = _decode_transfer_encoding(data, part['encoding'])
+        return {
+            'part_id': part_id,
+            'filename': _decode_email_header(part['filename']) or f'part-{part_id}',
+            'content_type': part['content_type'],
+            'size': len(content),
+            'content': content
+        }
+
+    def get_attachment_info(self, email_id: str, folder: str, part_id: str,
+                            uidvalidity: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Describe an attachment so it can be streamed with iter_attachment()
+
+        The exact decoded size is known for identity encodings and for base64
+        bodies with a regular line layout, which also makes ranged reads possible.
+        Small attachments are fetched whole and come with their decoded 'content'.
+        Descriptions are kept in the message cache, so repeated and ranged
+        downloads skip the structure and probe fetches.
+
+        Args:
+            email_id: UID of the email
+            folder: Folder name where the email is located
+            part_id: IMAP section number of the attachment
+            uidvalidity: Optional UIDVALIDITY the UID was issued under
+
+        Returns:
+            Attachment dictionary with 'size' set to the decoded size or None if unknown,
+            and 'content' set for small attachments, or None if the part does not exist
+
+        Raises:
+            StaleMessageError: If the folder's UIDVALIDITY no longer matches
+            Exception: If the fetch fails
+        """
+        if not PART_ID_PATTERN.match(part_id):
+            return None
+
+        imap = self.connect_imap()
+        self._select(imap, folder)
+        self._check_uidvalidity(folder, uidvalidity)
+
+        entry = self._cached(folder, email_id) or {}
+        cached = entry.get('attachments', {}).get(part_id)
+        if cached is not None:
+            return dict(cached)
+
+        uid = str(email_id).encode('ascii')
+        parts = entry.get('parts')
+        head = None
+        if parts is None:
+            record = self._fetch_records(imap, [uid], f'(UID BODYSTRUCTURE BODY.PEEK[{part_id}]<0.{ATTACHMENT_PROBE_SIZE}>)').get(int(email_id))
+            if not record:
+                return None
+            parts = parse_bodystructure(record.get('BODYSTRUCTURE'))
+            head = self._section_data(record, part_id)
+
+        part = next((part for part in parts if part['part_id'] == part_id), None)
+        if part is None:
+            return None
+
+        size = None
+        layout = None
+        content = None
+        if part['size'] <= CACHED_ATTACHMENT_SIZE:
+            # Small parts are kept whole, so later downloads need no round trip at all
+            if head is None or len(head) < part['size']:
+                record = self._fetch_records(imap, [uid], f'(UID BODY.PEEK[{part_id}])').get(int(email_id), {})
+                head = self._section_data(record, part_id)
+            content = _decode_transfer_encoding(head, part['encoding'])
+            size = len(content)
+        elif part['encoding'] == 'base64':
+            if head is None:
+                record = self._fetch_records(imap, [uid], f'(UID BODY.PEEK[{part_id}]<0.{ATTACHMENT_PROBE_SIZE}>)').get(int(email_id), {})
+                head = self._section_data(record, part_id)
+            start = max(0, part['size'] - 256)
+            tail_record = self._fetch_records(imap, [uid], f'(UID BODY.PEEK[{part_id}]<{start}.256>)').get(int(email_id), {})
+            tail = self._section_data(tail_record, part_id)
+            layout = detect_base64_layout(head, tail, part['size'])
+            if layout:
+                size = layout.decoded_size
+        elif part['encoding'] in ('7bit', '8bit', 'binary'):
+            size = part['size']
+
+        info = {
+            'email_id': str(email_id),
+            'folder': folder,
+            'uidvalidity': self.uidvalidity[folder],
+            'part_id': part_id,
+            'filename': _decode_email_header(part['filename']) or f'part-{part_id}',
+            'content_type': part['content_type'],
+            'encoding': part['encoding'],
+            'size': size,
+            'layout': layout,
+            'content': content
+        }
+        self._cache(folder, email_id, parts=parts,
+                    attachments=dict(entry.get('attachments', {}), **{part_id: info}))
+        return dict(info)
+
+    def iter_attachment(self, info: Dict[str, Any], start: int = 0, stop: Optional[int] = None,
+                        chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream the decoded content of an attachment with bounded memory
+
+        Args:
+            info: Attachment description from get_attachment_info()
+            start: First decoded byte to return; needs a known size unless 0
+            stop: Decoded offset to stop at (exclusive), or None for the end
+            chunk_size: Encoded bytes fetched per round trip
+
+        Yields:
+            Decoded content chunks
+
+        Raises:
+            StaleMessageError: If the folder's UIDVALIDITY changed in the meantime
+        """
+        if info.get('content') is not None:
+            # Fetched whole by get_attachment_info(), no need to go back to the server
+            content = info['content'][start:stop]
+            if content:
+                yield content
+            return
+
+        imap = self.connect_imap()
+        folder = info['folder']
+        self._select(imap, folder)
+        self._check_uidvalidity(folder, info['uidvalidity'])
+
+        uid = info['email_id'].encode('ascii')
+        part_id = info['part_id']
+        decoder = create_decoder(info['encoding'])
+
+        # Seek in the encoded body instead of decoding what we'd throw away
+        offset, skip = 0, 0
+        if start and info['layout']:
+            offset, skip = info['layout'].encoded_offset(start)
+        elif start:
+            offset = start
+        remaining = None if stop is None else stop - start
+
+        while remaining is None or remaining > 0:
+            record = self._fetch_records(imap, [uid], f'(UID BODY.PEEK[{part_id}]<{offset}.{chunk_size}>)').get(int(uid), {})
+            data = self._section_data(record, part_id)
+            offset += len(data)
+            last = len(data) < chunk_size
+
+            chunk = decoder.feed(data)
+            if last:
+                chunk += decoder.flush()
+            if skip:
+                chunk, skip = chunk[skip:], max(0, skip - len(chunk))
+            if remaining is not None:
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+
+            if chunk:
+                yield chunk
+            if last:
+                break
+
+    def _section_data(self, record: Dict[str, Any], part_id: str) -> bytes:
+        """Get the bytes of a (possibly partial) BODY[section] item from a fetch record"""
+        prefix = f'BODY[{part_id}]'
+        for key, value in record.items():
+            if key == prefix or key.startswith(prefix + '<'):
+                if isinstance(value, str):
+                    return value.encode('utf-8')
+                return value or b''
+        return b''
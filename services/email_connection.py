@@ -4,19 +4,175 @@ Email Connection Module
 Provides secure connection handling for email services including:
 - IMAP and SMTP protocols
 - Multiple connection strategies with fallbacks
+- Trying the strategy that worked last time first
+- Racing strategies and address families concurrently under one deadline
 - TLS/SSL security handling with certificate validation options
+- TLS session resumption for reconnects to the same server
+- Per-socket timeouts bounded by the deadline of the request using a session
+- Failing fast on servers that are down, through a per-host circuit breaker
 """
 
 import imaplib
 import smtplib
 import ssl
 import logging
-import socket
+import threading
 import time
-from typing import Tuple, Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List, Callable
+
+from services.circuit_breaker import circuit_breaker
+from services.connection_race import RaceAttempt, connect_socket, race, remaining
+from services.deadline import Deadline, DeadlineExceeded
+from services.server_strategies import AccountServerStrategies, ConnectionStrategy, strategy_cache
+from services.tls_sessions import tls_session_cache
 
 logger = logging.getLogger(__name__)
 
+PREFERRED_HEAD_START = 2.0  # Seconds the remembered strategy runs alone before the others join
+STRATEGY_STAGGER = 0.5  # Seconds between starting further strategies while earlier ones still run
+
+
+class LoginRefusedError(ConnectionError):
+    """Raised when a mail server was reached but refused the account's credentials"""
+    pass
+
+
+def _server_unreachable(error: Exception) -> bool:
+    """Whether a connect error means the server could not be reached, rather than that it refused the login"""
+    if isinstance(error, LoginRefusedError):
+        return False
+    if isinstance(error, (imaplib.IMAP4.abort, smtplib.SMTPServerDisconnected)):
+        return True
+    if isinstance(error, imaplib.IMAP4.error):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        # The server answered; only a refused greeting means it can't serve anyone
+        return isinstance(error, smtplib.SMTPConnectError) or error.smtp_code == 421
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class _DeadlineBound:
+    """
+    Mail session whose socket calls are bounded by the deadline of the request using it
+
+    Timeouts are set on the session's own socket before every read and write,
+    so concurrent sessions never affect each other.
+    """
+
+    deadline: Optional[Deadline] = None
+    default_timeout: Optional[float] = None  # Socket timeout while no deadline applies
+    protocol_name = 'Mail'
+
+    def set_deadline(self, deadline: Optional[Deadline]):
+        """
+        Bound the session's socket calls by a deadline
+
+        Args:
+            deadline: Deadline of the request now using the session, or None to
+                restore the regular timeout, e.g. when the session returns to its pool
+        """
+        self.deadline = deadline
+        sock = getattr(self, 'sock', None)
+        if deadline is None and sock is not None:
+            sock.settimeout(self.default_timeout)
+
+    def _bound_socket(self):
+        """Shorten the socket timeout to the time left; raises DeadlineExceeded once it is spent"""
+        sock = getattr(self, 'sock', None)
+        if self.deadline is not None and sock is not None:
+            sock.settimeout(self.deadline.timeout(self.default_timeout, f"{self.protocol_name} command"))
+
+
+class _DeadlineIMAP4(_DeadlineBound):
+    """IMAP4 session bounded by a request deadline"""
+
+    protocol_name = 'IMAP'
+
+    def read(self, size):
+        self._bound_socket()
+        return super().read(size)
+
+    def readline(self):
+        self._bound_socket()
+        return super().readline()
+
+    def send(self, data):
+        self._bound_socket()
+        super().send(data)
+
+
+class _DeadlineSMTP(_DeadlineBound):
+    """SMTP session bounded by a request deadline"""
+
+    protocol_name = 'SMTP'
+
+    def send(self, s):
+        self._bound_socket()
+        super().send(s)
+
+    def getreply(self):
+        self._bound_socket()
+        return super().getreply()
+
+
+class _RacingIMAP4(_DeadlineIMAP4, imaplib.IMAP4):
+    """IMAP4 session whose TCP connect races the server's addresses and can be cancelled"""
+
+    def __init__(self, host: str, port: int, deadline: float, timeout: float, attempt: RaceAttempt):
+        self._deadline = deadline
+        self._attempt = attempt
+        super().__init__(host, port, timeout)
+
+    def _create_socket(self, timeout):
+        return connect_socket(self.host, self.port, self._deadline, timeout, self._attempt)
+
+
+class _RacingIMAP4_SSL(_DeadlineIMAP4, imaplib.IMAP4_SSL):
+    """IMAP4_SSL session whose TCP connect races the server's addresses and can be cancelled"""
+
+    def __init__(self, host: str, port: int, ssl_context: ssl.SSLContext, deadline: float,
+                 timeout: float, attempt: RaceAttempt):
+        self._deadline = deadline
+        self._attempt = attempt
+        super().__init__(host, port, ssl_context=ssl_context, timeout=timeout)
+
+    def _create_socket(self, timeout):
+        sock = connect_socket(self.host, self.port, self._deadline, timeout, self._attempt)
+        sock = self.ssl_context.wrap_socket(sock, server_hostname=self.host)
+        self._attempt.register(sock)
+        return sock
+
+
+class _RacingSMTP(_DeadlineSMTP, smtplib.SMTP):
+    """SMTP session whose TCP connect races the server's addresses and can be cancelled"""
+
+    def __init__(self, host: str, port: int, deadline: float, timeout: float, attempt: RaceAttempt):
+        self._deadline = deadline
+        self._attempt = attempt
+        super().__init__(host, port, timeout=timeout)
+
+    def _get_socket(self, host, port, timeout):
+        return connect_socket(host, port, self._deadline, timeout, self._attempt)
+
+
+class _RacingSMTP_SSL(smtplib.SMTP_SSL, _RacingSMTP):
+    """SMTP_SSL session whose TCP connect races the server's addresses and can be cancelled"""
+
+    def __init__(self, host: str, port: int, context: ssl.SSLContext, deadline: float,
+                 timeout: float, attempt: RaceAttempt):
+        self._deadline = deadline
+        self._attempt = attempt
+        smtplib.SMTP_SSL.__init__(self, host, port, context=context, timeout=timeout)
+
+    def _get_socket(self, host, port, timeout):
+        # SMTP_SSL wraps the socket _RacingSMTP connected
+        sock = super()._get_socket(host, port, timeout)
+        self._attempt.register(sock)
+        return sock
+
+
 class EmailConnection:
     """
     Handles secure connections to email services with robust fallback mechanisms
@@ -26,17 +182,21 @@ class EmailConnection:
     def __init__(self):
         """Initialize connection manager with default settings"""
         self.timeout = 30  # Default socket timeout in seconds
-        self.max_retries = 3  # Default number of retries
-        self.retry_delay = 1  # Seconds between retries
+        self.connect_deadline = 30  # Seconds a whole connect, with every fallback, may take
         self.verbose_logging = False  # Reduce log verbosity by default
 
     def create_imap_connection(self, server: str, username: str, password: str,
                               port: int = 993, use_ssl: bool = True,
                               verify_cert: bool = True,
-                              allow_insecure: bool = False) -> imaplib.IMAP4:
+                              allow_insecure: bool = False,
+                              saved_strategies: Optional[AccountServerStrategies] = None,
+                              deadline: Optional[Deadline] = None) -> imaplib.IMAP4:
         """
         Create a connection to an IMAP server with proper error handling and fallback options
 
+        The strategy that worked last time is tried first; the full fallback
+        walk only runs when it fails.
+
         Args:
             server: IMAP server address
             username: Email username/address
@@ -45,70 +205,53 @@ class EmailConnection:
             use_ssl: Whether to attempt SSL connection first
             verify_cert: Whether to verify SSL certificates
             allow_insecure: Whether to allow plain text connections as last resort
+            saved_strategies: Optional per-account store that keeps the working strategy across restarts
+            deadline: Optional request deadline bounding the connect and every later command
 
         Returns:
             IMAP4 connection object
 
         Raises:
             ConnectionError: If all connection methods fail
+            DeadlineExceeded: If the request deadline passed while connecting
         """
-        # Save original socket timeout and set our custom timeout
-        original_timeout = socket.getdefaulttimeout()
-        socket.setdefaulttimeout(self.timeout)
-
-        try:
-            # Create insecure context for most reliable connection
-            # Many email servers use self-signed or outdated certificates
-            context = self._create_insecure_context()
-
-            # First try direct SSL connection with no verification (most reliable)
-            try:
-                conn = imaplib.IMAP4_SSL(server, port, ssl_context=context)
-                conn.login(username, password)
-                logger.info(f"IMAP connected to {server} using SSL without verification")
-                return conn
-            except Exception as e:
-                if self.verbose_logging:
-                    logger.warning(f"IMAP SSL connection failed: {str(e)}")
-
-            # Try STARTTLS as fallback
+        def open_session(strategy: ConnectionStrategy, deadline: float, attempt: RaceAttempt) -> imaplib.IMAP4:
+            context = self._tls_context('imap', server, strategy) if strategy.mode != 'plain' else None
+            if strategy.mode == 'ssl':
+                conn = _RacingIMAP4_SSL(server, strategy.port, context, deadline, remaining(deadline), attempt)
+            else:
+                conn = _RacingIMAP4(server, strategy.port, deadline, remaining(deadline), attempt)
             try:
-                conn = imaplib.IMAP4(server, 143)  # Standard non-SSL port
-                conn.starttls(ssl_context=context)
-                conn.login(username, password)
-                logger.info(f"IMAP connected to {server} using STARTTLS")
-                return conn
-            except Exception as e:
-                if self.verbose_logging:
-                    logger.warning(f"IMAP STARTTLS failed: {str(e)}")
-
-            # Last resort: plain connection (only if explicitly allowed)
-            if allow_insecure:
+                if strategy.mode == 'starttls':
+                    conn.starttls(ssl_context=context)
+                    attempt.register(conn.sock)
                 try:
-                    conn = imaplib.IMAP4(server, 143)
                     conn.login(username, password)
-                    logger.info(f"IMAP connected to {server} using plain connection")
-                    return conn
-                except Exception as e:
-                    if self.verbose_logging:
-                        logger.warning(f"IMAP plain connection failed: {str(e)}")
-
-            # If we get here, all methods failed
-            error_msg = f"All IMAP connection methods failed to {server}"
-            logger.error(error_msg)
-            raise ConnectionError(error_msg)
-
-        finally:
-            # Restore original socket timeout
-            socket.setdefaulttimeout(original_timeout)
+                except imaplib.IMAP4.abort:
+                    raise
+                except imaplib.IMAP4.error as e:
+                    raise LoginRefusedError(f"IMAP login refused: {str(e)}") from e
+            except Exception:
+                conn.shutdown()
+                raise
+            return conn
+
+        return self._connect('imap', server, port,
+                             self.imap_strategies(port, use_ssl, verify_cert, allow_insecure),
+                             open_session, lambda conn: conn.shutdown(), saved_strategies, deadline)
 
     def create_smtp_connection(self, server: str, username: str, password: str,
                               port: int = 587, use_ssl: bool = True,
                               verify_cert: bool = True,
-                              allow_insecure: bool = False) -> smtplib.SMTP:
+                              allow_insecure: bool = False,
+                              saved_strategies: Optional[AccountServerStrategies] = None,
+                              deadline: Optional[Deadline] = None) -> smtplib.SMTP:
         """
         Create a connection to an SMTP server with proper error handling and fallback options
 
+        The strategy that worked last time is tried first; the full fallback
+        walk only runs when it fails.
+
         Args:
             server: SMTP server address
             username: Email username/address
@@ -117,149 +260,198 @@ class EmailConnection:
             use_ssl: Whether to attempt SSL connection first
             verify_cert: Whether to verify SSL certificates
             allow_insecure: Whether to allow plain text connections as last resort
+            saved_strategies: Optional per-account store that keeps the working strategy across restarts
+            deadline: Optional request deadline bounding the connect and every later command
 
         Returns:
             SMTP connection object
 
         Raises:
             ConnectionError: If all connection methods fail
+            DeadlineExceeded: If the request deadline passed while connecting
         """
-        # Save original socket timeout and set our custom timeout
-        original_timeout = socket.getdefaulttimeout()
-        socket.setdefaulttimeout(self.timeout)
-
-        try:
-            # Create insecure context for most reliable connection
-            context = self._create_insecure_context()
-
-            # Try SMTP_SSL first (port 465)
-            try:
-                conn = smtplib.SMTP_SSL(server, 465, context=context)
-                conn.ehlo()
-                conn.login(username, password)
-                logger.info(f"SMTP connected to {server} using SSL")
-                return conn
-            except Exception as e:
-                if self.verbose_logging:
-                    logger.warning(f"SMTP_SSL connection failed: {str(e)}")
-
-            # Try STARTTLS next (port 587)
+        def open_session(strategy: ConnectionStrategy, deadline: float, attempt: RaceAttempt) -> smtplib.SMTP:
+            context = self._tls_context('smtp', server, strategy) if strategy.mode != 'plain' else None
+            if strategy.mode == 'ssl':
+                conn = _RacingSMTP_SSL(server, strategy.port, context, deadline, remaining(deadline), attempt)
+            else:
+                conn = _RacingSMTP(server, strategy.port, deadline, remaining(deadline), attempt)
             try:
-                conn = smtplib.SMTP(server, port)
                 conn.ehlo()
-                if conn.has_extn('STARTTLS'):
+                if strategy.mode == 'starttls':
+                    # Raises SMTPNotSupportedError without STARTTLS, so the race moves on
+                    # instead of logging in over plain text in the secure phase
                     conn.starttls(context=context)
+                    attempt.register(conn.sock)
                     conn.ehlo()
-                conn.login(username, password)
-                logger.info(f"SMTP connected to {server} using STARTTLS")
-                return conn
-            except Exception as e:
-                if self.verbose_logging:
-                    logger.warning(f"SMTP STARTTLS failed: {str(e)}")
-
-            # Last resort: plain connection
-            if allow_insecure:
                 try:
-                    conn = smtplib.SMTP(server, 25)
-                    conn.ehlo()
                     conn.login(username, password)
-                    logger.info(f"SMTP connected to {server} using plain connection")
-                    return conn
-                except Exception as e:
-                    if self.verbose_logging:
-                        logger.warning(f"SMTP plain connection failed: {str(e)}")
+                except smtplib.SMTPAuthenticationError as e:
+                    raise LoginRefusedError(f"SMTP login refused: {str(e)}") from e
+            except Exception:
+                conn.close()
+                raise
+            return conn
+
+        return self._connect('smtp', server, port,
+                             self.smtp_strategies(port, use_ssl, verify_cert, allow_insecure),
+                             open_session, lambda conn: conn.close(), saved_strategies, deadline)
+
+    def imap_strategies(self, port: int, use_ssl: bool = True, verify_cert: bool = True,
+                        allow_insecure: bool = False) -> List[ConnectionStrategy]:
+        """
+        List the ways of reaching an IMAP server, in fallback order
 
-            # If we get here, all methods failed
-            error_msg = f"All SMTP connection methods failed to {server}"
-            logger.error(error_msg)
-            raise ConnectionError(error_msg)
+        Args:
+            port: Configured IMAP port
+            use_ssl: Whether to try SSL on the configured port first
+            verify_cert: Whether TLS strategies verify certificates
+            allow_insecure: Whether to end with a plain text connection
 
-        finally:
-            # Restore original socket timeout
-            socket.setdefaulttimeout(original_timeout)
-
-    def _create_insecure_context(self) -> ssl.SSLContext:
-        """Create an insecure SSL context for fallback connections"""
-        insecure_context = ssl.create_default_context()
-        insecure_context.check_hostname = False
-        insecure_context.verify_mode = ssl.CERT_NONE
-        return insecure_context
-
-    def _try_starttls_imap(self, server: str, context: ssl.SSLContext) -> Tuple[imaplib.IMAP4, str]:
-        """Try to connect using STARTTLS for IMAP"""
-        try:
-            conn = imaplib.IMAP4(server, 143)  # Standard non-SSL port
-            conn.starttls(ssl_context=context)
-            return conn, "STARTTLS"
-        except Exception as e:
-            logger.warning(f"IMAP STARTTLS failed: {str(e)}")
-            raise
-
-    def _try_starttls_smtp(self, server: str, port: int, context: ssl.SSLContext,
-                          hostname: str = None) -> Tuple[smtplib.SMTP, str]:
-        """Try to connect using STARTTLS for SMTP"""
-        try:
-            conn = smtplib.SMTP(server, port)
-            conn.ehlo(hostname)
-            if conn.has_extn('STARTTLS'):
-                conn.starttls(context=context)
-                conn.ehlo(hostname)
-                return conn, "STARTTLS"
-            else:
-                return conn, "Plain (STARTTLS not available)"
-        except Exception as e:
-            logger.warning(f"SMTP STARTTLS failed: {str(e)}")
-            raise
-
-    def _create_imap_ssl(self, server: str, port: int, context: ssl.SSLContext) -> imaplib.IMAP4_SSL:
-        """Create an IMAP SSL connection"""
-        try:
-            return imaplib.IMAP4_SSL(server, port, ssl_context=context)
-        except Exception as e:
-            logger.warning(f"IMAP SSL connection failed: {str(e)}")
-            raise
-
-    def _create_imap_ssl_with_hostname(self, server: str, port: int, hostname: str,
-                                       context: ssl.SSLContext) -> imaplib.IMAP4_SSL:
-        """Create an IMAP SSL connection with explicit hostname"""
-        try:
-            # Some servers require the hostname to be explicitly provided for certificate validation
-            # Note: server_hostname parameter isn't supported in Python's standard IMAP4_SSL
-            # Use host parameter directly but check the SSL cert against the hostname
-            context.check_hostname = True
-            context.verify_mode = ssl.CERT_REQUIRED
-            imap_ssl = imaplib.IMAP4_SSL(host=server, port=port, ssl_context=context)
-            return imap_ssl
-        except Exception as e:
-            logger.warning(f"IMAP SSL connection with hostname failed: {str(e)}")
-            raise
-
-    def _create_smtp_ssl(self, server: str, port: int, context: ssl.SSLContext,
-                         hostname: str = None) -> Tuple[smtplib.SMTP_SSL, str]:
-        """Create an SMTP_SSL connection"""
-        try:
-            conn = smtplib.SMTP_SSL(server, port, context=context)
-            if hostname:
-                conn.ehlo(hostname)
-            else:
-                conn.ehlo()
-            return conn, "SSL direct"
-        except Exception as e:
-            logger.warning(f"SMTP_SSL connection failed: {str(e)}")
-            raise
+        Returns:
+            Connection strategies
+        """
+        strategies = [ConnectionStrategy('starttls', 143, verify_cert)]
+        if use_ssl:
+            strategies.insert(0, ConnectionStrategy('ssl', port, verify_cert))
+        if allow_insecure:
+            strategies.append(ConnectionStrategy('plain', 143, False))
+        return strategies
+
+    def smtp_strategies(self, port: int, use_ssl: bool = True, verify_cert: bool = True,
+                        allow_insecure: bool = False) -> List[ConnectionStrategy]:
+        """
+        List the ways of reaching an SMTP server, in fallback order
+
+        Args:
+            port: Configured SMTP port, used for STARTTLS
+            use_ssl: Whether to try SSL on port 465 first
+            verify_cert: Whether TLS strategies verify certificates
+            allow_insecure: Whether to end with plain text connections on the configured port and port 25
 
-    def _get_proper_hostname(self, server: str) -> str:
+        Returns:
+            Connection strategies
         """
-        Get the proper hostname for certificate validation
+        strategies = [ConnectionStrategy('starttls', port, verify_cert)]
+        if use_ssl:
+            strategies.insert(0, ConnectionStrategy('ssl', 465, verify_cert))
+        if allow_insecure:
+            # Servers without STARTTLS on the configured port are only used in the plain phase
+            strategies.append(ConnectionStrategy('plain', port, False))
+            if port != 25:
+                strategies.append(ConnectionStrategy('plain', 25, False))
+        return strategies
+
+    def _connect(self, protocol: str, server: str, port: int, strategies: List[ConnectionStrategy],
+                 open_session: Callable[[ConnectionStrategy, float, RaceAttempt], Any],
+                 close_session: Callable[[Any], None],
+                 saved_strategies: Optional[AccountServerStrategies],
+                 request_deadline: Optional[Deadline] = None) -> Any:
+        """
+        Open a session by racing strategies, the remembered one with a head start
+
+        Encrypted strategies race first, so a password never goes out in plain
+        text while TLS would have worked. Plain connections only race once all
+        of them failed, unless plain text is what worked last time.
 
-        Some servers use different hostnames for connection vs. certificate validation
-        This extracts the domain part from an address like mail.example.com
+        Args:
+            protocol: 'imap' or 'smtp'
+            server: Server address
+            port: Configured port, part of the key strategies are remembered under
+            strategies: Allowed strategies in fallback order
+            open_session: Opens and authenticates a session with one strategy before the deadline
+            close_session: Closes a session that lost the race
+            saved_strategies: Optional per-account store of working strategies
+            request_deadline: Optional request deadline; the connect ends by then at the latest
+
+        Returns:
+            Authenticated session
+
+        Raises:
+            ConnectionError: If every strategy failed or the connect deadline passed
+            LoginRefusedError: If a server was reached but refused the credentials
+            CircuitOpenError: If the server failed repeatedly and is not contacted for now
+            DeadlineExceeded: If the request deadline passed
         """
-        parts = server.split('.')
-        if len(parts) >= 2:
-            # Extract domain and TLD (e.g., example.com from mail.example.com)
-            return '.'.join(parts[-2:])
-        return server  # Fallback to the original server name
+        remembered = strategy_cache.get(protocol, server, port)
+        stored = saved_strategies.load(protocol) if saved_strategies else None
+        preferred = remembered or stored
+        if preferred in strategies:
+            strategies = [preferred] + [strategy for strategy in strategies if strategy != preferred]
+
+        secure = [strategy for strategy in strategies if strategy.mode != 'plain']
+        plain = [strategy for strategy in strategies if strategy.mode == 'plain']
+        phases = [plain, secure] if preferred in plain else [secure, plain]
+
+        deadline = time.monotonic() + self.connect_deadline
+        shortened = False  # Whether the request deadline leaves less than the full connect deadline
+        if request_deadline is not None:
+            request_deadline.check(f"{protocol.upper()} connect")
+            shortened = request_deadline.expires < deadline
+            deadline = min(deadline, request_deadline.expires)
+        circuit_breaker.before_connect(server)
+        errors = []
+        winner = None
+        for phase in phases:
+            if not phase:
+                continue
+            delays = [PREFERRED_HEAD_START if phase[0] == preferred else STRATEGY_STAGGER, STRATEGY_STAGGER]
+            winner = race(phase, lambda strategy, attempt: open_session(strategy, deadline, attempt),
+                          deadline, delays, close_session, errors)
+            if winner is not None or remaining(deadline) <= 0:
+                break
+
+        for strategy, error in errors:
+            # Running out of time says nothing about whether the strategy still works
+            if strategy is not None and strategy == preferred and not isinstance(error, TimeoutError):
+                logger.info(f"{protocol.upper()} {server}: remembered {strategy.describe()} failed: {str(error)}")
+                strategy_cache.forget(protocol, server, port)
+            elif self.verbose_logging:
+                logger.warning(f"{protocol.upper()} {strategy.describe() if strategy else 'connect'} failed: {str(error)}")
+
+        if winner is None:
+            # If we get here, all methods failed
+            error_msg = f"All {protocol.upper()} connection methods failed to {server}"
+            if errors:
+                error_msg += f": {str(errors[-1][1])}"
+            # A refused login shows the server is up; only unreachable servers trip the breaker
+            if any(not _server_unreachable(error) for _, error in errors):
+                circuit_breaker.succeeded(server)
+            elif shortened and any(isinstance(error, TimeoutError) for _, error in errors):
+                # The request ran out of time, not the server: that's no verdict on the host
+                circuit_breaker.abandoned(server)
+            elif errors:
+                circuit_breaker.failed(server, ConnectionError(error_msg))
+            else:
+                circuit_breaker.abandoned(server)
+            if any(isinstance(error, LoginRefusedError) for _, error in errors):
+                logger.warning(error_msg)
+                raise LoginRefusedError(error_msg)
+            if request_deadline is not None and request_deadline.expired():
+                logger.warning(error_msg)
+                raise DeadlineExceeded(error_msg)
+            logger.error(error_msg)
+            raise ConnectionError(error_msg)
+
+        circuit_breaker.succeeded(server)
+        strategy, conn = winner
+        # The race bounded the socket by the connect deadline; from now on the
+        # request deadline or the regular timeout applies
+        conn.default_timeout = self.timeout
+        conn.sock.settimeout(self.timeout)
+        conn.set_deadline(request_deadline)
+        # Login read a response, so TLS 1.3 session tickets have arrived by now
+        tls_session_cache.remember(conn.sock)
+        if strategy != remembered:
+            strategy_cache.put(protocol, server, port, strategy)
+            logger.info(f"{protocol.upper()} connected to {server} using {strategy.describe()}")
+        if saved_strategies and strategy != stored:
+            saved_strategies.save(protocol, strategy)
+        return conn
+
+    def _tls_context(self, protocol: str, server: str, strategy: ConnectionStrategy) -> ssl.SSLContext:
+        """Get the shared SSL context a strategy asks for, which resumes the server's last TLS session"""
+        return tls_session_cache.context(protocol, server, strategy.port, strategy.verify_cert)
 
     def test_connection(self, imap_server: str, smtp_server: str, username: str,
                         password: str, imap_port: int = 993, smtp_port: int = 587) -> Dict[str, bool]:
@@ -282,29 +474,33 @@ class EmailConnection:
             'smtp_success': False
         }
 
-        # Test IMAP connection
-        try:
-            # Try with SSL first
-            imap_conn = self.create_imap_connection(
-                imap_server, username, password, imap_port,
-                use_ssl=True, verify_cert=False, allow_insecure=True
-            )
-            imap_conn.logout()
-            results['imap_success'] = True
-        except Exception as e:
-            logger.error(f"IMAP test connection failed: {str(e)}")
-
-        # Test SMTP connection
-        try:
-            # Try with STARTTLS first
-            smtp_conn = self.create_smtp_connection(
-                smtp_server, username, password, smtp_port,
-                use_ssl=True, verify_cert=False, allow_insecure=True
-            )
-            smtp_conn.quit()
-            results['smtp_success'] = True
-        except Exception as e:
-            logger.error(f"SMTP test connection failed: {str(e)}")
+        def test_imap():
+            try:
+                imap_conn = self.create_imap_connection(
+                    imap_server, username, password, imap_port,
+                    use_ssl=True, verify_cert=False, allow_insecure=True
+                )
+                imap_conn.logout()
+                results['imap_success'] = True
+            except Exception as e:
+                logger.error(f"IMAP test connection failed: {str(e)}")
+
+        def test_smtp():
+            try:
+                smtp_conn = self.create_smtp_connection(
+                    smtp_server, username, password, smtp_port,
+                    use_ssl=True, verify_cert=False, allow_insecure=True
+                )
+                smtp_conn.quit()
+                results['smtp_success'] = True
+            except Exception as e:
+                logger.error(f"SMTP test connection failed: {str(e)}")
+
+        # Both run at once, so the test takes at most one connect deadline
+        smtp_test = threading.Thread(target=test_smtp, name='smtp-connection-test', daemon=True)
+        smtp_test.start()
+        test_imap()
+        smtp_test.join()
 
         return results
 
@@ -312,16 +508,9 @@ class EmailConnection:
         """Set connection timeout in seconds"""
         self.timeout = timeout
 
-    def set_retry_policy(self, max_retries: int, retry_delay: float):
-        """
-        Set retry policy for connection attempts
-
-        Args:
-            max_retries: Maximum number of retry attempts
-            retry_delay: Delay between retries in seconds
-        """
-        self.max_retries = max_retries
-        self.retry_delay = retry_delay
+    def set_connect_deadline(self, deadline: float):
+        """Set the seconds a whole connect, racing every fallback, may take"""
+        self.connect_deadline = deadline
 
     def set_verbosity(self, verbose: bool):
         """
@@ -0,0 +1,158 @@
+"""
+Folder Roles Module
+
+Provides discovery and caching of special folder roles including:
+- Classification of mailboxes by SPECIAL-USE attributes (RFC 6154)
+- Name heuristics for servers that do not advertise SPECIAL-USE
+- A per-account cache of resolved roles stored alongside the email settings
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+from database import db
+from database.identity.models import MailFolderRole
+
+logger = logging.getLogger(__name__)
+
+# Roles resolved per account and the SPECIAL-USE attribute marking each one
+ROLE_ATTRIBUTES = {
+    'sent': '\\sent',
+    'drafts': '\\drafts',
+    'trash': '\\trash',
+    'spam': '\\junk',
+    'archive': '\\archive',
+}
+
+# Usual folder names per role, compared case-insensitively with the last path segment
+ROLE_NAMES = {
+    'sent': ('sent', 'sent items', 'sent mail', 'sent messages'),
+    'drafts': ('drafts', 'draft'),
+    'trash': ('trash', 'deleted items', 'deleted messages', 'bin'),
+    'spam': ('spam', 'junk', 'junk e-mail', 'junk email', 'bulk mail'),
+    'archive': ('archive', 'archives'),
+}
+
+# Substrings that mark a folder's role when nothing more specific matches
+ROLE_KEYWORDS = {
+    'sent': ('Sent',),
+    'drafts': ('Draft',),
+    'trash': ('Trash',),
+    'spam': ('Spam', 'Junk'),
+    'archive': ('Archive',),
+}
+
+
+def _leaf_name(mailbox: Dict[str, Any]) -> str:
+    """Last segment of a mailbox path, e.g. 'Sent' for 'INBOX.Sent'"""
+    name, delimiter = mailbox['name'], mailbox.get('delimiter')
+    return name.rsplit(delimiter, 1)[-1] if delimiter else name
+
+
+def folder_type(mailbox: Dict[str, Any]) -> str:
+    """
+    Classify one mailbox for display
+
+    Args:
+        mailbox: Parsed LIST entry
+
+    Returns:
+        'inbox', a role from ROLE_ATTRIBUTES, or 'folder'
+    """
+    if mailbox['name'].upper() == 'INBOX':
+        return 'inbox'
+
+    attributes = {attribute.lower() for attribute in mailbox['attributes']}
+    for role, attribute in ROLE_ATTRIBUTES.items():
+        if attribute in attributes:
+            return role
+    for role, keywords in ROLE_KEYWORDS.items():
+        if any(keyword in mailbox['name'] for keyword in keywords):
+            return role
+    return 'folder'
+
+
+def resolve_roles(mailboxes: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """
+    Pick the folder holding each role
+
+    SPECIAL-USE attributes win over well-known names, which win over
+    names merely containing a keyword, so 'Sent' is chosen over 'Sent-2019'.
+
+    Args:
+        mailboxes: Parsed LIST entries
+
+    Returns:
+        Dictionary mapping every role in ROLE_ATTRIBUTES to a folder name or None
+    """
+    selectable = [mailbox for mailbox in mailboxes
+                  if not {'\\noselect', '\\nonexistent'} & {a.lower() for a in mailbox['attributes']}]
+
+    roles = {}
+    for role, attribute in ROLE_ATTRIBUTES.items():
+        tiers = (
+            lambda mailbox: attribute in {a.lower() for a in mailbox['attributes']},
+            lambda mailbox: _leaf_name(mailbox).lower() in ROLE_NAMES[role],
+            lambda mailbox: any(keyword in mailbox['name'] for keyword in ROLE_KEYWORDS[role]),
+        )
+        roles[role] = next((mailbox['name'] for matches in tiers for mailbox in selectable
+                            if matches(mailbox)), None)
+    return roles
+
+
+class AccountFolderRoles:
+    """
+    Cached folder roles of one account
+
+    Handles:
+    - Loading roles resolved earlier, so role lookups need no LIST command
+    - Storing newly resolved roles, including roles the account lacks
+    - Dropping the cache after the folder hierarchy changed
+    """
+
+    def __init__(self, settings_id: int):
+        """
+        Initialize the cache of an account
+
+        Args:
+            settings_id: EmailSettings id of the account
+        """
+        self.settings_id = settings_id
+
+    def load(self) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Get the cached roles
+
+        Returns:
+            Dictionary mapping role to folder name or None, or None if roles were never resolved
+        """
+        rows = MailFolderRole.query.filter_by(settings_id=self.settings_id).all()
+        if not rows:
+            return None
+        return {row.role: row.folder for row in rows}
+
+    def save(self, roles: Dict[str, Optional[str]]):
+        """
+        Replace the cached roles
+
+        Args:
+            roles: Dictionary mapping role to folder name or None
+        """
+        now = datetime.utcnow()
+        rows = {row.role: row for row in MailFolderRole.query.filter_by(settings_id=self.settings_id)}
+        for role, folder in roles.items():
+            row = rows.get(role)
+            if row is None:
+                row = MailFolderRole(settings_id=self.settings_id, role=role)
+                db.session.add(row)
+            elif row.folder != folder:
+                logger.info(f"Folder role {role} of settings {self.settings_id} moved from {row.folder} to {folder}")
+            row.folder = folder
+            row.resolved_at = now
+        db.session.commit()
+
+    def invalidate(self):
+        """Forget the cached roles so they are resolved again on next use"""
+        MailFolderRole.query.filter_by(settings_id=self.settings_id).delete(synchronize_session=False)
+        db.session.commit()
@@ -0,0 +1,217 @@
+"""
+IMAP Capabilities Module
+
+Provides negotiation of IMAP protocol fast paths including:
+- A capability model parsed once per connection
+- Capabilities cached per server for planning and monitoring
+- Selection of the cheapest strategy an operation can use on a server
+- Counters of the strategies each operation actually used
+"""
+
+import logging
+import threading
+from typing import Dict, List, Tuple, Optional, Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Strategies per operation, cheapest first, with the capabilities each one requires
+STRATEGIES: Dict[str, List[Tuple[str, Tuple[str, ...]]]] = {
+    'list_folders': [
+        ('list-status', ('LIST-STATUS',)),
+        ('list-then-status', ()),
+    ],
+    'search_page': [
+        ('sort-partial', ('SORT', 'CONTEXT=SORT')),
+        ('search-partial', ('PARTIAL',)),
+        ('sort', ('SORT',)),
+        ('esearch', ('ESEARCH',)),
+        ('search', ()),
+    ],
+    'sync': [
+        ('qresync', ('ENABLE', 'QRESYNC')),
+        ('condstore', ('ENABLE', 'CONDSTORE')),
+        ('uid-scan', ()),
+    ],
+    'status': [
+        ('status-modseq', ('CONDSTORE',)),
+        ('status', ()),
+    ],
+    'move': [
+        ('uid-move', ('MOVE',)),
+        ('copy-uid-expunge', ('UIDPLUS',)),
+        ('copy-expunge', ()),
+    ],
+    'expunge': [
+        ('uid-expunge', ('UIDPLUS',)),
+        ('expunge', ()),
+    ],
+    'watch': [
+        ('idle', ('IDLE',)),
+        ('status-poll', ()),
+    ],
+    'folder_roles': [
+        ('list-special-use', ('SPECIAL-USE',)),
+        ('list-names', ()),
+    ],
+    'append': [
+        ('literal-plus', ('LITERAL+',)),
+        ('literal', ()),
+    ],
+}
+
+
+class ServerCapabilities:
+    """
+    Capabilities advertised by one IMAP server
+
+    Handles:
+    - Case-insensitive capability checks
+    - Picking the first strategy of an operation whose requirements are met
+    """
+
+    def __init__(self, capabilities: Iterable[str]):
+        """
+        Initialize from a CAPABILITY list
+
+        Args:
+            capabilities: Capability names, e.g. imaplib's IMAP4.capabilities
+        """
+        self.names = frozenset(str(capability).upper() for capability in capabilities)
+
+    def has(self, *capabilities: str) -> bool:
+        """
+        Check whether every given capability is advertised
+
+        Args:
+            *capabilities: Capability names such as 'MOVE' or 'CONTEXT=SORT'
+
+        Returns:
+            True if all of them are available
+        """
+        return all(capability.upper() in self.names for capability in capabilities)
+
+    def strategy(self, operation: str) -> str:
+        """
+        Pick the cheapest strategy for an operation
+
+        Args:
+            operation: Key of STRATEGIES
+
+        Returns:
+            Strategy name
+        """
+        for name, required in STRATEGIES[operation]:
+            if self.has(*required):
+                return name
+        return STRATEGIES[operation][-1][0]
+
+
+class CapabilityRegistry:
+    """
+    Process-wide cache of server capabilities and strategy usage
+
+    Handles:
+    - Sharing one ServerCapabilities object per server and capability set
+    - Logging the strategy an operation uses on a server when it changes
+    - Counting strategy use per operation for the monitoring dashboard
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._lock = threading.Lock()
+        self._servers: Dict[str, ServerCapabilities] = {}
+        self._chosen: Dict[Tuple[str, str], str] = {}
+        self._counts: Dict[Tuple[str, str], int] = {}
+
+    def parse(self, server: str, capabilities: Iterable[str]) -> ServerCapabilities:
+        """
+        Get the capability model of a server, reusing the cached one if unchanged
+
+        Args:
+            server: Server identifier such as 'imap.example.com:993'
+            capabilities: Capability names advertised on the connection
+
+        Returns:
+            ServerCapabilities for the server
+        """
+        parsed = ServerCapabilities(capabilities)
+        with self._lock:
+            cached = self._servers.get(server)
+            if cached is not None and cached.names == parsed.names:
+                return cached
+            self._servers[server] = parsed
+
+        logger.info(f"IMAP server {server} advertises: {' '.join(sorted(parsed.names))}")
+        return parsed
+
+    def get(self, server: str) -> Optional[ServerCapabilities]:
+        """
+        Get the last known capabilities of a server
+
+        Args:
+            server: Server identifier
+
+        Returns:
+            ServerCapabilities, or None if no connection to the server was made yet
+        """
+        with self._lock:
+            return self._servers.get(server)
+
+    def choose(self, server: str, capabilities: ServerCapabilities, operation: str) -> str:
+        """
+        Pick and record the strategy an operation uses on a server
+
+        Args:
+            server: Server identifier
+            capabilities: Capabilities of the connection
+            operation: Key of STRATEGIES
+
+        Returns:
+            Strategy name
+        """
+        strategy = capabilities.strategy(operation)
+        self.record(server, operation, strategy)
+        return strategy
+
+    def record(self, server: str, operation: str, strategy: str):
+        """
+        Record a strategy decided elsewhere, e.g. after a fallback
+
+        Args:
+            server: Server identifier
+            operation: Operation name
+            strategy: Strategy name
+        """
+        with self._lock:
+            previous = self._chosen.get((server, operation))
+            self._chosen[(server, operation)] = strategy
+            self._counts[(operation, strategy)] = self._counts.get((operation, strategy), 0) + 1
+
+        if previous != strategy:
+            logger.info(f"IMAP {operation} on {server} uses {strategy}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get capabilities and strategy usage for monitoring
+
+        Returns:
+            Dictionary with 'servers' (capabilities and current strategies per server)
+            and 'strategies' (use counts per operation and strategy)
+        """
+        with self._lock:
+            servers = [{
+                'server': server,
+                'capabilities': sorted(capabilities.names),
+                'strategies': {operation: strategy for (name, operation), strategy in self._chosen.items()
+                               if name == server}
+            } for server, capabilities in self._servers.items()]
+
+            strategies: Dict[str, Dict[str, int]] = {}
+            for (operation, strategy), count in self._counts.items():
+                strategies.setdefault(operation, {})[strategy] = count
+
+        return {'servers': servers, 'strategies': strategies}
+
+
+# Shared by every EmailClient in the process
+capability_registry = CapabilityRegistry()
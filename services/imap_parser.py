@@ -0,0 +1,453 @@
+"""
+IMAP Response Parser Module
+
+Provides parsing helpers for raw IMAP server responses including:
+- Tokenizing parenthesized lists, quoted strings and literals
+- FETCH responses demultiplexed into per-message records
+- ENVELOPE and BODYSTRUCTURE decoding into plain dictionaries
+- LIST and STATUS mailbox responses
+"""
+
+import email.utils
+import urllib.parse
+from typing import Dict, List, Tuple, Optional, Any, Union
+
+_LPAREN = object()
+_RPAREN = object()
+
+
+def _tokenize_text(text: bytes, tokens: List[Any]):
+    """Split a line of IMAP response text into tokens"""
+    i = 0
+    length = len(text)
+
+    while i < length:
+        char = text[i:i + 1]
+
+        if char in (b' ', b'\r', b'\n'):
+            i += 1
+        elif char == b'(':
+            tokens.append(_LPAREN)
+            i += 1
+        elif char == b')':
+            tokens.append(_RPAREN)
+            i += 1
+        elif char == b'"':
+            # Quoted string with backslash escapes
+            i += 1
+            value = bytearray()
+            while i < length:
+                char = text[i:i + 1]
+                if char == b'\\' and i + 1 < length:
+                    value += text[i + 1:i + 2]
+                    i += 2
+                elif char == b'"':
+                    i += 1
+                    break
+                else:
+                    value += char
+                    i += 1
+            tokens.append(bytes(value).decode('utf-8', errors='replace'))
+        elif char == b'{' and text.rstrip().endswith(b'}') and text.rstrip()[i + 1:-1].isdigit():
+            # Literal marker - the literal itself follows as a separate item
+            break
+        else:
+            # Atom, possibly containing a bracketed section like BODY[HEADER.FIELDS (TO)]
+            start = i
+            depth = 0
+            while i < length:
+                char = text[i:i + 1]
+                if char == b'[':
+                    depth += 1
+                elif char == b']':
+                    depth -= 1
+                elif depth == 0 and char in (b' ', b'(', b')', b'\r', b'\n'):
+                    break
+                i += 1
+            atom = text[start:i].decode('utf-8', errors='replace')
+            if atom.upper() == 'NIL':
+                tokens.append(None)
+            elif atom.isdigit():
+                tokens.append(int(atom))
+            else:
+                tokens.append(atom)
+
+
+def tokenize(data: List[Union[bytes, Tuple[bytes, bytes], None]]) -> List[Any]:
+    """
+    Tokenize response data as returned by imaplib
+
+    Args:
+        data: Response data list, where literals arrive as (prefix, literal) tuples
+
+    Returns:
+        Flat list of tokens with literals kept as raw bytes
+    """
+    tokens = []
+    for item in data:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            _tokenize_text(item[0], tokens)
+            tokens.append(item[1])
+        else:
+            _tokenize_text(item, tokens)
+    return tokens
+
+
+def _build(tokens: List[Any], position: int = 0) -> Tuple[List[Any], int]:
+    """Turn a flat token list into nested Python lists"""
+    result = []
+    while position < len(tokens):
+        token = tokens[position]
+        position += 1
+        if token is _LPAREN:
+            nested, position = _build(tokens, position)
+            result.append(nested)
+        elif token is _RPAREN:
+            return result, position
+        else:
+            result.append(token)
+    return result, position
+
+
+def parse_response(data: List[Union[bytes, Tuple[bytes, bytes], None]]) -> List[Any]:
+    """
+    Parse imaplib response data into nested lists
+
+    Args:
+        data: Response data list from an imaplib command
+
+    Returns:
+        Nested list structure mirroring the parenthesized IMAP syntax
+    """
+    parsed, _ = _build(tokenize(data))
+    return parsed
+
+
+def parse_fetch_response(data: List[Union[bytes, Tuple[bytes, bytes], None]]) -> List[Dict[str, Any]]:
+    """
+    Parse a FETCH response that may cover many messages
+
+    Args:
+        data: Response data from imaplib fetch() or uid('FETCH', ...)
+
+    Returns:
+        List of per-message dictionaries keyed by upper-cased fetch item name,
+        with the message sequence number stored under 'SEQ'
+    """
+    parsed = parse_response(data)
+    messages = []
+
+    i = 0
+    while i < len(parsed) - 1:
+        seq, items = parsed[i], parsed[i + 1]
+        if not isinstance(seq, int) or not isinstance(items, list):
+            i += 1
+            continue
+
+        record = {'SEQ': seq}
+        for j in range(0, len(items) - 1, 2):
+            key = items[j]
+            if isinstance(key, str):
+                record[key.upper()] = items[j + 1]
+        messages.append(record)
+        i += 2
+
+    return messages
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """Convert a parsed string or literal into text"""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def _parse_address_list(addresses: Optional[List[Any]]) -> List[Tuple[str, str]]:
+    """Convert an ENVELOPE address list into (name, email) pairs"""
+    result = []
+    if not addresses:
+        return result
+
+    for address in addresses:
+        if not isinstance(address, list) or len(address) < 4:
+            continue
+        name, _, mailbox, host = address[:4]
+        # Group syntax markers have no host part
+        if host is None:
+            continue
+        mailbox = _as_text(mailbox) or ''
+        host = _as_text(host) or ''
+        result.append((_as_text(name) or '', f'{mailbox}@{host}' if host else mailbox))
+    return result
+
+
+def parse_envelope(envelope: List[Any]) -> Dict[str, Any]:
+    """
+    Parse an ENVELOPE structure
+
+    Args:
+        envelope: Parsed ENVELOPE list from a FETCH response
+
+    Returns:
+        Dictionary with raw (still MIME-encoded) header values and address lists
+    """
+    fields = list(envelope) + [None] * (10 - len(envelope))
+    return {
+        'date': _as_text(fields[0]),
+        'subject': _as_text(fields[1]),
+        'from': _parse_address_list(fields[2]),
+        'sender': _parse_address_list(fields[3]),
+        'reply_to': _parse_address_list(fields[4]),
+        'to': _parse_address_list(fields[5]),
+        'cc': _parse_address_list(fields[6]),
+        'bcc': _parse_address_list(fields[7]),
+        'in_reply_to': _as_text(fields[8]),
+        'message_id': _as_text(fields[9]),
+    }
+
+
+def _parse_params(params: Any) -> Dict[str, str]:
+    """Convert a body parameter list into a lower-cased dictionary"""
+    result = {}
+    if not isinstance(params, list):
+        return result
+    for i in range(0, len(params) - 1, 2):
+        key = _as_text(params[i])
+        if key:
+            result[key.lower()] = _as_text(params[i + 1]) or ''
+    return result
+
+
+def _param_filename(params: Dict[str, str], key: str) -> Optional[str]:
+    """Get a filename parameter, honouring RFC 2231 extended notation"""
+    if key in params:
+        return params[key]
+
+    extended = params.get(key + '*')
+    if extended is None:
+        # Continuations: filename*0*, filename*1*, ...
+        pieces = []
+        index = 0
+        while True:
+            piece = params.get(f'{key}*{index}*', params.get(f'{key}*{index}'))
+            if piece is None:
+                break
+            pieces.append(piece)
+            index += 1
+        if not pieces:
+            return None
+        extended = ''.join(pieces)
+
+    try:
+        charset, _, text = email.utils.decode_rfc2231(extended)
+        raw = urllib.parse.unquote_to_bytes(text)
+        try:
+            return raw.decode(charset or 'utf-8', errors='replace')
+        except LookupError:
+            return raw.decode('utf-8', errors='replace')
+    except Exception:
+        return extended
+
+
+def _parse_body_part(part: List[Any], part_id: str) -> Dict[str, Any]:
+    """Parse a single (non-multipart) BODYSTRUCTURE entry"""
+    fields = list(part) + [None] * (12 - len(part))
+    maintype = (_as_text(fields[0]) or 'application').lower()
+    subtype = (_as_text(fields[1]) or 'octet-stream').lower()
+    params = _parse_params(fields[2])
+
+    # Extension data starts after the type-specific fields
+    if maintype == 'text':
+        extension = 8
+    elif maintype == 'message' and subtype == 'rfc822':
+        extension = 10
+    else:
+        extension = 7
+
+    disposition = None
+    disposition_params = {}
+    disposition_field = fields[extension + 1] if len(fields) > extension + 1 else None
+    if isinstance(disposition_field, list) and disposition_field:
+        disposition = (_as_text(disposition_field[0]) or '').lower()
+        if len(disposition_field) > 1:
+            disposition_params = _parse_params(disposition_field[1])
+
+    filename = _param_filename(disposition_params, 'filename') or _param_filename(params, 'name')
+
+    return {
+        'part_id': part_id,
+        'content_type': f'{maintype}/{subtype}',
+        'params': params,
+        'content_id': _as_text(fields[3]),
+        'description': _as_text(fields[4]),
+        'encoding': (_as_text(fields[5]) or '7bit').lower(),
+        'size': fields[6] if isinstance(fields[6], int) else 0,
+        'disposition': disposition,
+        'disposition_params': disposition_params,
+        'filename': filename,
+    }
+
+
+def parse_bodystructure(structure: List[Any], prefix: str = '') -> List[Dict[str, Any]]:
+    """
+    Flatten a BODYSTRUCTURE into its leaf parts
+
+    Args:
+        structure: Parsed BODYSTRUCTURE list from a FETCH response
+        prefix: Section number of the enclosing multipart, if any
+
+    Returns:
+        List of leaf part dictionaries with IMAP section numbers as 'part_id'
+    """
+    if not isinstance(structure, list) or not structure:
+        return []
+
+    # Multipart bodies start with their child parts
+    if isinstance(structure[0], list):
+        parts = []
+        for index, child in enumerate(structure, start=1):
+            if not isinstance(child, list):
+                break
+            child_id = f'{prefix}.{index}' if prefix else str(index)
+            parts.extend(parse_bodystructure(child, child_id))
+        return parts
+
+    return [_parse_body_part(structure, prefix or '1')]
+
+
+def attachment_parts(parts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Select the leaf parts that represent attachments"""
+    return [part for part in parts if part['disposition'] and part['filename']]
+
+
+def parse_sequence_set(value: str) -> List[Tuple[int, int]]:
+    """
+    Parse an IMAP sequence set such as '1:4,7,9:12' into inclusive ranges
+
+    Args:
+        value: Sequence set text without '*' members
+
+    Returns:
+        List of (start, end) tuples
+    """
+    ranges = []
+    for member in value.split(','):
+        member = member.strip()
+        if not member:
+            continue
+        if ':' in member:
+            start, end = member.split(':', 1)
+            start, end = int(start), int(end)
+            ranges.append((min(start, end), max(start, end)))
+        else:
+            ranges.append((int(member), int(member)))
+    return ranges
+
+
+def format_sequence_set(numbers: List[int]) -> List[str]:
+    """
+    Compress message numbers into IMAP sequence sets such as '1:4,7,9:12'
+
+    Args:
+        numbers: UIDs or sequence numbers in any order
+
+    Returns:
+        Sequence sets in ascending order, split so none grows beyond 500 ranges
+    """
+    ranges = []
+    for number in sorted(set(int(number) for number in numbers)):
+        if ranges and ranges[-1][1] == number - 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+
+    members = [str(start) if start == end else f'{start}:{end}' for start, end in ranges]
+    # Keep command lines short enough for servers that limit their length
+    return [','.join(members[i:i + 500]) for i in range(0, len(members), 500)]
+
+
+def parse_status_response(data: List[Union[bytes, Tuple[bytes, bytes], None]]) -> Dict[str, Dict[str, int]]:
+    """
+    Parse STATUS responses into counters per mailbox
+
+    Args:
+        data: Untagged STATUS response data, one entry per mailbox
+
+    Returns:
+        Dictionary mapping mailbox name to its upper-cased status counters
+    """
+    parsed = parse_response(data)
+    result = {}
+    for i in range(0, len(parsed) - 1, 2):
+        mailbox, items = parsed[i], parsed[i + 1]
+        if not isinstance(items, list):
+            continue
+        counters = {}
+        for j in range(0, len(items) - 1, 2):
+            if isinstance(items[j], str) and isinstance(items[j + 1], int):
+                counters[items[j].upper()] = items[j + 1]
+        result[_as_text(mailbox)] = counters
+    return result
+
+
+def parse_list_response(data: List[Union[bytes, Tuple[bytes, bytes], None]]) -> List[Dict[str, Any]]:
+    """
+    Parse LIST responses into mailbox entries
+
+    Args:
+        data: Response data from imaplib list()
+
+    Returns:
+        List of dictionaries with 'name', 'delimiter' and 'attributes'
+    """
+    mailboxes = []
+    for item in data:
+        if item is None:
+            continue
+        parsed = parse_response([item])
+        if len(parsed) < 3 or not isinstance(parsed[0], list):
+            continue
+        mailboxes.append({
+            'name': _as_text(parsed[2]),
+            'delimiter': _as_text(parsed[1]),
+            'attributes': [_as_text(attribute) for attribute in parsed[0]],
+        })
+    return mailboxes
+
+
+def parse_esearch_response(data: List[Union[bytes, Tuple[bytes, bytes], None]]) -> Dict[str, Any]:
+    """
+    Parse an ESEARCH response (RFC 4731, RFC 5267, RFC 9394)
+
+    Args:
+        data: Untagged ESEARCH response data
+
+    Returns:
+        Dictionary of upper-cased return items: 'COUNT', 'MIN' and 'MAX' as ints,
+        'ALL' as a sequence set string, and 'PARTIAL' as (range, sequence set) strings
+    """
+    parsed = parse_response(data)
+    result = {}
+    i = 0
+    while i < len(parsed):
+        item = parsed[i]
+        # Skip the correlator (TAG "...") and the UID marker
+        if isinstance(item, list) or not isinstance(item, str) or item.upper() == 'UID':
+            i += 1
+            continue
+
+        name = item.upper()
+        value = parsed[i + 1] if i + 1 < len(parsed) else None
+        if name == 'PARTIAL' and isinstance(value, list):
+            members = [_as_text(member) for member in value] + [None, None]
+            result[name] = (members[0], members[1] or '')
+        elif isinstance(value, int) and name != 'ALL':
+            result[name] = value
+        else:
+            result[name] = _as_text(value) or ''
+        i += 2
+    return result
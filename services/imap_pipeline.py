@@ -0,0 +1,124 @@
+"""
+IMAP Pipeline Module
+
+Provides pipelined execution of IMAP commands on imaplib connections including:
+- Sending several tagged commands before reading any response
+- Matching completions to commands by tag
+- A bounded window of in-flight commands to keep socket buffers from filling up
+- Collecting untagged responses produced by the whole batch
+"""
+
+import logging
+import imaplib
+from collections import deque
+from typing import Dict, List, Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_DEPTH = 50  # Maximum number of commands in flight on one connection
+
+
+class CommandResult(NamedTuple):
+    """Completion of one pipelined command"""
+    key: Any
+    status: str
+    message: str
+
+
+class ImapPipeline:
+    """
+    Runs IMAP commands without waiting for each response before sending the next
+
+    Untagged responses of concurrently running commands are merged by imaplib,
+    so callers demultiplex collected data by the mailbox name or UID it carries.
+
+    Handles:
+    - Sending commands while fewer than depth are in flight
+    - Recording per-command completion status, including NO and BAD
+    - Aborting on connection failures, which leave the session unusable
+    """
+
+    def __init__(self, imap: imaplib.IMAP4, depth: int = PIPELINE_DEPTH, collect: tuple = ()):
+        """
+        Initialize a pipeline on a connection
+
+        Args:
+            imap: Authenticated IMAP connection not running any other command
+            depth: Maximum number of commands in flight
+            collect: Untagged response types to gather for the caller, e.g. ('STATUS',)
+        """
+        self.imap = imap
+        self.depth = max(1, depth)
+        self.collect = collect
+
+        self._in_flight = deque()
+        self._results: List[CommandResult] = []
+        self._responses: Dict[str, List[Any]] = {}
+
+        # Leftovers from earlier commands would be mistaken for our responses
+        for typ in collect:
+            imap.untagged_responses.pop(typ, None)
+
+    def send(self, name: str, *args: str, key: Any = None):
+        """
+        Send a command, first completing the oldest one if the window is full
+
+        Args:
+            name: Command name, e.g. 'STATUS' or 'UID'
+            *args: Command arguments as imaplib expects them
+            key: Value identifying the command in the results, defaults to its tag
+        """
+        while len(self._in_flight) >= self.depth:
+            self._complete_oldest()
+
+        tag = self.imap._command(name, *args)
+        self._in_flight.append((name, tag, tag.decode('ascii') if key is None else key))
+
+    def finish(self) -> List[CommandResult]:
+        """
+        Wait for every command to complete
+
+        Returns:
+            Results in the order the commands were sent
+
+        Raises:
+            imaplib.IMAP4.abort: If the connection failed; the session must be discarded
+        """
+        while self._in_flight:
+            self._complete_oldest()
+
+        for typ in self.collect:
+            data = self.imap.untagged_responses.pop(typ, None)
+            if data:
+                self._responses.setdefault(typ, []).extend(data)
+
+        results, self._results = self._results, []
+        return results
+
+    def responses(self, typ: str) -> List[Any]:
+        """
+        Get collected untagged responses of a type after finish()
+
+        Args:
+            typ: Response type listed in collect
+
+        Returns:
+            Raw response data in the format of imaplib's response()
+        """
+        return self._responses.pop(typ, [])
+
+    def _complete_oldest(self):
+        """Read responses until the oldest command in flight completes"""
+        name, tag, key = self._in_flight.popleft()
+        try:
+            status, data = self.imap._command_complete(name, tag)
+            message = data[-1].decode('utf-8', errors='replace') if data and isinstance(data[-1], bytes) else ''
+        except self.imap.abort:
+            raise
+        except self.imap.error as e:
+            # imaplib raises on BAD, but one rejected command must not fail the batch
+            status, message = 'BAD', str(e)
+
+        if status != 'OK':
+            logger.debug(f"Pipelined {name} command {key} returned {status}: {message}")
+        self._results.append(CommandResult(key, status, message))
@@ -0,0 +1,410 @@
+"""
+Mail Store Module
+
+Provides a persistent local copy of per-folder message metadata including:
+- Incremental synchronization using UIDNEXT, HIGHESTMODSEQ and VANISHED
+- Batched backfill of older messages after the first sync
+- Indexed local queries for mailbox list views and search predicates
+"""
+
+import calendar
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple, Optional, Any
+
+from sqlalchemy import and_, not_, or_, func, literal
+
+from database import db
+from database.identity.models import MailFolderState, MailMessage
+
+logger = logging.getLogger(__name__)
+
+
+class MailStore:
+    """
+    Local SQL store of message summaries synced from IMAP
+
+    Handles:
+    - Applying folder change sets fetched by EmailClient
+    - Reconciling expunges on servers without QRESYNC
+    - Serving list pages from the local index
+    """
+
+    def __init__(self, batch_size: int = 500, flag_refresh_interval: int = 300):
+        """
+        Initialize the mail store
+
+        Args:
+            batch_size: Maximum number of summaries fetched per sync and direction
+            flag_refresh_interval: Seconds between flag refreshes on servers without CONDSTORE
+        """
+        self.batch_size = batch_size
+        self.flag_refresh_interval = flag_refresh_interval
+
+    def sync_folder(self, client, settings_id: int, folder: str) -> MailFolderState:
+        """
+        Bring the local copy of a folder up to date
+
+        Args:
+            client: Connected EmailClient for the account
+            settings_id: EmailSettings id of the account
+            folder: Folder name
+
+        Returns:
+            Updated folder state
+        """
+        state = MailFolderState.query.filter_by(settings_id=settings_id, folder=folder).first()
+        now = datetime.utcnow()
+
+        refresh_flags = not state or not state.flags_synced_at or \
+            state.flags_synced_at < now - timedelta(seconds=self.flag_refresh_interval)
+
+        # A cheap STATUS tells us whether anything changed at all
+        if state and state.backfill_complete:
+            status = client.folder_status(folder)
+            unchanged = (status['uidvalidity'] == state.uidvalidity and
+                         status['uidnext'] == state.uidnext and
+                         status['exists'] == state.message_count)
+            if status['highestmodseq']:
+                unchanged = unchanged and status['highestmodseq'] == state.highestmodseq
+            else:
+                unchanged = unchanged and not refresh_flags
+
+            if unchanged:
+                state.synced_at = now
+                db.session.commit()
+                return state
+
+        known = None
+        if state:
+            known = {
+                'uidvalidity': state.uidvalidity,
+                'uidnext': state.uidnext,
+                'highestmodseq': state.highestmodseq,
+                'lowest_uid': None if state.backfill_complete else state.lowest_uid
+            }
+
+        changes = client.fetch_folder_changes(folder, known, self.batch_size, refresh_flags)
+        server_state = changes['state']
+
+        if state is None:
+            state = MailFolderState(settings_id=settings_id, folder=folder)
+            db.session.add(state)
+
+        if changes['reset']:
+            MailMessage.query.filter_by(settings_id=settings_id, folder=folder).delete()
+            state.lowest_uid = None
+            state.backfill_complete = False
+
+        self._apply_vanished(settings_id, folder, changes['vanished'])
+        self._apply_flags(settings_id, folder, changes['flags'])
+        self._upsert(settings_id, folder, changes['added'] + changes['backfill'])
+
+        synced_uids = [summary['uid'] for summary in changes['added'] + changes['backfill']]
+        if synced_uids:
+            lowest = min(synced_uids)
+            state.lowest_uid = lowest if state.lowest_uid is None else min(lowest, state.lowest_uid)
+
+        state.uidvalidity = server_state['uidvalidity']
+        state.uidnext = server_state['uidnext']
+        state.highestmodseq = server_state['highestmodseq'] or None
+        state.message_count = server_state['exists']
+        state.synced_at = now
+        if changes['flags'] or refresh_flags:
+            state.flags_synced_at = now
+        db.session.flush()
+
+        local_count = MailMessage.query.filter_by(settings_id=settings_id, folder=folder).count()
+        if local_count >= server_state['exists'] or changes['backfill_complete']:
+            state.backfill_complete = True
+
+        # Without VANISHED, expunges only show up as a count mismatch
+        if changes['vanished'] is None and state.backfill_complete and local_count != server_state['exists']:
+            self._reconcile(client, settings_id, folder)
+
+        db.session.commit()
+        return state
+
+    def has_folder(self, settings_id: int, folder: str) -> bool:
+        """
+        Check whether a folder was synced before, so the next sync is incremental
+
+        Args:
+            settings_id: EmailSettings id of the account
+            folder: Folder name
+
+        Returns:
+            True if the store holds a state for the folder
+        """
+        return MailFolderState.query.filter_by(settings_id=settings_id, folder=folder).first() is not None
+
+    def list_messages(self, settings_id: int, folder: str, limit: int,
+                      offset: int) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+        """
+        Get a page of message summaries from the local store, newest first
+
+        Args:
+            settings_id: EmailSettings id of the account
+            folder: Folder name
+            limit: Page size
+            offset: Page offset
+
+        Returns:
+            Tuple of (email_list, total_count), or None if the page is not synced yet
+        """
+        state = MailFolderState.query.filter_by(settings_id=settings_id, folder=folder).first()
+        if not state:
+            return None
+
+        query = MailMessage.query.filter_by(settings_id=settings_id, folder=folder)
+        if not state.backfill_complete and offset + limit > query.count():
+            return None
+
+        rows = query.order_by(MailMessage.uid.desc()).offset(offset).limit(limit).all()
+        return [self._to_summary(row, state.uidvalidity) for row in rows], state.message_count
+
+    def get_messages(self, settings_id: int, folder: str,
+                     uids: List[int]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get stored summaries of specific messages, e.g. search results
+
+        Args:
+            settings_id: EmailSettings id of the account
+            folder: Folder name
+            uids: UIDs of the messages
+
+        Returns:
+            Summaries in the order of the given UIDs, or None if any of them is not stored
+        """
+        state = MailFolderState.query.filter_by(settings_id=settings_id, folder=folder).first()
+        if not state:
+            return None
+
+        rows = MailMessage.query.filter(
+            MailMessage.settings_id == settings_id,
+            MailMessage.folder == folder,
+            MailMessage.uid.in_([int(uid) for uid in uids])
+        ).all() if uids else []
+        by_uid = {row.uid: row for row in rows}
+        if len(by_uid) != len(set(uids)):
+            return None
+        return [self._to_summary(by_uid[int(uid)], state.uidvalidity) for uid in uids]
+
+    def search_uids(self, settings_id: int, folder: str, terms: List[Any]) -> Optional[List[int]]:
+        """
+        Evaluate metadata terms of a parsed query against the local store
+
+        Args:
+            settings_id: EmailSettings id of the account
+            folder: Folder name
+            terms: Terms whose field is one of search_query.METADATA_FIELDS
+
+        Returns:
+            Matching UIDs, newest first, or None if the folder is not completely synced
+        """
+        state = MailFolderState.query.filter_by(settings_id=settings_id, folder=folder).first()
+        if not state or not state.backfill_complete:
+            return None
+
+        query = db.session.query(MailMessage.uid).filter(
+            MailMessage.settings_id == settings_id,
+            MailMessage.folder == folder
+        )
+        for term in terms:
+            condition = self._term_condition(term)
+            query = query.filter(not_(condition) if term.negated else condition)
+        return [uid for (uid,) in query.order_by(MailMessage.uid.desc())]
+
+    def forget_messages(self, settings_id: int, folder: str, uids: List[Any]):
+        """
+        Remove messages from the local store after they were moved or deleted
+
+        Args:
+            settings_id: EmailSettings id of the account
+            folder: Folder the messages were removed from
+            uids: UIDs of the removed messages
+        """
+        uids = [int(uid) for uid in uids]
+        if not uids:
+            return
+
+        removed = MailMessage.query.filter(
+            MailMessage.settings_id == settings_id,
+            MailMessage.folder == folder,
+            MailMessage.uid.in_(uids)
+        ).delete(synchronize_session=False)
+
+        state = MailFolderState.query.filter_by(settings_id=settings_id, folder=folder).first()
+        if state:
+            state.message_count = max(0, state.message_count - removed)
+        db.session.commit()
+
+    def update_flags(self, settings_id: int, folder: str, uids: List[Any], flags: List[str], add: bool):
+        """
+        Apply a flag change the client just made, ahead of the next sync
+
+        Args:
+            settings_id: EmailSettings id of the account
+            folder: Folder name
+            uids: UIDs of the changed messages
+            flags: Flags that were added or removed
+            add: True if the flags were added, False if removed
+        """
+        uids = [int(uid) for uid in uids]
+        if not uids:
+            return
+
+        rows = MailMessage.query.filter(
+            MailMessage.settings_id == settings_id,
+            MailMessage.folder == folder,
+            MailMessage.uid.in_(uids)
+        )
+        for row in rows:
+            current = row.flags.split() if row.flags else []
+            if add:
+                current.extend(flag for flag in flags if flag not in current)
+            else:
+                current = [flag for flag in current if flag not in flags]
+            row.flags = ' '.join(current)
+        db.session.commit()
+
+    def _term_condition(self, term: Any):
+        """Build the SQL condition for one metadata term"""
+        def contains(column, value):
+            escaped = value.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+            return func.coalesce(column, '').ilike(f'%{escaped}%', escape='!')
+
+        def has_flag(flag):
+            # Flags are stored space separated, so pad to match whole flags only
+            escaped = flag.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+            padded = literal(' ') + func.coalesce(MailMessage.flags, '') + literal(' ')
+            return padded.ilike(f'% {escaped} %', escape='!')
+
+        field, value = term.field, term.value
+        if field == 'from':
+            return or_(contains(MailMessage.from_name, value), contains(MailMessage.from_email, value))
+        if field == 'to':
+            return contains(MailMessage.to_addresses, value)
+        if field == 'subject':
+            return contains(MailMessage.subject, value)
+        if field in ('before', 'since', 'on'):
+            # Whole days in UTC, like the date-only IMAP keys
+            day = calendar.timegm(value.timetuple())
+            if field == 'before':
+                return MailMessage.timestamp < day
+            if field == 'since':
+                return MailMessage.timestamp >= day
+            return and_(MailMessage.timestamp >= day, MailMessage.timestamp < day + 86400)
+        if field == 'larger':
+            return MailMessage.size > value
+        if field == 'smaller':
+            return MailMessage.size < value
+        if field == 'attachment':
+            return MailMessage._attachments.isnot(None)
+        if field == 'state':
+            flag, present = {
+                'SEEN': ('\\Seen', True), 'UNSEEN': ('\\Seen', False),
+                'FLAGGED': ('\\Flagged', True), 'UNFLAGGED': ('\\Flagged', False),
+                'ANSWERED': ('\\Answered', True), 'DRAFT': ('\\Draft', True),
+            }[value]
+            return has_flag(flag) if present else not_(has_flag(flag))
+        if field == 'keyword':
+            return has_flag(value)
+        raise ValueError(f"Search field not stored locally: {field}")
+
+    def _upsert(self, settings_id: int, folder: str, summaries: List[Dict[str, Any]]):
+        """Insert or update message summaries"""
+        if not summaries:
+            return
+
+        existing = {row.uid: row for row in MailMessage.query.filter(
+            MailMessage.settings_id == settings_id,
+            MailMessage.folder == folder,
+            MailMessage.uid.in_([summary['uid'] for summary in summaries])
+        )}
+
+        for summary in summaries:
+            row = existing.get(summary['uid'])
+            if row is None:
+                row = MailMessage(settings_id=settings_id, folder=folder, uid=summary['uid'])
+                db.session.add(row)
+            row.modseq = summary['modseq']
+            row.subject = summary['subject']
+            row.from_name = summary['from']['name'][:255]
+            row.from_email = summary['from']['email'][:255]
+            row.to_addresses = summary['to']
+            row.timestamp = summary['timestamp']
+            row.size = summary['size']
+            row.flags = ' '.join(summary['flags'])
+            row.attachments = summary['attachments']
+
+    def _apply_flags(self, settings_id: int, folder: str, changes: Dict[int, Dict[str, Any]]):
+        """Apply per-UID flag updates to stored messages"""
+        if not changes:
+            return
+
+        rows = MailMessage.query.filter(
+            MailMessage.settings_id == settings_id,
+            MailMessage.folder == folder,
+            MailMessage.uid.in_(list(changes))
+        )
+        for row in rows:
+            change = changes[row.uid]
+            row.flags = ' '.join(change['flags'])
+            if change['modseq']:
+                row.modseq = change['modseq']
+
+    def _apply_vanished(self, settings_id: int, folder: str, ranges: Optional[List[Tuple[int, int]]]):
+        """Delete messages reported as expunged"""
+        for start, end in ranges or []:
+            MailMessage.query.filter(
+                MailMessage.settings_id == settings_id,
+                MailMessage.folder == folder,
+                MailMessage.uid.between(start, end)
+            ).delete(synchronize_session=False)
+
+    def _reconcile(self, client, settings_id: int, folder: str):
+        """Drop local messages that no longer exist on the server"""
+        server_uids = set(client.get_folder_uids(folder))
+        local_uids = [uid for (uid,) in db.session.query(MailMessage.uid).filter_by(
+            settings_id=settings_id, folder=folder)]
+        stale = [uid for uid in local_uids if uid not in server_uids]
+
+        for i in range(0, len(stale), 500):
+            MailMessage.query.filter(
+                MailMessage.settings_id == settings_id,
+                MailMessage.folder == folder,
+                MailMessage.uid.in_(stale[i:i + 500])
+            ).delete(synchronize_session=False)
+
+        if stale:
+            logger.info(f"Removed {len(stale)} expunged messages from local store of {folder}")
+
+    def _to_summary(self, row: MailMessage, uidvalidity: int) -> Dict[str, Any]:
+        """Convert a stored message into the list-view email dictionary"""
+        flags = row.flags.split() if row.flags else []
+        attachments = row.attachments
+        date = datetime.utcfromtimestamp(row.timestamp)
+
+        return {
+            'id': str(row.uid),
+            'subject': row.subject or '(No Subject)',
+            'from': {
+                'name': row.from_name or '',
+                'email': row.from_email or ''
+            },
+            'to': row.to_addresses or '',
+            'date': date.isoformat() + '+00:00',
+            'timestamp': row.timestamp,
+            'size': row.size or 0,
+            'read': '\\Seen' in flags,
+            'flagged': '\\Flagged' in flags,
+            'has_attachments': len(attachments) > 0,
+            'attachments': attachments,
+            'body': {
+                'plain': '',
+                'html': ''
+            },
+            'folder': row.folder,
+            'uidvalidity': uidvalidity
+        }
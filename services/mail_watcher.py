@@ -0,0 +1,312 @@
+"""
+Mail Watcher Module
+
+Provides push-style mailbox notifications including:
+- One IMAP IDLE session per account with active subscribers
+- In-memory unread counts for the INBOX of watched accounts
+- New-mail and unread-count events fanned out to subscriber queues
+- Periodic STATUS polling for servers without IDLE
+"""
+
+import logging
+import queue
+import select
+import ssl
+import threading
+import time
+from typing import Dict, List, Optional, Any, Callable
+
+from services.email_client import EmailClient
+
+logger = logging.getLogger(__name__)
+
+
+def _wait_readable(imap, timeout: float) -> bool:
+    """Wait until the server sent data, including data already buffered by imaplib"""
+    sock = imap.sock
+    previous = sock.gettimeout()
+    sock.settimeout(0)
+    try:
+        if imap.file.peek(1):
+            return True
+    except (BlockingIOError, ssl.SSLWantReadError):
+        pass
+    finally:
+        sock.settimeout(previous)
+
+    readable, _, _ = select.select([sock], [], [], timeout)
+    return bool(readable)
+
+
+class _AccountWatch(threading.Thread):
+    """Background thread holding the IDLE session of one account"""
+
+    def __init__(self, watcher: 'MailWatcher', account_id: Any,
+                 client_factory: Callable[[], EmailClient], folder: str):
+        super().__init__(name=f"mail-watch-{account_id}", daemon=True)
+        self.watcher = watcher
+        self.account_id = account_id
+        self.client_factory = client_factory
+        self.folder = folder
+        self.subscribers: List[queue.Queue] = []
+        self.unsubscribed_at: Optional[float] = None
+        self.status: Optional[Dict[str, int]] = None
+        self.stopping = threading.Event()
+
+    def run(self):
+        retry_delay = self.watcher.retry_delay
+        while not self._should_stop():
+            client = None
+            try:
+                client = self.client_factory()
+                imap = client.connect_imap()
+                self._refresh(client)
+                retry_delay = self.watcher.retry_delay
+
+                if client.strategy('watch') == 'idle':
+                    status, _ = imap.select(f'"{self.folder}"', readonly=True)
+                    if status != 'OK':
+                        raise Exception(f"Failed to select folder: {self.folder}")
+                    while not self._should_stop():
+                        if self._idle(imap):
+                            self._refresh(client)
+                else:
+                    while not self._should_stop():
+                        self.stopping.wait(self.watcher.poll_interval)
+                        self._refresh(client)
+            except Exception as e:
+                logger.warning(f"Mail watcher for account {self.account_id} lost its connection: {str(e)}")
+                self.stopping.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, self.watcher.max_retry_delay)
+            finally:
+                if client:
+                    client.disconnect()
+
+        self.watcher._forget(self)
+
+    def _should_stop(self) -> bool:
+        """Stop when asked to, or once nobody listened for the linger period"""
+        if self.stopping.is_set():
+            return True
+        with self.watcher._lock:
+            if self.subscribers or self.unsubscribed_at is None:
+                return False
+            if time.monotonic() - self.unsubscribed_at <= self.watcher.linger:
+                return False
+            # Mark as stopping while holding the lock so new subscribers start a fresh watch
+            self.stopping.set()
+            return True
+
+    def _idle(self, imap) -> bool:
+        """
+        Run one IDLE cycle
+
+        Returns:
+            True if the server reported mailbox changes
+        """
+        tag = imap._new_tag()
+        imap.send(tag + b' IDLE\r\n')
+        response = imap.readline()
+        if not response.startswith(b'+'):
+            imap.tagged_commands.pop(tag, None)
+            raise Exception(f"IDLE rejected: {response.strip().decode(errors='replace')}")
+
+        # Servers may drop IDLE sessions after 30 minutes, so restart before that
+        deadline = time.monotonic() + self.watcher.idle_interval
+        changed = False
+        try:
+            while not changed and time.monotonic() < deadline:
+                # Wake up regularly to notice when the last subscriber is gone
+                if not _wait_readable(imap, min(self.watcher.check_interval, deadline - time.monotonic())):
+                    if self._should_stop():
+                        break
+                    continue
+
+                changed = self._read_untagged(imap)
+                # Let a burst of updates settle before asking for the new counts
+                while changed and _wait_readable(imap, 0.5):
+                    self._read_untagged(imap)
+        finally:
+            imap.send(b'DONE\r\n')
+            while True:
+                line = imap.readline()
+                if not line:
+                    raise imap.abort('connection closed while ending IDLE')
+                if line.startswith(tag):
+                    break
+            imap.tagged_commands.pop(tag, None)
+
+        return changed
+
+    def _read_untagged(self, imap) -> bool:
+        """Read one untagged response line, returning True if it signals a mailbox change"""
+        line = imap.readline()
+        if not line:
+            raise imap.abort('connection closed during IDLE')
+
+        # Skip literals, e.g. in FETCH responses carrying more than flags
+        stripped = line.rstrip()
+        if stripped.endswith(b'}') and b'{' in stripped:
+            size = stripped[stripped.rfind(b'{') + 1:-1]
+            if size.isdigit():
+                imap.read(int(size))
+                imap.readline()
+
+        words = stripped.split()
+        return len(words) >= 3 and words[2].upper() in (b'EXISTS', b'EXPUNGE', b'FETCH', b'VANISHED') or \
+            len(words) >= 2 and words[1].upper() == b'VANISHED'
+
+    def _refresh(self, client: EmailClient):
+        """Fetch current counters and notify subscribers about changes"""
+        status = client.folder_status(self.folder)
+        previous = self.status
+        self.status = status
+
+        if previous and status['uidnext'] > previous['uidnext']:
+            self.watcher._publish(self, {
+                'type': 'new-mail',
+                'folder': self.folder,
+                'count': status['uidnext'] - previous['uidnext'],
+                'unread_count': status['unseen']
+            })
+        if not previous or status['unseen'] != previous['unseen']:
+            self.watcher._publish(self, {
+                'type': 'unread',
+                'folder': self.folder,
+                'unread_count': status['unseen']
+            })
+
+
+class MailWatcher:
+    """
+    Registry of per-account IDLE watchers
+
+    Handles:
+    - Starting a watcher on the first subscription of an account
+    - Keeping the latest unread count of watched accounts in memory
+    - Stopping watchers that had no subscribers for a while
+    """
+
+    def __init__(self, folder: str = 'INBOX', idle_interval: float = 29 * 60,
+                 poll_interval: float = 60, check_interval: float = 15,
+                 linger: float = 120, retry_delay: float = 5,
+                 max_retry_delay: float = 300, queue_size: int = 100):
+        """
+        Initialize the watcher registry
+
+        Args:
+            folder: Folder to watch
+            idle_interval: Seconds before an IDLE command is restarted
+            poll_interval: Seconds between STATUS polls on servers without IDLE
+            check_interval: Seconds between checks for remaining subscribers while idling
+            linger: Seconds a watcher keeps running after its last subscriber left
+            retry_delay: Initial delay before reconnecting after an error
+            max_retry_delay: Upper bound for the reconnect backoff
+            queue_size: Maximum number of undelivered events per subscriber
+        """
+        self.folder = folder
+        self.idle_interval = idle_interval
+        self.poll_interval = poll_interval
+        self.check_interval = check_interval
+        self.linger = linger
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.queue_size = queue_size
+
+        self._lock = threading.Lock()
+        self._watches: Dict[Any, _AccountWatch] = {}
+
+    def subscribe(self, account_id: Any, client_factory: Callable[[], EmailClient]) -> queue.Queue:
+        """
+        Subscribe to mailbox events of an account, starting its watcher if needed
+
+        Args:
+            account_id: Key of the account, e.g. the EmailSettings id
+            client_factory: Creates an EmailClient for the account; it must not use a pool
+
+        Returns:
+            Queue receiving event dictionaries with a 'type' key
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            watch = self._watches.get(account_id)
+            if watch is None or watch.stopping.is_set():
+                watch = _AccountWatch(self, account_id, client_factory, self.folder)
+                self._watches[account_id] = watch
+                watch.start()
+            watch.subscribers.append(subscriber)
+            watch.unsubscribed_at = None
+            status = watch.status
+
+        if status:
+            subscriber.put_nowait({'type': 'unread', 'folder': self.folder, 'unread_count': status['unseen']})
+        return subscriber
+
+    def unsubscribe(self, account_id: Any, subscriber: queue.Queue):
+        """
+        Remove a subscriber queue
+
+        Args:
+            account_id: Key the queue was subscribed with
+            subscriber: Queue returned by subscribe()
+        """
+        with self._lock:
+            watch = self._watches.get(account_id)
+            if watch and subscriber in watch.subscribers:
+                watch.subscribers.remove(subscriber)
+                if not watch.subscribers:
+                    watch.unsubscribed_at = time.monotonic()
+
+    def unread_count(self, account_id: Any) -> Optional[int]:
+        """
+        Get the last known unread count of a watched account
+
+        Args:
+            account_id: Key of the account
+
+        Returns:
+            Unread count, or None if the account is not being watched
+        """
+        with self._lock:
+            watch = self._watches.get(account_id)
+            if watch is None or watch.status is None:
+                return None
+            return watch.status['unseen']
+
+    def notify(self, account_id: Any, event: Dict[str, Any]):
+        """
+        Deliver an event from elsewhere to the subscribers of an account
+
+        Args:
+            account_id: Key of the account
+            event: Event dictionary with a 'type' key
+        """
+        with self._lock:
+            watch = self._watches.get(account_id)
+        if watch is not None:
+            self._publish(watch, event)
+
+    def stop_all(self):
+        """Stop every watcher, e.g. on worker shutdown"""
+        with self._lock:
+            watches = list(self._watches.values())
+        for watch in watches:
+            watch.stopping.set()
+
+    def _publish(self, watch: _AccountWatch, event: Dict[str, Any]):
+        """Deliver an event to every subscriber of a watch"""
+        with self._lock:
+            subscribers = list(watch.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A stalled stream should not block the watcher
+                pass
+
+    def _forget(self, watch: _AccountWatch):
+        """Drop a finished watch from the registry"""
+        with self._lock:
+            watch.stopping.set()
+            if self._watches.get(watch.account_id) is watch:
+                del self._watches[watch.account_id]
@@ -0,0 +1,163 @@
+"""
+Message Cache Module
+
+Provides a process-wide cache of parsed messages including:
+- Entries keyed by account, folder, UIDVALIDITY and UID, so they never go stale by renumbering
+- Least-recently-used eviction bounded by the total size of cached data
+- Hit, miss and eviction counters for monitoring
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Optional, Any, Hashable
+
+ENTRY_OVERHEAD = 512  # Bytes charged per entry for keys and bookkeeping
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory held by cached data
+
+    Only strings and bytes are counted at their length; containers add a
+    small fixed cost per item. This is cheap and close enough for budgeting.
+
+    Args:
+        value: Cached value made of dicts, lists, tuples, strings, bytes and scalars
+
+    Returns:
+        Estimated size in bytes
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(16 + estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(8 + estimate_size(item) for item in value)
+    return 8
+
+
+class MessageCache:
+    """
+    Thread-safe LRU cache of parsed messages
+
+    Handles:
+    - Storing and updating per-message entries such as view data and MIME structure
+    - Evicting least recently used entries once the byte budget is exceeded
+    - Dropping entries of messages that were moved or deleted
+    """
+
+    def __init__(self, name: str = 'messages', max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize an empty cache
+
+        Args:
+            name: Cache name used in statistics
+            max_bytes: Upper bound for the estimated size of all entries
+        """
+        self.name = name
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[Dict[str, Any], int]]' = OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Look up an entry and mark it as recently used
+
+        Args:
+            key: Message key, e.g. (account, folder, uidvalidity, uid)
+
+        Returns:
+            Copy of the cached entry, or None on a miss
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            # A shallow copy lets callers add fields without touching the budgeted entry
+            return dict(cached[0])
+
+    def put(self, key: Hashable, entry: Dict[str, Any]):
+        """
+        Store or replace an entry, evicting older entries to stay within budget
+
+        Entries larger than the whole budget are not cached.
+
+        Args:
+            key: Message key
+            entry: Dictionary of cached data; must not be modified afterwards
+        """
+        size = ENTRY_OVERHEAD + estimate_size(entry)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats['evictions'] += 1
+
+    def update(self, key: Hashable, **fields: Any):
+        """
+        Merge fields into an entry, creating it if the key is not cached
+
+        Does not count as a lookup, so hit and miss counters only reflect reads.
+
+        Args:
+            key: Message key
+            **fields: Fields to set
+        """
+        with self._lock:
+            cached = self._entries.get(key)
+        self.put(key, dict(cached[0] if cached is not None else {}, **fields))
+
+    def discard(self, keys: List[Hashable]):
+        """
+        Remove entries, e.g. of messages that were moved or deleted
+
+        Args:
+            keys: Message keys; keys that are not cached are ignored
+        """
+        with self._lock:
+            for key in keys:
+                cached = self._entries.pop(key, None)
+                if cached is not None:
+                    self._bytes -= cached[1]
+
+    def discard_account(self, account: Hashable):
+        """
+        Remove every entry of an account, e.g. once its credentials were refused
+
+        Args:
+            account: First element of the account's message keys
+        """
+        with self._lock:
+            for key in [key for key in self._entries if isinstance(key, tuple) and key and key[0] == account]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters for monitoring"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats,
+                        name=self.name,
+                        entries=len(self._entries),
+                        bytes=self._bytes,
+                        max_bytes=self.max_bytes,
+                        hit_rate=round(self._stats['hits'] / lookups, 3) if lookups else None)
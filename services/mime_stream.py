@@ -0,0 +1,252 @@
+"""
+MIME Stream Module
+
+Provides incremental handling of MIME body parts including:
+- Chunk-by-chunk decoding of base64 and quoted-printable transfer encodings
+- Detection of the line layout of base64 bodies
+- Mapping decoded byte offsets to encoded offsets for ranged downloads
+- Chunk-by-chunk base64 encoding and serialization of outgoing multipart messages
+"""
+
+import base64
+import quopri
+import re
+import uuid
+from email.message import Message
+from email.policy import compat32
+from typing import BinaryIO, Iterable, List, Optional, Tuple, NamedTuple, Union
+
+_WIRE_POLICY = compat32.clone(linesep='\r\n')  # SMTP and IMAP both expect CRLF
+
+_WHITESPACE = re.compile(rb'[\s]+')
+
+
+class IdentityDecoder:
+    """Pass-through decoder for 7bit, 8bit and binary parts"""
+
+    def feed(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b''
+
+
+class Base64Decoder:
+    """Incremental base64 decoder that keeps incomplete quads between chunks"""
+
+    def __init__(self):
+        self._pending = b''
+
+    def feed(self, data: bytes) -> bytes:
+        data = self._pending + _WHITESPACE.sub(b'', data)
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return base64.b64decode(data[:usable]) if usable else b''
+
+    def flush(self) -> bytes:
+        pending, self._pending = self._pending, b''
+        if not pending:
+            return b''
+        # Tolerate missing padding at the very end
+        return base64.b64decode(pending + b'=' * (-len(pending) % 4))
+
+
+class QuotedPrintableDecoder:
+    """Incremental quoted-printable decoder working on complete lines"""
+
+    def __init__(self):
+        self._pending = b''
+
+    def feed(self, data: bytes) -> bytes:
+        data = self._pending + data
+        # Soft line breaks and =XX escapes never span a line ending
+        end = data.rfind(b'\n') + 1
+        self._pending = data[end:]
+        return quopri.decodestring(data[:end]) if end else b''
+
+    def flush(self) -> bytes:
+        pending, self._pending = self._pending, b''
+        return quopri.decodestring(pending) if pending else b''
+
+
+def create_decoder(encoding: Optional[str]):
+    """
+    Create an incremental decoder for a Content-Transfer-Encoding
+
+    Args:
+        encoding: Transfer encoding as reported by BODYSTRUCTURE
+
+    Returns:
+        Decoder object with feed() and flush() methods
+    """
+    encoding = (encoding or '7bit').lower()
+    if encoding == 'base64':
+        return Base64Decoder()
+    if encoding == 'quoted-printable':
+        return QuotedPrintableDecoder()
+    return IdentityDecoder()
+
+
+class Base64Layout(NamedTuple):
+    """Line layout of a base64 body with uniform line lengths"""
+    line_length: int
+    eol_length: int
+    decoded_size: int
+
+    def encoded_offset(self, decoded_offset: int) -> Tuple[int, int]:
+        """
+        Find where to start reading to decode from a byte offset
+
+        Args:
+            decoded_offset: Offset into the decoded content
+
+        Returns:
+            Tuple of (encoded offset, decoded bytes to skip after decoding from there)
+        """
+        quad = decoded_offset // 3
+        chars = quad * 4
+        lines, column = divmod(chars, self.line_length)
+        return lines * (self.line_length + self.eol_length) + column, decoded_offset - quad * 3
+
+
+def detect_base64_layout(head: bytes, tail: bytes, encoded_size: int) -> Optional[Base64Layout]:
+    """
+    Work out the exact decoded size of a base64 body from its first and last bytes
+
+    Only bodies where every line but the last has the same length are handled,
+    which is how mail software writes base64.
+
+    Args:
+        head: First bytes of the encoded body, spanning at least two line endings
+        tail: Last bytes of the encoded body
+        encoded_size: Total encoded size in octets
+
+    Returns:
+        Base64Layout, or None if the layout is irregular or cannot be determined
+    """
+    first_eol = head.find(b'\n')
+    if first_eol <= 0:
+        # A single line body: the head is the whole body
+        if len(head) != encoded_size:
+            return None
+        chars = head.strip()
+        if len(chars) % 4:
+            return None
+        return Base64Layout(max(len(chars), 1), 0, len(chars) // 4 * 3 - chars[-2:].count(b'='))
+
+    eol_length = 2 if head[first_eol - 1:first_eol] == b'\r' else 1
+    line_length = first_eol + 1 - eol_length
+    if line_length <= 0:
+        return None
+
+    # All complete lines in the head must have the same length, except the body's last line
+    if len(head) >= encoded_size:
+        head = head.rstrip(b'\r\n')
+    lines = head.split(b'\r\n' if eol_length == 2 else b'\n')
+    if any(len(line) != line_length for line in lines[1:-1]):
+        return None
+
+    # The last line may be shorter and may or may not end with a line break
+    body_end = tail.rstrip(b'\r\n')
+    trailing = len(tail) - len(body_end)
+    if trailing not in (0, eol_length):
+        return None
+    newline = body_end.rfind(b'\n')
+    if newline < 0 and len(body_end) < encoded_size - trailing:
+        # The tail is too short to contain the start of the last line
+        return None
+    last_line = body_end[newline + 1:]
+    if not last_line or len(last_line) > line_length:
+        return None
+
+    full_size = encoded_size - trailing - len(last_line)
+    full_lines, remainder = divmod(full_size, line_length + eol_length)
+    if remainder:
+        return None
+
+    chars = full_lines * line_length + len(last_line)
+    if chars % 4:
+        return None
+    return Base64Layout(line_length, eol_length, chars // 4 * 3 - last_line[-2:].count(b'='))
+
+
+class Base64Encoder:
+    """Incremental base64 encoder writing 76-character CRLF lines"""
+
+    LINE_INPUT = 57  # Input bytes per encoded line
+
+    def __init__(self):
+        self._pending = b''
+
+    def feed(self, data: bytes) -> bytes:
+        data = self._pending + data
+        usable = len(data) - len(data) % self.LINE_INPUT
+        self._pending = data[usable:]
+        return b''.join(base64.b64encode(data[i:i + self.LINE_INPUT]) + b'\r\n'
+                        for i in range(0, usable, self.LINE_INPUT))
+
+    def flush(self) -> bytes:
+        pending, self._pending = self._pending, b''
+        return base64.b64encode(pending) + b'\r\n' if pending else b''
+
+
+def message_bytes(message: Message) -> bytes:
+    """
+    Serialize a complete, in-memory MIME entity with CRLF line endings
+
+    Args:
+        message: Message or part; use it only for small entities such as text bodies
+
+    Returns:
+        Serialized entity
+    """
+    return message.as_bytes(policy=_WIRE_POLICY)
+
+
+def write_multipart(fp: BinaryIO, headers: Message,
+                    parts: List[Union[Message, Tuple[Message, Iterable[bytes]]]]) -> int:
+    """
+    Write a multipart/mixed message without holding streamed parts in memory
+
+    Args:
+        fp: Binary file to write to
+        headers: Top-level headers; Content-Type and MIME-Version are added here
+        parts: Complete parts written as they are, or (headers, content chunks)
+            pairs whose raw content is base64-encoded while it is written
+
+    Returns:
+        Number of bytes written
+    """
+    # Base64 lines never contain '=_', so the boundary cannot clash with streamed content
+    boundary = f'=_{uuid.uuid4().hex}'
+    del headers['MIME-Version']
+    del headers['Content-Type']
+    headers['MIME-Version'] = '1.0'
+    headers.add_header('Content-Type', 'multipart/mixed', boundary=boundary)
+    headers.set_payload('')
+
+    written = fp.write(message_bytes(headers))
+    delimiter = f'--{boundary}\r\n'.encode('ascii')
+    for part in parts:
+        written += fp.write(delimiter)
+        if isinstance(part, Message):
+            data = message_bytes(part)
+            written += fp.write(data)
+            if not data.endswith(b'\r\n'):
+                # The line break before a delimiter belongs to the delimiter
+                written += fp.write(b'\r\n')
+            continue
+
+        part_headers, chunks = part
+        del part_headers['Content-Transfer-Encoding']
+        part_headers['Content-Transfer-Encoding'] = 'base64'
+        part_headers.set_payload('')
+        written += fp.write(message_bytes(part_headers))
+
+        encoder = Base64Encoder()
+        for chunk in chunks:
+            written += fp.write(encoder.feed(chunk))
+        written += fp.write(encoder.flush())
+
+    written += fp.write(f'--{boundary}--\r\n'.encode('ascii'))
+    return written
@@ -0,0 +1,386 @@
+"""
+Outbox Module
+
+Provides durable background delivery of outgoing mail including:
+- Spooling written messages to disk with a status row per message
+- Queuing drafts the worker writes itself, e.g. to fetch forwarded attachments outside the request
+- A delivery worker that claims due messages atomically, so several processes can run it
+- Retries with exponential backoff for temporary SMTP failures
+- Saving a copy to the Sent folder after delivery
+- Per-message delivery status for the UI
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Callable, BinaryIO
+
+from database import db
+from database.identity.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Check whether an SMTP failure would repeat on every retry"""
+    if isinstance(error, FileNotFoundError):
+        # The spool file is gone, so there is nothing left to send
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class Outbox:
+    """
+    Persistent queue of outgoing messages with a delivery worker thread
+
+    Handles:
+    - Queuing messages so requests return before any SMTP traffic
+    - Delivering due messages and rescheduling failed attempts
+    - Requeuing messages whose worker died in the middle of a delivery
+    - Reporting delivery status per message
+    """
+
+    def __init__(self, spool_dir: str, poll_interval: float = 15, max_attempts: int = 8,
+                 retry_delay: float = 30, max_retry_delay: float = 3600,
+                 claim_timeout: float = 900, batch_size: int = 20):
+        """
+        Initialize the outbox
+
+        Args:
+            spool_dir: Directory holding the queued message files
+            poll_interval: Seconds between checks for due messages
+            max_attempts: Delivery attempts before a message is marked failed
+            retry_delay: Delay before the first retry, doubled after every further failure
+            max_retry_delay: Upper bound for the retry delay
+            claim_timeout: Seconds after which a message still being sent is assumed abandoned
+            batch_size: Maximum number of messages delivered per check
+        """
+        self.spool_dir = spool_dir
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.claim_timeout = claim_timeout
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._client_factory: Optional[Callable[[int], Any]] = None
+        self._notify: Optional[Callable[[int, Dict[str, Any]], None]] = None
+        self._write_draft: Optional[Callable[[Any, int, Dict[str, Any], BinaryIO], List[str]]] = None
+
+    def start(self, app, client_factory: Callable[[int], Any],
+              notify: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+              write_draft: Optional[Callable[[Any, int, Dict[str, Any], BinaryIO], List[str]]] = None):
+        """
+        Start the delivery worker unless it is already running
+
+        Args:
+            app: Flask application whose database holds the outbox
+            client_factory: Creates an EmailClient for an EmailSettings id, or returns None
+            notify: Optional callback receiving (settings_id, event) on status changes
+            write_draft: Writes a draft queued with enqueue_draft(); receives
+                (client, settings_id, draft, file) and returns the envelope recipients
+        """
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._client_factory = client_factory
+            self._notify = notify
+            self._write_draft = write_draft
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, args=(app,), name='outbox-worker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the delivery worker after its current message, e.g. on worker shutdown"""
+        self._stopping.set()
+        self._wakeup.set()
+
+    def enqueue(self, settings_id: int, write_message: Callable[[BinaryIO], List[str]],
+                subject: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a message for delivery
+
+        The message is written straight into its spool file, so attachments
+        are never held in memory as a whole.
+
+        Args:
+            settings_id: EmailSettings id of the sending account
+            write_message: Writes the message to a binary file and returns the envelope
+                recipients, e.g. a partial of EmailClient.write_message()
+            subject: Subject shown in the delivery status
+
+        Returns:
+            Delivery status of the queued message
+
+        Raises:
+            Exception: If the message cannot be spooled
+        """
+        # Write the spool file completely before the row makes it visible to workers
+        spool_file = f"{uuid.uuid4().hex}.eml"
+        recipients = self._write_spool_file(spool_file, write_message)
+
+        row = OutboxMessage(settings_id=settings_id, subject=subject, spool_file=spool_file)
+        row.recipients = recipients
+        try:
+            db.session.add(row)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._remove_spool_file(spool_file)
+            raise
+
+        logger.info(f"Queued message {row.id} for {len(recipients)} recipients")
+        self._wakeup.set()
+        return self._to_status(row)
+
+    def enqueue_draft(self, settings_id: int, draft: Dict[str, Any], recipients: List[str],
+                      subject: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a message the worker writes right before its first delivery attempt
+
+        For messages whose content isn't at hand yet, such as forwarded
+        attachments that would have to be downloaded from the mail server
+        within the request.
+
+        Args:
+            settings_id: EmailSettings id of the sending account
+            draft: JSON-serializable parameters for the write_draft callback given to start()
+            recipients: Recipients shown in the delivery status until the message is written
+            subject: Subject shown in the delivery status
+
+        Returns:
+            Delivery status of the queued message
+        """
+        row = OutboxMessage(settings_id=settings_id, subject=subject, spool_file=f"{uuid.uuid4().hex}.eml")
+        row.recipients = recipients
+        row.draft = draft
+        try:
+            db.session.add(row)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        logger.info(f"Queued draft {row.id} for {len(recipients)} recipients")
+        self._wakeup.set()
+        return self._to_status(row)
+
+    def get_status(self, settings_id: int, message_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get the delivery status of a message
+
+        Args:
+            settings_id: EmailSettings id of the account, so users only see their own mail
+            message_id: Outbox message id
+
+        Returns:
+            Delivery status, or None if the account has no such message
+        """
+        row = OutboxMessage.query.filter_by(id=message_id, settings_id=settings_id).first()
+        return self._to_status(row) if row else None
+
+    def list_status(self, settings_id: int, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get the delivery status of an account's most recent messages
+
+        Args:
+            settings_id: EmailSettings id of the account
+            limit: Maximum number of messages
+
+        Returns:
+            Delivery statuses, newest first
+        """
+        rows = OutboxMessage.query.filter_by(settings_id=settings_id) \
+            .order_by(OutboxMessage.created_at.desc()).limit(limit)
+        return [self._to_status(row) for row in rows]
+
+    def deliver_due(self) -> int:
+        """
+        Deliver every message that is due, within the batch size
+
+        Returns:
+            Number of messages this worker attempted
+        """
+        self._requeue_abandoned()
+
+        due = [row_id for (row_id,) in db.session.query(OutboxMessage.id).filter(
+            OutboxMessage.status == 'queued',
+            OutboxMessage.next_attempt_at <= datetime.utcnow()
+        ).order_by(OutboxMessage.next_attempt_at).limit(self.batch_size)]
+
+        attempted = 0
+        for row_id in due:
+            if self._stopping.is_set():
+                break
+            # Another worker may have claimed the message since the query
+            if not self._claim(row_id):
+                continue
+            attempted += 1
+            self._deliver(OutboxMessage.query.get(row_id))
+        return attempted
+
+    def _run(self, app):
+        """Worker loop: sleep until woken or the poll interval passed, then deliver due messages"""
+        # The first pass waits too, so the app can finish creating its tables
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            with app.app_context():
+                try:
+                    self.deliver_due()
+                except Exception as e:
+                    logger.error(f"Outbox delivery pass failed: {str(e)}")
+                    db.session.rollback()
+
+    def _claim(self, row_id: int) -> bool:
+        """Mark a queued message as being sent, returning False if another worker was first"""
+        claimed = OutboxMessage.query.filter_by(id=row_id, status='queued').update({
+            'status': 'sending',
+            'claimed_at': datetime.utcnow(),
+            'attempts': OutboxMessage.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _requeue_abandoned(self):
+        """Return messages to the queue whose worker stopped while sending them"""
+        requeued = OutboxMessage.query.filter(
+            OutboxMessage.status == 'sending',
+            OutboxMessage.claimed_at < datetime.utcnow() - timedelta(seconds=self.claim_timeout)
+        ).update({'status': 'queued', 'next_attempt_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        if requeued:
+            logger.warning(f"Requeued {requeued} outbox messages abandoned while sending")
+
+    def _deliver(self, row: OutboxMessage):
+        """Run one delivery attempt of a claimed message"""
+        client = None
+        message = None
+        try:
+            client = self._client_factory(row.settings_id)
+            if client is None:
+                raise Exception("Email settings no longer exist")
+
+            if row.draft is not None:
+                self._write_draft_spool_file(client, row)
+            message = open(os.path.join(self.spool_dir, row.spool_file), 'rb')
+
+            refused = client.deliver_message(message, row.recipients)
+        except Exception as e:
+            if message is not None:
+                message.close()
+            if client is not None:
+                client.disconnect()
+            self._failed(row, e)
+            return
+
+        # Record the send before anything else can fail, so it is never repeated
+        row.status = 'sent'
+        row.sent_at = datetime.utcnow()
+        row.last_error = f"Refused recipients: {', '.join(refused)}" if refused else None
+        db.session.commit()
+        logger.info(f"Delivered outbox message {row.id}")
+
+        try:
+            message.seek(0)
+            row.saved_to_sent = client.save_to_sent(message)
+            db.session.commit()
+        finally:
+            message.close()
+            client.disconnect()
+
+        self._remove_spool_file(row.spool_file)
+        self._publish(row)
+
+    def _write_draft_spool_file(self, client: Any, row: OutboxMessage):
+        """Write the spool file of a queued draft and keep its actual envelope recipients"""
+        if self._write_draft is None:
+            raise Exception("Outbox worker can't write drafts")
+
+        # An earlier attempt may have written the file but failed to clear the draft
+        if not os.path.exists(os.path.join(self.spool_dir, row.spool_file)):
+            draft = row.draft
+            row.recipients = self._write_spool_file(
+                row.spool_file, lambda f: self._write_draft(client, row.settings_id, draft, f))
+        row.draft = None
+        db.session.commit()
+
+    def _write_spool_file(self, spool_file: str, write_message: Callable[[BinaryIO], List[str]]) -> List[str]:
+        """Write and sync a message under a temporary name, then move it into place"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, spool_file)
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                recipients = write_message(f)
+                if not recipients:
+                    raise Exception("Message has no recipients")
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            self._remove_spool_file(spool_file + '.tmp')
+            raise
+        os.replace(path + '.tmp', path)
+        return recipients
+
+    def _failed(self, row: OutboxMessage, error: Exception):
+        """Reschedule a message after a failed attempt, or give up on it"""
+        row.last_error = str(error)
+        if _is_permanent(error) or row.attempts >= self.max_attempts:
+            row.status = 'failed'
+            logger.error(f"Giving up on outbox message {row.id} after {row.attempts} attempts: {str(error)}")
+        else:
+            delay = min(self.max_retry_delay, self.retry_delay * 2 ** (row.attempts - 1))
+            row.status = 'queued'
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning(f"Outbox message {row.id} failed, retrying in {delay:.0f}s: {str(error)}")
+        db.session.commit()
+
+        # Nothing reads the spool file of a failed message again; drafts may not have written one
+        if row.status == 'failed' and os.path.exists(os.path.join(self.spool_dir, row.spool_file)):
+            self._remove_spool_file(row.spool_file)
+
+        self._publish(row)
+
+    def _publish(self, row: OutboxMessage):
+        """Tell the account's open pages about a status change"""
+        if self._notify is None:
+            return
+        try:
+            self._notify(row.settings_id, dict(self._to_status(row), type='outbox'))
+        except Exception as e:
+            logger.debug(f"Failed to publish outbox status: {str(e)}")
+
+    def _remove_spool_file(self, spool_file: str):
+        """Delete a spool file that is no longer needed"""
+        try:
+            os.remove(os.path.join(self.spool_dir, spool_file))
+        except OSError as e:
+            logger.warning(f"Failed to remove outbox spool file {spool_file}: {str(e)}")
+
+    def _to_status(self, row: OutboxMessage) -> Dict[str, Any]:
+        """Convert a stored row into the status dictionary shown to the user"""
+        return {
+            'id': row.id,
+            'status': row.status,
+            'subject': row.subject,
+            'recipients': row.recipients,
+            'attempts': row.attempts,
+            'next_attempt_at': row.next_attempt_at.isoformat() if row.status == 'queued' and row.next_attempt_at else None,
+            'last_error': row.last_error,
+            'saved_to_sent': bool(row.saved_to_sent),
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'sent_at': row.sent_at.isoformat() if row.sent_at else None
+        }
@@ -0,0 +1,273 @@
+"""
+Search Index Module
+
+Provides a local full-text index of mail per account including:
+- One SQLite FTS5 database per account
+- Incremental indexing of new UIDs and batched backfill of older mail
+- BM25-ranked matching over subject, addresses and plain-text bodies
+- Invalidation on UIDVALIDITY changes, moves and deletes
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, List, Tuple, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    folder TEXT PRIMARY KEY,
+    uidvalidity INTEGER NOT NULL,
+    highest_uid INTEGER,
+    lowest_uid INTEGER,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    timestamp INTEGER,
+    UNIQUE (folder, uid)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS message_text USING fts5(
+    subject, sender, recipients, body,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# BM25 column weights: subject, sender, recipients, body
+_RANKING = 'bm25(message_text, 10.0, 5.0, 3.0, 1.0)'
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def match_expression(terms: List[Any]) -> Optional[str]:
+    """
+    Turn text terms of a parsed query into an FTS5 query matching all words as prefixes
+
+    Args:
+        terms: Terms with field 'text' or 'body'
+
+    Returns:
+        FTS5 MATCH expression, or None if the terms have no searchable words
+    """
+    phrases = []
+    for term in terms:
+        column = 'body : ' if term.field == 'body' else ''
+        phrases.extend(f'{column}"{word}"*' for word in _TERM.findall(term.value))
+    return ' AND '.join(phrases) if phrases else None
+
+
+class SearchIndex:
+    """
+    Per-account SQLite FTS5 index of message text
+
+    Handles:
+    - Fetching searchable text for new and not yet indexed messages
+    - Ranked matching of query text within a folder
+    - Dropping entries for messages that left a folder
+    """
+
+    def __init__(self, directory: str, batch_size: int = 200, backfill_batches: int = 5,
+                 body_limit: int = 65536, refresh_interval: float = 30):
+        """
+        Initialize the search index
+
+        Args:
+            directory: Directory holding one database file per account
+            batch_size: Number of messages fetched per FETCH command
+            backfill_batches: Batches of older messages indexed per update
+            body_limit: Maximum number of body bytes indexed per message
+            refresh_interval: Minimum seconds between updates of a completely indexed folder
+        """
+        self.directory = directory
+        self.batch_size = batch_size
+        self.backfill_batches = backfill_batches
+        self.body_limit = body_limit
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._updating = set()
+        self._refreshed_at: Dict[Tuple[Any, str], float] = {}
+
+    def update_folder(self, client, account_id: Any, folder: str) -> bool:
+        """
+        Index new messages of a folder and continue the backfill of older ones
+
+        Args:
+            client: Connected EmailClient for the account
+            account_id: Key of the account, e.g. the EmailSettings id
+            folder: Folder name
+
+        Returns:
+            True if the folder is now completely indexed
+        """
+        # Concurrent updates of the same folder would fetch the same messages twice
+        key = (account_id, folder)
+        with self._lock:
+            if key in self._updating:
+                return False
+            refreshed_at = self._refreshed_at.get(key)
+            if refreshed_at is not None and time.monotonic() - refreshed_at < self.refresh_interval:
+                return True
+            self._updating.add(key)
+
+        try:
+            with closing(self._connect(account_id)) as db:
+                complete = self._update_folder(client, db, folder)
+            with self._lock:
+                # Keep backfilling on every update until the folder is complete
+                if complete:
+                    self._refreshed_at[key] = time.monotonic()
+                else:
+                    self._refreshed_at.pop(key, None)
+            return complete
+        finally:
+            with self._lock:
+                self._updating.discard(key)
+
+    def match_uids(self, account_id: Any, folder: str, terms: List[Any]) -> Optional[List[int]]:
+        """
+        Find the messages of a folder matching text terms, best matches first
+
+        Args:
+            account_id: Key of the account
+            folder: Folder name
+            terms: Terms of a parsed query with field 'text' or 'body'
+
+        Returns:
+            UIDs of all matches, or None if the folder is not completely indexed yet
+            or the terms contain no indexed words
+        """
+        expression = match_expression(terms)
+        if expression is None:
+            return None
+
+        with closing(self._connect(account_id)) as db:
+            state = db.execute('SELECT complete FROM folders WHERE folder = ?', (folder,)).fetchone()
+            if not state or not state[0]:
+                return None
+
+            rows = db.execute(
+                'SELECT messages.uid FROM message_text JOIN messages ON messages.id = message_text.rowid '
+                f'WHERE message_text MATCH ? AND messages.folder = ? ORDER BY {_RANKING}, messages.timestamp DESC',
+                (expression, folder)
+            ).fetchall()
+
+        return [uid for (uid,) in rows]
+
+    def forget_messages(self, account_id: Any, folder: str, uids: List[Any]):
+        """
+        Remove messages from the index after they were moved or deleted
+
+        Args:
+            account_id: Key of the account
+            folder: Folder the messages were removed from
+            uids: UIDs of the removed messages
+        """
+        uids = [int(uid) for uid in uids]
+        if not uids:
+            return
+        with closing(self._connect(account_id)) as db:
+            self._delete(db, folder, uids)
+            db.commit()
+
+    def _update_folder(self, client, db: sqlite3.Connection, folder: str) -> bool:
+        """Run one incremental update of a folder"""
+        status = client.folder_status(folder)
+        state = db.execute('SELECT uidvalidity, highest_uid, lowest_uid, complete FROM folders WHERE folder = ?',
+                           (folder,)).fetchone()
+
+        if state and state[0] != status['uidvalidity']:
+            # UIDs were reassigned, so nothing indexed for this folder is valid anymore
+            self._delete(db, folder)
+            state = None
+        if state is None:
+            db.execute('INSERT OR REPLACE INTO folders (folder, uidvalidity, complete) VALUES (?, ?, 0)',
+                       (folder, status['uidvalidity']))
+            state = (status['uidvalidity'], None, None, 0)
+        _, highest_uid, lowest_uid, complete = state
+
+        # New mail first, so recent messages become searchable quickly. A folder that
+        # was empty when its backfill completed has no highest UID yet
+        if highest_uid is not None or complete:
+            last = highest_uid or 0
+            if status['uidnext'] > last + 1:
+                new_uids = [uid for uid in client.get_folder_uids(folder, f'{last + 1}:*') if uid > last]
+                self._index(client, db, folder, sorted(new_uids, reverse=True))
+
+        # Then older mail, newest first, a few batches per update
+        if not complete:
+            if lowest_uid is None:
+                older = client.get_folder_uids(folder)
+            elif lowest_uid > 1:
+                older = client.get_folder_uids(folder, f'1:{lowest_uid - 1}')
+                older = [uid for uid in older if uid < lowest_uid]
+            else:
+                older = []
+            older = sorted(older, reverse=True)
+            batch = older[:self.batch_size * self.backfill_batches]
+            self._index(client, db, folder, batch)
+            complete = len(batch) == len(older)
+            if complete:
+                logger.info(f"Search index of folder {folder} is complete")
+            db.execute('UPDATE folders SET complete = ? WHERE folder = ?', (int(complete), folder))
+
+        # Without VANISHED, expunges only show up as a count mismatch
+        if complete:
+            indexed = db.execute('SELECT count(*) FROM messages WHERE folder = ?', (folder,)).fetchone()[0]
+            if indexed > status['exists']:
+                server_uids = set(client.get_folder_uids(folder))
+                stale = [uid for (uid,) in db.execute('SELECT uid FROM messages WHERE folder = ?', (folder,))
+                         if uid not in server_uids]
+                self._delete(db, folder, stale)
+
+        db.commit()
+        return bool(complete)
+
+    def _index(self, client, db: sqlite3.Connection, folder: str, uids: List[int]):
+        """Fetch and store searchable text for messages, in batches"""
+        for i in range(0, len(uids), self.batch_size):
+            batch = uids[i:i + self.batch_size]
+            documents = client.fetch_search_documents(folder, batch, self.body_limit)
+
+            for document in documents:
+                self._delete(db, folder, [document['uid']])
+                cursor = db.execute('INSERT INTO messages (folder, uid, timestamp) VALUES (?, ?, ?)',
+                                    (folder, document['uid'], document['timestamp']))
+                db.execute('INSERT INTO message_text (rowid, subject, sender, recipients, body) VALUES (?, ?, ?, ?, ?)',
+                           (cursor.lastrowid, document['subject'], document['from'], document['to'], document['body']))
+
+            # Record progress per batch so an interrupted update resumes where it stopped
+            db.execute('UPDATE folders SET highest_uid = max(coalesce(highest_uid, 0), ?), '
+                       'lowest_uid = min(coalesce(lowest_uid, ?), ?) WHERE folder = ?',
+                       (max(batch), min(batch), min(batch), folder))
+            db.commit()
+
+    def _delete(self, db: sqlite3.Connection, folder: str, uids: Optional[List[int]] = None):
+        """Delete index entries of a folder, or of some of its messages"""
+        if uids is None:
+            db.execute('DELETE FROM message_text WHERE rowid IN (SELECT id FROM messages WHERE folder = ?)', (folder,))
+            db.execute('DELETE FROM messages WHERE folder = ?', (folder,))
+            db.execute('DELETE FROM folders WHERE folder = ?', (folder,))
+            return
+
+        for i in range(0, len(uids), 500):
+            chunk = uids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            ids = f'SELECT id FROM messages WHERE folder = ? AND uid IN ({placeholders})'
+            db.execute(f'DELETE FROM message_text WHERE rowid IN ({ids})', (folder, *chunk))
+            db.execute(f'DELETE FROM messages WHERE folder = ? AND uid IN ({placeholders})', (folder, *chunk))
+
+    def _connect(self, account_id: Any) -> sqlite3.Connection:
+        """Open the index database of an account, creating it if needed"""
+        os.makedirs(self.directory, exist_ok=True)
+        db = sqlite3.connect(os.path.join(self.directory, f'{account_id}.sqlite'), timeout=30)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.executescript(_SCHEMA)
+        return db
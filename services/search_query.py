@@ -0,0 +1,282 @@
+"""
+Search Query Module
+
+Provides the structured mail search language including:
+- Parsing queries such as 'from:alice before:2025-01-01 has:attachment larger:5M'
+- Compiling parsed terms into precise IMAP SEARCH keys
+- Planning searches across the local mail store, the full-text index and the server
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple, Optional, Any, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r'(-?)(?:(\w+):)?(?:"([^"]*)"?|(\S+))', re.UNICODE)
+
+_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+_SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3}
+
+_AGE_UNITS = {'d': 1, 'w': 7, 'm': 30, 'y': 365}
+
+# Field names accepted in queries and the term field they map to
+FIELD_ALIASES = {
+    'from': 'from', 'to': 'to', 'cc': 'cc', 'bcc': 'bcc',
+    'subject': 'subject', 'body': 'body',
+    'before': 'before', 'older': 'before',
+    'after': 'since', 'since': 'since', 'newer': 'since',
+    'on': 'on',
+    'older_than': 'older_than', 'newer_than': 'newer_than',
+    'larger': 'larger', 'smaller': 'smaller',
+    'has': 'has', 'is': 'is',
+    'keyword': 'keyword', 'label': 'keyword', 'tag': 'keyword',
+}
+
+# is: values and the IMAP search key each one compiles to
+STATE_KEYS = {
+    'unread': 'UNSEEN', 'read': 'SEEN', 'seen': 'SEEN', 'unseen': 'UNSEEN',
+    'flagged': 'FLAGGED', 'starred': 'FLAGGED', 'unflagged': 'UNFLAGGED',
+    'answered': 'ANSWERED', 'replied': 'ANSWERED', 'draft': 'DRAFT',
+}
+
+# Term fields the local mail store can evaluate from stored metadata
+METADATA_FIELDS = {'from', 'to', 'subject', 'before', 'since', 'on', 'larger', 'smaller', 'attachment', 'state', 'keyword'}
+
+# Term fields the full-text index can evaluate
+TEXT_FIELDS = {'text', 'body'}
+
+
+class Term(NamedTuple):
+    """
+    One predicate of a parsed search query
+
+    The value type depends on the field: str for address and text fields,
+    datetime for dates, int for sizes, an IMAP flag for 'state' and
+    True for 'attachment'.
+    """
+    field: str
+    value: Any
+    negated: bool = False
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    """Parse YYYY-MM-DD, YYYY/MM/DD or DD-Mon-YYYY dates"""
+    for pattern in ('%Y-%m-%d', '%Y/%m/%d', '%d-%b-%Y'):
+        try:
+            return datetime.strptime(value, pattern)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_size(value: str) -> Optional[int]:
+    """Parse sizes such as 500, 100K or 5M into bytes"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([KMG]?B?)', value.upper())
+    if not match:
+        return None
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def _parse_age(value: str, now: datetime) -> Optional[datetime]:
+    """Parse relative ages such as 7d, 2w, 6m or 1y into the date they reach back to"""
+    match = re.fullmatch(r'(\d+)([dwmy])', value.lower())
+    if not match:
+        return None
+    days = int(match.group(1)) * _AGE_UNITS[match.group(2)]
+    return (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _to_term(field: str, value: str, negated: bool, now: datetime) -> Optional[Term]:
+    """Build the term for a field:value pair, or None if the value is not valid for the field"""
+    field = FIELD_ALIASES[field]
+
+    if field in ('before', 'since', 'on'):
+        date = _parse_date(value)
+        return Term(field, date, negated) if date else None
+    if field in ('older_than', 'newer_than'):
+        date = _parse_age(value, now)
+        if date is None:
+            return None
+        return Term('before' if field == 'older_than' else 'since', date, negated)
+    if field in ('larger', 'smaller'):
+        size = _parse_size(value)
+        return Term(field, size, negated) if size is not None else None
+    if field == 'has':
+        return Term('attachment', True, negated) if value.lower() in ('attachment', 'attachments') else None
+    if field == 'is':
+        key = STATE_KEYS.get(value.lower())
+        return Term('state', key, negated) if key else None
+    if field == 'keyword':
+        # Keywords are IMAP atoms, so anything else could never match
+        return Term(field, value, negated) if re.fullmatch(r'[^\s(){%*"\\\]]+', value) else None
+    return Term(field, value, negated) if value else None
+
+
+def parse_query(query: str, now: Optional[datetime] = None) -> List[Term]:
+    """
+    Parse a search query into terms that must all match
+
+    Words without a field prefix search subject, addresses and body.
+    A leading '-' negates a term and double quotes keep phrases together.
+    Unknown fields and invalid values are searched as plain text, so no
+    query is ever rejected.
+
+    Args:
+        query: Query typed by the user
+        now: Reference time for relative ages, defaults to the current time
+
+    Returns:
+        List of terms
+    """
+    now = now or datetime.utcnow()
+    terms = []
+    for match in _TOKEN.finditer(query or ''):
+        negated = match.group(1) == '-'
+        field = (match.group(2) or '').lower()
+        value = match.group(3) if match.group(3) is not None else match.group(4)
+
+        term = None
+        if field in FIELD_ALIASES:
+            term = _to_term(field, value, negated, now)
+        if term is None:
+            text = f'{match.group(2)}:{value}' if match.group(2) else value
+            if not text or text == '-':
+                continue
+            term = Term('text', text, negated)
+        terms.append(term)
+    return terms
+
+
+def _quote(value: str) -> str:
+    """Quote a string for an IMAP command"""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _imap_date(date: datetime) -> str:
+    """Format a date the way IMAP SEARCH expects, independent of the locale"""
+    return f'{date.day}-{_MONTHS[date.month - 1]}-{date.year}'
+
+
+def _compile_term(term: Term) -> str:
+    """Compile one term into a single IMAP search key"""
+    field, value = term.field, term.value
+    if field == 'text':
+        quoted = _quote(value)
+        key = f'OR OR OR SUBJECT {quoted} FROM {quoted} TO {quoted} BODY {quoted}'
+    elif field in ('from', 'to', 'cc', 'bcc', 'subject', 'body'):
+        key = f'{field.upper()} {_quote(value)}'
+    elif field in ('before', 'since', 'on'):
+        key = f'{field.upper()} {_imap_date(value)}'
+    elif field == 'larger':
+        key = f'LARGER {value}'
+    elif field == 'smaller':
+        key = f'SMALLER {value}'
+    elif field == 'attachment':
+        # The server cannot see dispositions, so mixed multiparts stand in for attachments
+        key = 'HEADER Content-Type "multipart/mixed"'
+    elif field == 'state':
+        key = value
+    elif field == 'keyword':
+        key = f'KEYWORD {value}'
+    else:
+        raise ValueError(f"Unknown search field: {field}")
+
+    if term.negated:
+        return f'NOT ({key})' if ' ' in key else f'NOT {key}'
+    return key
+
+
+def compile_imap(terms: List[Term]) -> str:
+    """
+    Compile terms into IMAP SEARCH criteria matching messages that satisfy all of them
+
+    Args:
+        terms: Parsed terms
+
+    Returns:
+        Search criteria, 'ALL' if there are no terms
+    """
+    if not terms:
+        return 'ALL'
+    return ' '.join(_compile_term(term) for term in terms)
+
+
+class SearchPlanner:
+    """
+    Answers structured searches from local data where possible
+
+    Handles:
+    - Evaluating metadata predicates in the local mail store
+    - Evaluating text predicates in the full-text index, ranked by relevance
+    - Sending only the remaining predicates to the server, limited to local candidates
+    - Falling back to a plain server search when nothing is available locally
+    """
+
+    def __init__(self, mail_store, search_index):
+        """
+        Initialize the planner
+
+        Args:
+            mail_store: MailStore holding message metadata
+            search_index: SearchIndex holding message text
+        """
+        self.mail_store = mail_store
+        self.search_index = search_index
+
+    def search(self, client, account_id: Any, folder: str, query: str, limit: int,
+               offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Run a search and return one page of results
+
+        Text searches are ordered by relevance, all others newest first.
+
+        Args:
+            client: Connected EmailClient for the account
+            account_id: EmailSettings id of the account
+            folder: Folder name
+            query: Query typed by the user
+            limit: Page size
+            offset: Page offset
+
+        Returns:
+            Tuple of (email_list, total_count)
+        """
+        terms = parse_query(query)
+        metadata = [term for term in terms if term.field in METADATA_FIELDS]
+        text = [term for term in terms if term.field in TEXT_FIELDS and not term.negated]
+        residual = [term for term in terms if term not in metadata and term not in text]
+
+        candidates = None
+        if text:
+            # Relevance order from the index decides the final order
+            candidates = self.search_index.match_uids(account_id, folder, text)
+            if candidates is None:
+                residual.extend(text)
+        if metadata:
+            known = self.mail_store.search_uids(account_id, folder, metadata)
+            if known is None:
+                residual.extend(metadata)
+            elif candidates is None:
+                candidates = known
+            else:
+                known = set(known)
+                candidates = [uid for uid in candidates if uid in known]
+
+        if candidates is None:
+            logger.debug(f"Search in {folder} runs on the server: {compile_imap(terms)}")
+            return client.get_emails(folder=folder, limit=limit, offset=offset, search_criteria=query)
+
+        if residual and candidates:
+            logger.debug(f"Search in {folder} checks {len(candidates)} local candidates on the server: "
+                         f"{compile_imap(residual)}")
+            matched = client.search_uids(folder, compile_imap(residual), candidates)
+            candidates = [uid for uid in candidates if uid in matched]
+
+        page = candidates[offset:offset + limit]
+        emails = self.mail_store.get_messages(account_id, folder, page)
+        if emails is None:
+            emails = client.get_email_summaries(folder, page)
+        return emails, len(candidates)
@@ -0,0 +1,160 @@
+"""
+Server Strategies Module
+
+Provides memory of how mail servers can be reached including:
+- A description of one connection strategy: transport mode, port and TLS options
+- A process-wide cache of the strategy that last worked per server
+- Per-account persistence of working strategies alongside the email settings
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Tuple, Optional, NamedTuple
+
+from database import db
+from database.identity.models import MailServerStrategy
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionStrategy(NamedTuple):
+    """One way of connecting to a mail server"""
+    mode: str  # 'ssl', 'starttls' or 'plain'
+    port: int
+    verify_cert: bool
+
+    def describe(self) -> str:
+        """Human-readable form for logs, e.g. 'SSL on port 993 without verification'"""
+        if self.mode == 'plain':
+            return f"plain connection on port {self.port}"
+        verification = 'with' if self.verify_cert else 'without'
+        return f"{self.mode.upper()} on port {self.port} {verification} verification"
+
+
+class StrategyCache:
+    """
+    Process-wide record of the strategy that last connected to each server
+
+    Handles:
+    - Looking up the strategy to try first for a server
+    - Replacing it when a different strategy succeeded
+    - Forgetting it when it stopped working
+    """
+
+    def __init__(self):
+        """Initialize an empty cache"""
+        self._lock = threading.Lock()
+        self._strategies: Dict[Tuple[str, str, int], ConnectionStrategy] = {}
+
+    def get(self, protocol: str, server: str, port: int) -> Optional[ConnectionStrategy]:
+        """
+        Get the remembered strategy of a server
+
+        Args:
+            protocol: 'imap' or 'smtp'
+            server: Server address
+            port: Port configured for the server
+
+        Returns:
+            ConnectionStrategy, or None if none is remembered
+        """
+        with self._lock:
+            return self._strategies.get((protocol, server, port))
+
+    def put(self, protocol: str, server: str, port: int, strategy: ConnectionStrategy):
+        """
+        Remember the strategy that connected to a server
+
+        Args:
+            protocol: 'imap' or 'smtp'
+            server: Server address
+            port: Port configured for the server
+            strategy: Strategy that succeeded
+        """
+        with self._lock:
+            self._strategies[(protocol, server, port)] = strategy
+
+    def forget(self, protocol: str, server: str, port: int):
+        """
+        Drop the remembered strategy of a server after it failed
+
+        Args:
+            protocol: 'imap' or 'smtp'
+            server: Server address
+            port: Port configured for the server
+        """
+        with self._lock:
+            self._strategies.pop((protocol, server, port), None)
+
+
+class AccountServerStrategies:
+    """
+    Stored connection strategies of one account
+
+    Handles:
+    - Loading the strategies that worked before, so a restart doesn't repeat the fallback walk
+    - Storing a strategy when a different one succeeded
+    - Dropping stored strategies when the server settings change
+    """
+
+    def __init__(self, settings_id: int):
+        """
+        Initialize the store of an account
+
+        Args:
+            settings_id: EmailSettings id of the account
+        """
+        self.settings_id = settings_id
+
+    def load(self, protocol: str) -> Optional[ConnectionStrategy]:
+        """
+        Get the stored strategy for a protocol
+
+        Args:
+            protocol: 'imap' or 'smtp'
+
+        Returns:
+            ConnectionStrategy, or None if none is stored or the database is unavailable
+        """
+        try:
+            row = MailServerStrategy.query.filter_by(settings_id=self.settings_id, protocol=protocol).first()
+        except Exception as e:
+            # Connections are also opened outside of an application context
+            logger.debug(f"Stored {protocol} strategy of settings {self.settings_id} unavailable: {str(e)}")
+            return None
+        return ConnectionStrategy(row.mode, row.port, bool(row.verify_cert)) if row else None
+
+    def save(self, protocol: str, strategy: ConnectionStrategy):
+        """
+        Store the strategy that succeeded for a protocol
+
+        Args:
+            protocol: 'imap' or 'smtp'
+            strategy: Strategy that succeeded
+        """
+        try:
+            row = MailServerStrategy.query.filter_by(settings_id=self.settings_id, protocol=protocol).first()
+            if row is None:
+                row = MailServerStrategy(settings_id=self.settings_id, protocol=protocol)
+                db.session.add(row)
+            row.mode = strategy.mode
+            row.port = strategy.port
+            row.verify_cert = strategy.verify_cert
+            row.succeeded_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to store {protocol} strategy of settings {self.settings_id}: {str(e)}")
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+
+    def forget(self):
+        """Drop every stored strategy, e.g. after the account's servers changed"""
+        MailServerStrategy.query.filter_by(settings_id=self.settings_id).delete(synchronize_session=False)
+        db.session.commit()
+
+
+# Shared by every EmailConnection in the process
+strategy_cache = StrategyCache()
@@ -0,0 +1,135 @@
+"""
+SMTP Pipeline Module
+
+Provides pipelined message submission on smtplib sessions including:
+- Sending MAIL, every RCPT and DATA in one write when the server offers PIPELINING (RFC 2920)
+- Reading the replies in order and mapping them to smtplib's exceptions
+- Resetting the transaction after a failure so the session can be reused
+- Streaming message content from a file with dot-stuffing, in bounded chunks
+- One command at a time on servers without PIPELINING
+"""
+
+import logging
+import os
+import smtplib
+from typing import BinaryIO, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATA_CHUNK_SIZE = 65536  # Bytes of message content per socket write
+
+
+def _reset(smtp: smtplib.SMTP):
+    """Abort the current transaction, closing the session if even that fails"""
+    try:
+        smtp.rset()
+    except smtplib.SMTPException:
+        smtp.close()
+
+
+def _remaining_size(fp: BinaryIO) -> int:
+    """Number of bytes between the current position and the end of a file"""
+    position = fp.tell()
+    end = fp.seek(0, os.SEEK_END)
+    fp.seek(position)
+    return end - position
+
+
+def _send_data(smtp: smtplib.SMTP, fp: BinaryIO):
+    """Stream message content after a 354 reply, dot-stuffing lines and ending with the terminator"""
+    buffer = bytearray()
+    last = b'\r\n'
+    for line in fp:
+        if line.startswith(b'.'):
+            buffer += b'.'
+        buffer += line
+        last = line
+        if len(buffer) >= DATA_CHUNK_SIZE:
+            smtp.send(bytes(buffer))
+            buffer.clear()
+    if not last.endswith(b'\n'):
+        buffer += b'\r\n'
+    buffer += b'.\r\n'
+    smtp.send(bytes(buffer))
+
+
+def _end_empty_data(smtp: smtplib.SMTP, data_code: int):
+    """Close a data phase the server opened although nothing can be delivered"""
+    if data_code == 354:
+        smtp.send(b'.\r\n')
+        smtp.getreply()
+
+
+def send_pipelined(smtp: smtplib.SMTP, from_addr: str, recipients: List[str],
+                   message: BinaryIO) -> Dict[str, Tuple[int, bytes]]:
+    """
+    Submit a message, pipelining the envelope commands when possible
+
+    The content is streamed from the file, so its size does not matter.
+
+    Args:
+        smtp: Connected and authenticated SMTP session
+        from_addr: Envelope sender
+        recipients: Envelope recipients
+        message: Binary file positioned at the start of a message with CRLF line endings
+
+    Returns:
+        Recipients the server refused, mapped to (code, reply); empty if all were accepted
+
+    Raises:
+        smtplib.SMTPSenderRefused: If the server refused the sender
+        smtplib.SMTPRecipientsRefused: If the server refused every recipient
+        smtplib.SMTPDataError: If the server refused the message content
+        smtplib.SMTPServerDisconnected: If the session broke; it must not be reused
+    """
+    smtp.ehlo_or_helo_if_needed()
+    options = [f'SIZE={_remaining_size(message)}'] if smtp.has_extn('size') else []
+    refused = {}
+
+    if smtp.does_esmtp and smtp.has_extn('pipelining'):
+        commands = [f'MAIL FROM:{smtplib.quoteaddr(from_addr)}{"".join(" " + option for option in options)}']
+        commands.extend(f'RCPT TO:{smtplib.quoteaddr(recipient)}' for recipient in recipients)
+        commands.append('DATA')
+        smtp.send(''.join(f'{command}\r\n' for command in commands))
+
+        # Every pipelined command gets a reply, even after an early failure
+        mail_code, mail_reply = smtp.getreply()
+        for recipient in recipients:
+            code, reply = smtp.getreply()
+            if code not in (250, 251):
+                refused[recipient] = (code, reply)
+        data_code, data_reply = smtp.getreply()
+    else:
+        mail_code, mail_reply = smtp.mail(from_addr, options)
+        data_code, data_reply = None, None
+        if mail_code == 250:
+            for recipient in recipients:
+                code, reply = smtp.rcpt(recipient)
+                if code not in (250, 251):
+                    refused[recipient] = (code, reply)
+            if len(refused) < len(recipients):
+                smtp.putcmd('data')
+                data_code, data_reply = smtp.getreply()
+
+    if mail_code != 250:
+        _end_empty_data(smtp, data_code)
+        _reset(smtp)
+        raise smtplib.SMTPSenderRefused(mail_code, mail_reply, from_addr)
+    if len(refused) == len(recipients):
+        _end_empty_data(smtp, data_code)
+        _reset(smtp)
+        raise smtplib.SMTPRecipientsRefused(refused)
+    if data_code != 354:
+        _reset(smtp)
+        raise smtplib.SMTPDataError(data_code, data_reply)
+
+    _send_data(smtp, message)
+
+    code, reply = smtp.getreply()
+    if code != 250:
+        _reset(smtp)
+        raise smtplib.SMTPDataError(code, reply)
+
+    if refused:
+        logger.debug(f"Submission accepted {len(recipients) - len(refused)} of {len(recipients)} recipients")
+    return refused
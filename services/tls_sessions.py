@@ -0,0 +1,171 @@
+"""
+TLS Sessions Module
+
+Provides TLS session resumption for mail server connections including:
+- One SSL context per server, port and verification setting, reused across connects
+- Offering the session of the previous connection, so reconnects get abbreviated handshakes
+- Handshake and resumption counters per server for monitoring
+"""
+
+import logging
+import ssl
+import threading
+from typing import Dict, Tuple, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+
+class ResumingContext(ssl.SSLContext):
+    """
+    SSL context of one server that resumes the last session it saw
+
+    Handles:
+    - Passing the remembered session to every socket it wraps, including STARTTLS upgrades
+    - Counting full and resumed handshakes
+    """
+
+    def __new__(cls, server: str, port: int, mail_protocol: str):
+        # SSLContext takes the TLS protocol version in __new__
+        return super().__new__(cls, ssl.PROTOCOL_TLS_CLIENT)
+
+    def __init__(self, server: str, port: int, mail_protocol: str):
+        """
+        Initialize the context
+
+        Args:
+            server: Server address
+            port: Server port
+            mail_protocol: 'imap' or 'smtp', shown in statistics
+        """
+        self.server = server
+        self.port = port
+        # SSLContext.protocol is the TLS version
+        self.mail_protocol = mail_protocol
+        self.session: Optional[ssl.SSLSession] = None
+        self.handshakes = 0
+        self.resumed = 0
+        self._stats_lock = threading.Lock()
+
+    def wrap_socket(self, sock, *args, **kwargs) -> ssl.SSLSocket:
+        """Wrap a socket, offering the remembered session for resumption"""
+        kwargs.setdefault('session', self.session)
+        try:
+            wrapped = super().wrap_socket(sock, *args, **kwargs)
+        except ValueError:
+            # The session can't be offered, e.g. it was negotiated for another host name
+            if kwargs['session'] is None:
+                raise
+            kwargs['session'] = None
+            wrapped = super().wrap_socket(sock, *args, **kwargs)
+        if kwargs.get('do_handshake_on_connect', True):
+            self._count(wrapped.session_reused)
+        return wrapped
+
+    def remember(self, sock: ssl.SSLSocket):
+        """
+        Keep the session of an established connection for the next connect
+
+        Call after the first response was read: TLS 1.3 servers send their
+        session tickets after the handshake.
+
+        Args:
+            sock: Socket this context wrapped
+        """
+        session = sock.session
+        if session is not None and (session.has_ticket or session.id):
+            self.session = session
+
+    def _count(self, reused: bool):
+        """Record the outcome of a handshake"""
+        with self._stats_lock:
+            self.handshakes += 1
+            if reused:
+                self.resumed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get handshake counters for monitoring"""
+        with self._stats_lock:
+            return {
+                'server': self.server,
+                'port': self.port,
+                'protocol': self.mail_protocol,
+                'verify_cert': self.verify_mode != ssl.CERT_NONE,
+                'handshakes': self.handshakes,
+                'resumed': self.resumed,
+                'resumption_rate': round(self.resumed / self.handshakes, 3) if self.handshakes else None
+            }
+
+
+class TLSSessionCache:
+    """
+    Process-wide SSL contexts of the mail servers connected to
+
+    Handles:
+    - Creating a context per server, port and verification setting on first use
+    - Remembering sessions of established connections
+    - Collecting resumption statistics
+    """
+
+    def __init__(self):
+        """Initialize an empty cache"""
+        self._lock = threading.Lock()
+        self._contexts: Dict[Tuple[str, str, int, bool], ResumingContext] = {}
+
+    def context(self, protocol: str, server: str, port: int, verify_cert: bool) -> ResumingContext:
+        """
+        Get the SSL context for a server
+
+        Args:
+            protocol: 'imap' or 'smtp'
+            server: Server address
+            port: Server port
+            verify_cert: Whether certificates and host names are verified
+
+        Returns:
+            Shared ResumingContext of the server
+        """
+        key = (protocol, server, port, verify_cert)
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is None:
+                context = ResumingContext(server, port, protocol)
+                if verify_cert:
+                    context.load_default_certs(ssl.Purpose.SERVER_AUTH)
+                else:
+                    context.check_hostname = False
+                    context.verify_mode = ssl.CERT_NONE
+                self._contexts[key] = context
+        return context
+
+    def remember(self, sock: Any):
+        """
+        Keep the session of an established connection, if it is TLS through a cached context
+
+        Args:
+            sock: Socket of the connection; plain sockets are ignored
+        """
+        if isinstance(sock, ssl.SSLSocket) and isinstance(sock.context, ResumingContext):
+            sock.context.remember(sock)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get resumption statistics for monitoring
+
+        Returns:
+            Dictionary with the totals 'handshakes', 'resumed' and 'resumption_rate',
+            and 'servers' listing the counters of every context
+        """
+        with self._lock:
+            servers = [context.stats() for context in self._contexts.values()]
+        handshakes = sum(server['handshakes'] for server in servers)
+        resumed = sum(server['resumed'] for server in servers)
+        return {
+            'handshakes': handshakes,
+            'resumed': resumed,
+            'resumption_rate': round(resumed / handshakes, 3) if handshakes else None,
+            'servers': servers
+        }
+
+
+# Shared by every EmailConnection in the process
+tls_session_cache = TLSSessionCache()
@@ -0,0 +1,164 @@
+"""
+Upload Spool Module
+
+Provides temporary storage of compose attachments including:
+- Saving multipart uploads to disk as they arrive, per account
+- Looking up uploads by an opaque id when the email is sent
+- Removing uploads once they were sent or abandoned
+"""
+
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from typing import Dict, Optional, Any
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+COPY_CHUNK_SIZE = 256 * 1024  # Bytes copied per read while saving an upload
+
+
+class UploadSpool:
+    """
+    Directory of attachments uploaded while composing
+
+    Handles:
+    - Streaming uploaded files to disk without holding them in memory
+    - Keeping uploads of different accounts apart
+    - Expiring uploads whose email was never sent
+    """
+
+    def __init__(self, directory: str, max_age: float = 86400):
+        """
+        Initialize the spool
+
+        Args:
+            directory: Directory holding the uploaded files
+            max_age: Seconds after which an unsent upload is removed by cleanup()
+        """
+        self.directory = directory
+        self.max_age = max_age
+
+    def save(self, settings_id: int, upload, max_size: int) -> Dict[str, Any]:
+        """
+        Store an uploaded file
+
+        Args:
+            settings_id: EmailSettings id of the uploading account
+            upload: Werkzeug FileStorage from request.files
+            max_size: Largest accepted file size in bytes
+
+        Returns:
+            Upload description with 'upload_id', 'filename', 'content_type' and 'size'
+
+        Raises:
+            ValueError: If the file is larger than max_size
+        """
+        account_dir = self._account_dir(settings_id)
+        os.makedirs(account_dir, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(account_dir, upload_id)
+
+        size = 0
+        try:
+            with open(path, 'wb') as f:
+                while True:
+                    chunk = upload.stream.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise ValueError(f"Attachment exceeds {max_size // (1024 * 1024)}MB")
+                    f.write(chunk)
+
+            info = {
+                'upload_id': upload_id,
+                'filename': os.path.basename(upload.filename or '') or 'attachment',
+                'content_type': upload.mimetype or 'application/octet-stream',
+                'size': size
+            }
+            with open(path + '.json', 'w') as f:
+                json.dump(info, f)
+        except Exception:
+            self._remove(path)
+            raise
+
+        logger.debug(f"Stored upload {upload_id} of {size} bytes for settings {settings_id}")
+        return info
+
+    def get(self, settings_id: int, upload_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up an upload of an account
+
+        Args:
+            settings_id: EmailSettings id of the account, so users only see their own uploads
+            upload_id: Id returned by save()
+
+        Returns:
+            Upload description with the file 'path' added, or None if it does not exist
+        """
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            return None
+        path = os.path.join(self._account_dir(settings_id), upload_id)
+        try:
+            with open(path + '.json') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(path):
+            return None
+        return dict(info, path=path)
+
+    def discard(self, settings_id: int, upload_id: str):
+        """
+        Remove an upload
+
+        Args:
+            settings_id: EmailSettings id of the account
+            upload_id: Id returned by save()
+        """
+        if UPLOAD_ID_PATTERN.match(upload_id or ''):
+            self._remove(os.path.join(self._account_dir(settings_id), upload_id))
+
+    def cleanup(self) -> int:
+        """
+        Remove uploads older than max_age
+
+        Returns:
+            Number of uploads removed
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for account in os.listdir(self.directory):
+            account_dir = os.path.join(self.directory, account)
+            if not os.path.isdir(account_dir):
+                continue
+            for name in os.listdir(account_dir):
+                path = os.path.join(account_dir, name)
+                if UPLOAD_ID_PATTERN.match(name) and os.path.getmtime(path) < cutoff:
+                    self._remove(path)
+                    removed += 1
+
+        if removed:
+            logger.info(f"Removed {removed} expired attachment uploads")
+        return removed
+
+    def _account_dir(self, settings_id: int) -> str:
+        """Directory holding the uploads of one account"""
+        return os.path.join(self.directory, str(int(settings_id)))
+
+    def _remove(self, path: str):
+        """Delete an upload and its description"""
+        for name in (path, path + '.json'):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove upload file {name}: {str(e)}")
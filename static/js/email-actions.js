@@ -333,13 +333,36 @@ const EmailActions = (function() {
             return;
         }
 
-        // Implementation would call the server to mark as unread
-        showNotification('Email marked as unread', 'success');
+        fetch('/email/api/bulk', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': config.csrfToken
+            },
+            body: JSON.stringify({
+                action: 'unread',
+                folder: config.activeFolder,
+                email_ids: [config.activeEmailId]
+            })
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Failed to mark email as unread');
+            }
+            return response.json();
+        })
+        .then(data => {
+            showNotification('Email marked as unread', 'success');
 
-        // Update UI to reflect the change
-        if (typeof EmailClient !== 'undefined') {
-            EmailClient.loadEmails();
-        }
+            // Update UI to reflect the change
+            if (typeof EmailClient !== 'undefined') {
+                EmailClient.loadEmails();
+            }
+        })
+        .catch(error => {
+            showNotification('Failed to mark email as unread', 'error');
+            console.error('Mark unread error:', error);
+        });
     }
 
     /**
@@ -15,9 +15,13 @@ const EmailCompose = (function() {
     // Internal state
     const state = {
         isRichText: true,
-        attachmentsData: []
+        attachmentsData: [],
+        pendingUploads: 0
     };
 
+    // Largest attachment the server accepts, see MAX_ATTACHMENT_SIZE in endpoints/email_client.py
+    const MAX_ATTACHMENT_SIZE = 25 * 1024 * 1024;
+
     // Cached elements
     let elements = {};
 
@@ -351,30 +355,13 @@ const EmailCompose = (function() {
         for (let i = 0; i < files.length; i++) {
             const file = files[i];
 
-            // Check file size (limit to 10MB)
-            if (file.size > 10 * 1024 * 1024) {
-                alert(`File ${file.name} is too large. Maximum file size is 10MB.`);
+            // Check file size against the server limit
+            if (file.size > MAX_ATTACHMENT_SIZE) {
+                alert(`File ${file.name} is too large. Maximum file size is ${formatFileSize(MAX_ATTACHMENT_SIZE)}.`);
                 continue;
             }
 
-            // Read file
-            const reader = new FileReader();
-            reader.onload = function(e) {
-                const attachment = {
-                    filename: file.name,
-                    content_type: file.type,
-                    size: file.size,
-                    content: e.target.result.split(',')[1] // Remove data URL prefix
-                };
-
-                // Add to attachments array
-                state.attachmentsData.push(attachment);
-                window.attachmentsData = state.attachmentsData;
-
-                // Display attachment
-                displayAttachment(attachment, state.attachmentsData.length - 1);
-            };
-            reader.readAsDataURL(file);
+            uploadFile(file);
         }
 
         // Reset file input
@@ -383,6 +370,56 @@ const EmailCompose = (function() {
         }
     }
 
+    /**
+     * Upload a file to the server, which keeps it until the email is sent
+     * @param {File} file - File to attach
+     */
+    function uploadFile(file) {
+        const formData = new FormData();
+        formData.append('file', file);
+
+        state.pendingUploads++;
+        fetch('/email/api/attachments', {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCsrfToken()
+            },
+            body: formData
+        })
+        .then(response => {
+            if (!response.ok) {
+                return response.json().catch(() => ({})).then(data => {
+                    throw new Error(data.error || 'Upload failed');
+                });
+            }
+            return response.json();
+        })
+        .then(attachment => {
+            // Add to attachments array
+            state.attachmentsData.push(attachment);
+            window.attachmentsData = state.attachmentsData;
+
+            // Display attachment
+            displayAttachment(attachment, state.attachmentsData.length - 1);
+        })
+        .catch(error => {
+            console.error('Error uploading attachment:', error);
+            showNotification(`Failed to attach ${file.name}: ${error.message}`, 'error');
+        })
+        .finally(() => {
+            state.pendingUploads--;
+        });
+    }
+
+    /**
+     * Get the CSRF token for API requests
+     * @returns {string} CSRF token, or an empty string if none is available
+     */
+    function getCsrfToken() {
+        const csrfCookie = document.cookie.split('; ').find(row => row.startsWith('csrf_token='));
+        return csrfCookie ? decodeURIComponent(csrfCookie.split('=')[1]) : '';
+    }
+
     /**
      * Display attachment in the UI
      * @param {Object} attachment - Attachment data
@@ -448,6 +485,11 @@ const EmailCompose = (function() {
      * Send email
      */
     function sendEmail() {
+        if (state.pendingUploads > 0) {
+            showNotification('Please wait until all attachments are uploaded', 'warning');
+            return;
+        }
+
         // Show sending overlay
         if (elements.sendingOverlay) {
             elements.sendingOverlay.style.display = 'flex';
@@ -490,7 +532,8 @@ const EmailCompose = (function() {
         fetch('/email/api/send', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCsrfToken()
             },
             body: JSON.stringify(emailData)
         })
@@ -501,8 +544,8 @@ const EmailCompose = (function() {
             return response.json();
         })
         .then(data => {
-            // Show success and redirect
-            showNotification('Email sent successfully', 'success');
+            // Delivery continues in the background; the outbox reports its progress
+            showNotification('Email queued for delivery', 'success');
             window.location.href = '/email/inbox';
         })
         .catch(error => {
@@ -678,9 +721,12 @@ const EmailCompose = (function() {
             setCaretToBeginning(elements.richTextEditor);
         }
 
-        // Add forwarded attachments if any
+        // Add forwarded attachments if any; the server loads their content when sending
         if (email.attachments && email.attachments.length > 0) {
-            email.attachments.forEach(attachment => {
+            email.attachments.forEach(original => {
+                const attachment = Object.assign({}, original, {
+                    source: { folder: email.folder, email_id: email.id, uidvalidity: email.uidvalidity }
+                });
                 state.attachmentsData.push(attachment);
                 window.attachmentsData = state.attachmentsData;
                 displayAttachment(attachment, state.attachmentsData.length - 1);
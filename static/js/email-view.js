@@ -251,7 +251,7 @@ const EmailView = (function() {
                             <div class="attachment-meta">${formattedSize}</div>
                         </div>
                         <div class="attachment-actions">
-                            <a href="/email/api/attachment/${encodeURIComponent(email.folder)}/${email.id}/${encodeURIComponent(attachment.filename)}" 
+                            <a href="/email/api/attachment/${encodeURIComponent(email.folder)}/${email.id}/${attachment.part_id}?uidvalidity=${email.uidvalidity}" 
                                download="${escapeHtml(attachment.filename)}" 
                                class="attachment-download" 
                                title="Download">
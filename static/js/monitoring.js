@@ -4,6 +4,7 @@
  * This module provides real-time system monitoring functionality:
  * - CPU, memory, disk, and network usage monitoring
  * - Docker container management
+ * - Email connection pools, message cache and IMAP protocol strategies
  * - Process monitoring and management
  * - System logs viewing and filtering
  * - Charts and visualizations for system metrics
@@ -19,6 +20,7 @@ const SystemMonitoring = (function() {
         endpoints: {
             system: '/api/monitoring/system',
             docker: '/api/monitoring/docker',
+            email: '/api/monitoring/email',
             logs: '/api/monitoring/logs',
             charts: {
                 cpu: '/api/monitoring/charts/cpu',
@@ -138,6 +140,9 @@ const SystemMonitoring = (function() {
             case 'docker-tab':
                 loadDockerInfo();
                 break;
+            case 'email-tab':
+                loadEmailInfo();
+                break;
             case 'processes-tab':
                 loadSystemInfo();
                 break;
@@ -699,6 +704,124 @@ const SystemMonitoring = (function() {
         }
     }
 
+    /**
+     * Load email protocol metrics
+     */
+    function loadEmailInfo() {
+        fetch(config.endpoints.email)
+            .then(response => response.json())
+            .then(data => {
+                updateEmailUI(data);
+            })
+            .catch(error => console.error('Error fetching email metrics:', error));
+    }
+
+    /**
+     * Append a table row whose cells are filled as plain text
+     * @param {HTMLElement} tableBody - Table body to append to
+     * @param {Array} values - Cell values
+     */
+    function appendTextRow(tableBody, values) {
+        const row = document.createElement('tr');
+        values.forEach(value => {
+            const cell = document.createElement('td');
+            cell.textContent = value;
+            row.appendChild(cell);
+        });
+        tableBody.appendChild(row);
+        highlightUpdate(row);
+    }
+
+    /**
+     * Format a 0..1 ratio as a percentage
+     * @param {number|null} rate - Ratio, or null if nothing was counted yet
+     * @returns {string} Formatted percentage or '-'
+     */
+    function formatRate(rate) {
+        return rate === null || rate === undefined ? '-' : `${(rate * 100).toFixed(1)}%`;
+    }
+
+    /**
+     * Update email protocol UI with data
+     * @param {Object} data - Email metrics from API
+     */
+    function updateEmailUI(data) {
+        const status = document.getElementById('email-status');
+        if (data.error) {
+            status.innerHTML = '<div class="alert-message"></div>';
+            status.firstChild.textContent = `Email metrics are not available: ${data.error}`;
+            return;
+        }
+        status.innerHTML = '';
+
+        const poolBody = document.getElementById('email-pool-stats');
+        poolBody.innerHTML = '';
+        (data.pools || []).forEach(pool => {
+            appendTextRow(poolBody, [pool.name, pool.accounts, pool.in_use, pool.idle,
+                                     pool.created, pool.reused, pool.closed, pool.failed_checks]);
+        });
+
+        const cacheBody = document.getElementById('email-cache-stats');
+        cacheBody.innerHTML = '';
+        (data.caches || []).forEach(cache => {
+            appendTextRow(cacheBody, [cache.name, cache.entries,
+                                      `${formatBytes(cache.bytes)} / ${formatBytes(cache.max_bytes)}`,
+                                      cache.hits, cache.misses,
+                                      formatRate(cache.hit_rate),
+                                      cache.evictions]);
+        });
+
+        const tlsBody = document.getElementById('email-tls-stats');
+        const tls = data.tls_sessions || {servers: []};
+        tlsBody.innerHTML = '';
+        if (tls.servers.length === 0) {
+            tlsBody.innerHTML = '<tr><td colspan="6" class="text-center">No TLS connections yet</td></tr>';
+        } else {
+            tls.servers.forEach(server => {
+                appendTextRow(tlsBody, [`${server.server}:${server.port}`, server.protocol.toUpperCase(),
+                                        server.verify_cert ? 'Yes' : 'No', server.handshakes, server.resumed,
+                                        formatRate(server.resumption_rate)]);
+            });
+            appendTextRow(tlsBody, ['All servers', '', '', tls.handshakes, tls.resumed,
+                                    formatRate(tls.resumption_rate)]);
+        }
+
+        const circuitBody = document.getElementById('email-circuit-stats');
+        const circuits = (data.circuits || {}).hosts || [];
+        circuitBody.innerHTML = '';
+        if (circuits.length === 0) {
+            circuitBody.innerHTML = '<tr><td colspan="7" class="text-center">No connection failures yet</td></tr>';
+        } else {
+            circuits.forEach(circuit => {
+                appendTextRow(circuitBody, [circuit.host, circuit.state, circuit.failures, circuit.opened,
+                                            circuit.rejected,
+                                            circuit.retry_in === null ? '-' : `${circuit.retry_in}s`,
+                                            circuit.last_error || '-']);
+            });
+        }
+
+        const serverBody = document.getElementById('email-server-stats');
+        serverBody.innerHTML = '';
+        if (!data.servers || data.servers.length === 0) {
+            serverBody.innerHTML = '<tr><td colspan="3" class="text-center">No IMAP connections yet</td></tr>';
+        } else {
+            data.servers.forEach(server => {
+                const strategies = Object.entries(server.strategies)
+                    .map(([operation, strategy]) => `${operation}: ${strategy}`)
+                    .join(', ');
+                appendTextRow(serverBody, [server.server, strategies || '-', server.capabilities.join(' ')]);
+            });
+        }
+
+        const strategyBody = document.getElementById('email-strategy-stats');
+        strategyBody.innerHTML = '';
+        Object.entries(data.strategies || {}).forEach(([operation, counts]) => {
+            Object.entries(counts).forEach(([strategy, count]) => {
+                appendTextRow(strategyBody, [operation, strategy, count]);
+            });
+        });
+    }
+
     /**
      * Container action function (start, stop, restart)
      * @param {string} containerId - Docker container ID
@@ -965,6 +1088,7 @@ const SystemMonitoring = (function() {
         loadAllData,
         loadSystemInfo,
         loadDockerInfo,
+        loadEmailInfo,
         loadSystemLogs,
         refreshLogs,
         filterLogs,
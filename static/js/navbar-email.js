@@ -2,8 +2,8 @@
  * Navbar Email Notification Module
  *
  * This script handles checking for unread emails and updating the notification badge
- * in the navigation bar. It periodically checks the email inbox for unread messages
- * and updates the UI accordingly.
+ * in the navigation bar. It listens for unread-count, new-mail and outbox delivery events
+ * pushed by the server and falls back to periodic polling where server-sent events are unavailable.
  */
 
 const NavbarEmailNotification = (function() {
@@ -11,9 +11,11 @@ const NavbarEmailNotification = (function() {
 
     // Configuration
     const config = {
-        checkInterval: 60000, // Check for new emails every minute
+        checkInterval: 60000, // Check for new emails every minute when polling
+        maxStreamFailures: 3, // Fall back to polling after this many failed event streams
         endpoints: {
-            unreadCount: '/email/api/unread-count'
+            unreadCount: '/email/api/unread-count',
+            events: '/email/api/events'
         }
     };
 
@@ -23,6 +25,8 @@ const NavbarEmailNotification = (function() {
         isChecking: false,
         lastUpdate: null,
         checkIntervalId: null,
+        eventSource: null,
+        streamFailures: 0,
         badgeElement: null
     };
 
@@ -37,11 +41,12 @@ const NavbarEmailNotification = (function() {
         // (it should only exist on pages where user is logged in with email configured)
         if (!state.badgeElement) return;
 
-        // Initial check
-        checkUnreadEmails();
-
-        // Set up periodic checking
-        state.checkIntervalId = setInterval(checkUnreadEmails, config.checkInterval);
+        // Prefer pushed updates, poll only where the browser can't receive them
+        if (window.EventSource) {
+            connectEventStream();
+        } else {
+            startPolling();
+        }
 
         // Clean up on page unload
         window.addEventListener('beforeunload', destroy);
@@ -49,6 +54,73 @@ const NavbarEmailNotification = (function() {
         console.log('Navbar email notification system initialized');
     }
 
+    /**
+     * Subscribe to server-sent mailbox events
+     */
+    function connectEventStream() {
+        const source = new EventSource(config.endpoints.events, { withCredentials: true });
+        state.eventSource = source;
+
+        source.addEventListener('unread', event => {
+            state.streamFailures = 0;
+            handleEvent(event);
+        });
+
+        source.addEventListener('new-mail', event => {
+            const data = handleEvent(event);
+            if (data) {
+                // Let open email views refresh their listing
+                document.dispatchEvent(new CustomEvent('email:new-mail', { detail: data }));
+            }
+        });
+
+        source.addEventListener('outbox', event => {
+            const data = handleEvent(event);
+            if (data) {
+                // Let open pages report delivery of queued emails
+                document.dispatchEvent(new CustomEvent('email:outbox', { detail: data }));
+            }
+        });
+
+        source.onerror = function() {
+            // EventSource reconnects by itself unless the server refused the stream
+            if (source.readyState === EventSource.CLOSED || ++state.streamFailures >= config.maxStreamFailures) {
+                source.close();
+                state.eventSource = null;
+                startPolling();
+            }
+        };
+    }
+
+    /**
+     * Apply the unread count carried by a mailbox event
+     * @param {MessageEvent} event - Server-sent event with JSON data
+     * @returns {Object|null} Parsed event data
+     */
+    function handleEvent(event) {
+        try {
+            const data = JSON.parse(event.data);
+            state.lastUpdate = new Date();
+            if (typeof data.unread_count === 'number') {
+                updateUnreadCount(data.unread_count);
+            }
+            return data;
+        } catch (error) {
+            console.error('Error handling email event:', error);
+            return null;
+        }
+    }
+
+    /**
+     * Start periodic checking for unread emails
+     */
+    function startPolling() {
+        if (state.checkIntervalId) return;
+
+        checkUnreadEmails();
+        state.checkIntervalId = setInterval(checkUnreadEmails, config.checkInterval);
+    }
+
     /**
      * Check for unread emails via API
      */
@@ -130,6 +202,11 @@ const NavbarEmailNotification = (function() {
      * Clean up resources when page is unloaded
      */
     function destroy() {
+        if (state.eventSource) {
+            state.eventSource.close();
+            state.eventSource = null;
+        }
+
         if (state.checkIntervalId) {
             clearInterval(state.checkIntervalId);
             state.checkIntervalId = null;